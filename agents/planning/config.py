@@ -1,3 +1,78 @@
+import json
+from dataclasses import fields, replace
+from typing import Dict
+
+from common.config import settings
+from common.llm import ModelRoute
+from .prompts import PromptCompiler
+
+# JSON layout shared by the structured schedule prompts
+STRUCTURED_PLAN_FORMAT = """Format your response as a valid JSON array with this structure:
+[
+  {
+    "week": 1,
+    "days": [
+      {
+        "day": "Monday",
+        "workout_type": "Strength",
+        "details": "Upper body focus: 3 sets of 8-10 reps"
+      },
+      {
+        "day": "Tuesday",
+        "workout_type": "Run",
+        "details": "Easy 5km run"
+      },
+      ...
+    ]
+  },
+  ...
+]
+
+DO NOT include any explanatory text or markdown formatting. ONLY return the valid JSON array.
+"""
+
+# Prompt attributes compiled at startup. Runtime values are only filled into the
+# placeholders at the end of a prompt, so everything before them is byte-identical
+# across requests and can be served from the provider's prompt cache.
+PROMPT_ATTRIBUTES = [
+    "profile_system_prompt",
+    "incremental_profile_prompt",
+    "question_system_prompt",
+    "question_prompt_template",
+    "plan_guidelines_system_prompt",
+    "plan_generation_system_prompt",
+    "combined_plan_system_prompt",
+    "structured_plan_system_prompt",
+    "guidelines_to_structured_system_prompt",
+    "skeleton_system_prompt",
+    "week_plan_system_prompt",
+    "template_personalization_prompt",
+    "json_repair_prompt",
+]
+
+
+def _apply_route_overrides(routes: Dict[str, ModelRoute], raw: str) -> None:
+    """Apply LLM_MODEL_ROUTES overrides, raising ValueError that names any unknown task or field."""
+    try:
+        overrides = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"LLM_MODEL_ROUTES is not valid JSON: {str(e)}") from None
+    if not isinstance(overrides, dict):
+        raise ValueError("LLM_MODEL_ROUTES must be a JSON object mapping tasks to route settings")
+    route_fields = {field.name for field in fields(ModelRoute)}
+    for task, changes in overrides.items():
+        if task not in routes:
+            raise ValueError(f"LLM_MODEL_ROUTES has unknown task '{task}', expected one of: {', '.join(routes)}")
+        if not isinstance(changes, dict):
+            raise ValueError(f"LLM_MODEL_ROUTES['{task}'] must be a JSON object")
+        unknown = sorted(set(changes) - route_fields)
+        if unknown:
+            raise ValueError(
+                f"LLM_MODEL_ROUTES['{task}'] has unknown settings {', '.join(unknown)}, "
+                f"expected: {', '.join(sorted(route_fields))}"
+            )
+        routes[task] = replace(routes[task], **changes)
+
 class PlanningConfig:
     """Configuration for the planning service."""
     
@@ -39,6 +114,41 @@ class PlanningConfig:
             "preferred_training_style": "if known, describe preferred training format (e.g., circuits, intervals, long runs)"
         }
 
+
+        # Model per task: the small model handles short, structured calls and the large
+        # model writes plans. Each route falls back to the other model when its first
+        # choice is rate limited, unavailable or slower than LLM_FALLBACK_TIMEOUT.
+        fast, large = settings.GROQ_FAST_MODEL, settings.GROQ_MODEL
+        timeout = settings.LLM_FALLBACK_TIMEOUT or None
+        self.model_routes = {
+            "extraction": ModelRoute(fast, 0.2, 1024, [large], timeout),
+            "question": ModelRoute(fast, 0.7, 256, [large], timeout),
+            "repair": ModelRoute(fast, 0.0, settings.DEFAULT_MAX_TOKENS, [large], timeout),
+            "guidelines": ModelRoute(large, settings.DEFAULT_TEMPERATURE, settings.DEFAULT_MAX_TOKENS, [fast], timeout),
+            "structured": ModelRoute(large, 0.3, settings.PLAN_MAX_TOKENS, [fast], timeout),
+            "plan": ModelRoute(large, 0.5, settings.PLAN_MAX_TOKENS, [fast], timeout),
+            "skeleton": ModelRoute(large, 0.5, settings.DEFAULT_MAX_TOKENS, [fast], timeout),
+            "week": ModelRoute(large, 0.5, settings.DEFAULT_MAX_TOKENS, [fast], timeout),
+            "personalize": ModelRoute(fast, 0.3, settings.DEFAULT_MAX_TOKENS, [large], timeout),
+        }
+        _apply_route_overrides(self.model_routes, settings.LLM_MODEL_ROUTES)
+
+        # Output token budgets as (base, tokens per unit), capped by the route's max_tokens.
+        # Units are plan weeks for plan tasks, training days for a single generated week,
+        # requested fields for extraction and input tokens for template personalization,
+        # which rewrites a message of similar length.
+        self.output_token_budgets = {
+            "extraction": (64, 96),
+            "guidelines": (512, 64),
+            "structured": (128, 256),
+            "plan": (512, 1024),
+            "skeleton": (256, 64),
+            "week": (96, 160),
+            "personalize": (128, 1.25),
+        }
+        # Conversation history budget for profile extraction, including the summary of dropped turns
+        self.history_token_budget = settings.PROFILE_HISTORY_TOKENS
+        self.history_summary_tokens = settings.PROFILE_HISTORY_SUMMARY_TOKENS
         
         # System prompts for different functions
         
@@ -81,14 +191,189 @@ ONLY Return a JSON object with these fields, plus a "missing_fields" array listi
 Use a hybrid training lens—if a user mentions only running or only lifting, consider the other as potentially missing unless clearly ruled out.
 """
 
+        # Text that marks a field as not actually provided (matched case-insensitively
+        # anywhere in the value)
+        self.placeholder_phrases = [
+            "no mention",
+            "not specified",
+            "not mentioned",
+            "not provided",
+            "unknown",
+            "unclear",
+            "not stated",
+            "not indicated",
+        ]
+
+        # Incremental extraction: once a profile exists, follow-up turns only ask the LLM
+        # about the fields that are still missing and merge the answer into the profile.
+        self.incremental_extraction = settings.PROFILE_INCREMENTAL_EXTRACTION
+        self.incremental_profile_prompt = """You are an AI fitness assistant building hybrid (running + strength) training plans.
+Your job is to extract structured user profile information for ONLY the fields listed below from the user's latest message.
+Return ONLY a JSON object with exactly these keys, with no additional text or explanations.
+
+IMPORTANT:
+- If the message does not cover a field, set it to an empty string "" - DO NOT add text like "no mention" or "not specified"
+- Only include information that is explicitly mentioned
+- If the user states they don't have something, use the form "user stated they don't have any <field>" (e.g. "user stated they don't have any health constraints")
+- Use a hybrid training lens: if the user has a running goal and a lifting background (or vice versa), include both in training_goals
+
+Fields:
+{fields}
+"""
+
+        # How a newly extracted value combines with one already in the profile:
+        # "replace" takes the new value, "append" keeps both, "keep" keeps the existing one.
+        # An existing "user stated they don't have any ..." value is always replaced.
+        self.default_merge_rule = "replace"
+        self.field_merge_rules = {
+            "training_goals": "append",
+            "available_equipment": "append",
+            "event_targets": "append",
+            "movement_limitations": "append",
+            "health_constraints": "append",
+            "fitness_background": "keep",
+        }
+
+        # Rule-based pre-fill: fields stated in obvious forms are filled locally with a
+        # confidence score. Fields at or above the threshold are dropped from the LLM
+        # prompt, and the LLM is skipped when nothing is left to ask. Vocabularies avoid
+        # words with common non-training meanings.
+        self.rule_extraction = settings.PROFILE_RULE_EXTRACTION
+        self.rule_confidence_threshold = 0.8
+        self.equipment_vocabulary = [
+            "full gym", "commercial gym", "home gym", "gym access", "barbell", "barbells",
+            "dumbbell", "dumbbells", "kettlebell", "kettlebells", "squat rack", "power rack",
+            "weight bench", "pull-up bar", "pull up bar", "rower", "rowing machine", "ski erg", "skierg",
+            "treadmill", "assault bike", "air bike", "spin bike", "sled", "wall ball",
+            "wall balls", "sandbag", "medicine ball", "resistance bands", "trap bar",
+            "jump rope", "plyo box", "gymnastic rings",
+        ]
+        self.event_vocabulary = [
+            "hyrox", "spartan", "tough mudder", "ironman", "triathlon", "half marathon",
+            "marathon", "ultra", "ultramarathon", "10k", "5k", "half ironman", "crossfit open",
+            "deka", "obstacle race", "powerlifting meet",
+        ]
+        self.injury_vocabulary = [
+            "injury", "injuries", "injured", "knee pain", "back pain", "joint pain", "shoulder pain",
+            "hip pain", "ankle pain", "neck pain", "chronic pain", "surgery", "tendonitis", "tendinitis",
+            "plantar fasciitis", "shin splints", "sprain", "sprained", "torn", "arthritis",
+            "herniated disc", "slipped disc", "asthma", "medical condition", "heart condition",
+        ]
+        self.training_style_vocabulary = [
+            "intervals", "circuits", "long runs", "tempo runs", "emom", "amrap", "supersets",
+            "heavy lifting", "heavy compound lifts", "hiit", "zone 2", "fartlek", "hill repeats",
+        ]
+
+        # Follow-up question lookup table, served without an LLM call in "table" mode.
+        # Each field maps to a few paraphrase variants; entries can be overridden from
+        # FOLLOW_UP_QUESTION_TABLE_PATH or generated at startup with FOLLOW_UP_QUESTION_WARMUP.
+        self.question_mode = settings.FOLLOW_UP_QUESTION_MODE
+        self.question_table_path = settings.FOLLOW_UP_QUESTION_TABLE_PATH
+        self.question_llm_fallback = settings.FOLLOW_UP_QUESTION_LLM_FALLBACK
+        self.follow_up_question_table = {
+            "training_goals": [
+                "What are you hoping to achieve with your hybrid training? For example, a faster 5K, more strength, or getting ready for a Hyrox race?",
+                "What are your main goals right now, on both the running and strength side?"
+            ],
+            "training_history": [
+                "Can you tell me about your recent training? How much have you been running and lifting lately?",
+                "What does your current training routine look like for running, lifting, or hybrid sessions?"
+            ],
+            "weekly_schedule": [
+                "Which days of the week can you train, and roughly what time windows do you have?",
+                "How many days a week can you commit to training, and which days work best for you?"
+            ],
+            "available_equipment": [
+                "What equipment do you have access to? For example, a full gym, barbell, kettlebells, rower, or a treadmill?",
+                "Where will you be training, and what equipment is available there?"
+            ],
+            "fitness_background": [
+                "What's your athletic background? Did you play any sports, or have you mostly trained in the gym?",
+                "How would you describe your overall fitness background, from sports you've played to how active you've been?"
+            ],
+            "event_targets": [
+                "Are you training for a specific event, like a Hyrox race, a Spartan race, or a 5K? If so, when is it?",
+                "Do you have any races or competitions on the calendar that we should build towards?"
+            ],
+            "movement_limitations": [
+                "Are there any movements you find difficult or uncomfortable, like deep squats or overhead pressing?",
+                "Do you have any mobility restrictions or movements you'd prefer to avoid?"
+            ],
+            "preferred_training_style": [
+                "What style of training do you enjoy most, such as circuits, intervals, long steady runs, or heavy lifting?",
+                "Do you have a preferred training format that keeps you motivated?"
+            ],
+            "health_constraints": [
+                "Do you have any injuries, medical conditions, or recovery needs I should plan around?",
+                "Is there anything health-wise, like past injuries or joint pain, that we should keep in mind?"
+            ]
+        }
+
         self.question_system_prompt = "You are a friendly fitness profile assistant"
         
-        self.question_prompt_template = """I'm helping create a hybrid training plan that combines running and strength work. 
-So far, I still need to know more about the user's {all_missing}.
-Generate a friendly, natural follow-up question that asks specifically about their {first_missing} in the context of hybrid training.
-Be concise and helpful. Return ONLY the question text."""
+        self.question_prompt_template = """I'm helping create a hybrid training plan that combines running and strength work.
+Generate a friendly, natural follow-up question that asks specifically about the field below in the context of hybrid training.
+Be concise and helpful. Return ONLY the question text.
+
+Still missing: {all_missing}
+Ask about: {first_missing}"""
+
+        # Generate table/csv schedules from the guidelines text rather than concurrently from the profile
+        self.structured_plan_from_guidelines = settings.PLAN_STRUCTURED_FROM_GUIDELINES
+        # "single_call" asks once for guidelines plus a full TrainingPlan as one JSON document;
+        # "week_parallel" generates a skeleton and then every week concurrently
+        self.plan_generation_mode = settings.PLAN_GENERATION_MODE
+        self.week_parallel_min_weeks = settings.PLAN_WEEK_PARALLEL_MIN_WEEKS
+        self.week_concurrency = settings.PLAN_WEEK_CONCURRENCY
+        self.week_retries = settings.PLAN_WEEK_RETRIES
+
+        # Plan templates: profiles are reduced to coarse features (goal tags, training days,
+        # equipment class, experience tier, duration and emphasis) and plans generated for
+        # one profile are reused, after a personalization pass, for others with the same key.
+        # Profiles with no recognised goal or with any health or movement constraint always
+        # get a fresh plan
+        self.template_goal_keywords = {
+            "strength": ["strength", "stronger", "muscle", "lift", "lifting", "powerlifting", "hypertrophy"],
+            "speed": ["faster", "speed", "pace", "sub-", "pr", "pb", "personal best", "personal record"],
+            "endurance": ["endurance", "aerobic", "distance", "longer", "stamina", "conditioning"],
+            "weight_loss": ["lose weight", "weight loss", "fat loss", "lean", "body fat"],
+            "general_fitness": ["general fitness", "healthy", "health", "get fit", "in shape"],
+        }
+        self.template_equipment_classes = {
+            "full_gym": ["full gym", "commercial gym", "gym access", "gym membership", "squat rack", "power rack", "sled"],
+            "home_gym": ["home gym", "barbell", "dumbbell", "dumbbells", "kettlebell", "kettlebells", "weight bench", "rower", "treadmill"],
+            "minimal": ["resistance bands", "pull-up bar", "pull up bar", "jump rope"],
+            "bodyweight": ["bodyweight", "body weight", "calisthenics"],
+        }
+        # Checked in order; the first tier whose words appear in training_history wins
+        self.template_experience_tiers = {
+            "advanced": ["advanced", "competitive", "elite", "marathons", "ironman", "powerlifter", "coach",
+                         "5+ years", "10 years", "many years", "decade"],
+            "beginner": ["beginner", "new to", "never", "just started", "just starting", "first time",
+                         "no experience", "little experience", "couch"],
+            "intermediate": ["intermediate", "years", "regularly", "consistently", "a year", "half marathon",
+                             "marathon", "10k", "5k"],
+        }
 
         # Plan generation prompts
+        self.plan_guidelines_system_prompt = """You are an expert hybrid training coach writing directly to your client about their personalized training plan.
+Speak as if you're having a one-on-one conversation with them.
+
+DO NOT use meta-commentary like "Here's a conversational overview" or "This is your plan".
+Instead, communicate directly: "I've created this 4-week plan for you based on your goals..."
+
+Your response should:
+- Use a warm, encouraging tone with "you" and "your" language
+- Begin with a brief personalized greeting acknowledging their specific situation
+- Explain the structure of their training weeks and progression
+- Describe the weekly balance of running and strength sessions
+- Address how you've adapted the plan for their specific goals and constraints
+- Include any special modifications based on their health concerns
+- End with an encouraging message about their fitness journey
+
+Keep it concise, motivational, and free of technical jargon.
+"""
+
         self.plan_generation_system_prompt = """You are an expert hybrid training coach who specializes in combining running and strength training.
 You create personalized training plans based on users' fitness profiles and goals.
 Your plans should be detailed, including specific exercises, sets, reps, and rest periods.
@@ -115,17 +400,81 @@ The TrainingPlan schema includes:
 - notes: string - Overall plan notes (optional)
 """
 
+        # Single-call generation: the TrainingPlan schema above plus the coach's message
+        self.combined_plan_system_prompt = self.plan_generation_system_prompt.replace(
+            "Return ONLY valid JSON conforming to the TrainingPlan schema with no additional text or explanations.",
+            """Return ONLY a valid JSON object with no additional text or explanations, with exactly two keys:
+- "guidelines": string - A warm, concise message written directly to the client ("I've built this plan around your...") explaining the structure, progression, running/strength balance and any adaptations for their constraints
+- "plan": object - The full training plan conforming to the TrainingPlan schema, with every week and training day populated"""
+        )
+
+        # Structured schedule prompts, from the profile or from generated guidelines
+        self.structured_plan_system_prompt = """You are an expert hybrid training coach who combines running and strength training.
+Given a client's profile, design their weekly training schedule as structured data.
+Return a valid JSON array of weekly plans where each week contains an array of daily workouts.
+
+""" + STRUCTURED_PLAN_FORMAT
+
+        self.guidelines_to_structured_system_prompt = """You are an expert at converting conversational training plan guidelines into structured data.
+Given a conversational training plan, extract a structured weekly schedule.
+Return a valid JSON array of weekly plans where each week contains an array of daily workouts.
+
+""" + STRUCTURED_PLAN_FORMAT
+
+        # Week-parallel generation: a compact periodization skeleton, then one call per week
+        self.skeleton_system_prompt = """You are an expert hybrid training coach who specializes in combining running and strength training.
+Design the periodization skeleton for a client's plan: the overall arc, not the individual workouts.
+Return ONLY a valid JSON object with no additional text or explanations, with these keys:
+- "guidelines": string - A warm, concise message written directly to the client explaining the structure, progression, running/strength balance and any adaptations for their constraints
+- "title": string - Overall name of the plan
+- "description": string - Brief summary of the plan's focus and approach
+- "weeks": array with one object per week containing:
+  - "week_number": integer
+  - "phase": string - e.g. "Base", "Build", "Peak", "Deload", "Taper"
+  - "focus": string - One sentence on that week's emphasis, volume and intensity
+"""
+
+        self.week_plan_system_prompt = """You are an expert hybrid training coach who specializes in combining running and strength training.
+You are writing one week of a client's plan, following the agreed periodization skeleton.
+Your plans should be detailed, including specific exercises, sets, reps, and rest periods.
+Return ONLY a valid JSON TrainingWeek object with no additional text or explanations:
+- week_number: integer - Sequential week number
+- days: array of TrainingDay objects containing:
+  - day: string - Name of day (e.g., "Monday", "Tuesday")
+  - blocks: array of TrainingBlock objects containing:
+    - name: string - Name of training block (e.g., "Morning Run", "Strength Circuit")
+    - description: string - Brief description of the block's focus
+    - exercises: array of Exercise objects containing:
+      - name: string - Exercise name
+      - sets: integer - Number of sets (optional)
+      - reps: string - Repetition scheme (optional)
+      - weight: string - Weight prescription (optional)
+      - rest_seconds: integer - Rest between sets in seconds (optional)
+      - notes: string - Additional instructions (optional)
+"""
+
+        # Template personalization: the reused schedule is kept, only the message is rewritten
+        self.template_personalization_prompt = """You are an expert hybrid training coach writing directly to your client about their personalized training plan.
+You are given a message originally written for another client with a very similar profile and the same training plan.
+Rewrite it for this client: refer to their own goals, schedule, equipment, history and health constraints, and rename training days to match their schedule.
+Keep the plan structure, sessions, progression and length of the message the same.
+Return ONLY the rewritten message with no additional text or explanations."""
+
         # JSON repair prompt
-        self.json_repair_prompt = """You are a JSON formatting expert. 
-The following text was intended to be valid JSON, but it has syntax errors. 
+        self.json_repair_prompt = """You are a JSON formatting expert.
+The following text was intended to be valid JSON, but it has syntax errors.
 Fix the JSON syntax errors and return ONLY the corrected JSON with no additional text or explanations.
+The result must be valid JSON that can be parsed by json.loads().
 
 Here's the malformed JSON:
 {json_content}
-
-Return ONLY the fixed JSON with no additional text. The result must be valid JSON that can be parsed by json.loads().
 """
 
+        # Normalize every prompt once ("compact" also drops examples); see PROMPT_ATTRIBUTES
+        self.prompts = PromptCompiler(settings.PROMPT_VARIANT)
+        for name in PROMPT_ATTRIBUTES:
+            setattr(self, name, self.prompts.compile(name, getattr(self, name)))
+
 
 
 
@@ -0,0 +1,66 @@
+import logging
+from typing import Optional
+
+from .planning_service import PlanningService
+from .jobs import PlanJobQueue
+from .sessions import SessionStore, build_session_store
+
+logger = logging.getLogger(__name__)
+
+# Application-scoped service graph, built once in the app lifespan
+_planning_service: Optional[PlanningService] = None
+_job_queue: Optional[PlanJobQueue] = None
+_session_store: Optional[SessionStore] = None
+
+def init_planning_service() -> PlanningService:
+    """Build the shared PlanningService (called on app startup)."""
+    global _planning_service
+    if _planning_service is None:
+        _planning_service = PlanningService()
+        logger.info("Planning service initialized")
+    return _planning_service
+
+def set_planning_service(service: Optional[PlanningService]) -> None:
+    """Replace the shared PlanningService, e.g. with a fake in tests.
+
+    Passing None clears it so the next request rebuilds the default graph.
+    """
+    global _planning_service
+    _planning_service = service
+
+def get_planning_service() -> PlanningService:
+    """FastAPI dependency returning the shared PlanningService."""
+    return _planning_service or init_planning_service()
+
+async def start_job_queue() -> PlanJobQueue:
+    """Start the background plan job workers (called on app startup)."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = PlanJobQueue(get_planning_service())
+        await _job_queue.start()
+    return _job_queue
+
+async def stop_job_queue() -> None:
+    """Stop the background plan job workers (called on app shutdown)."""
+    global _job_queue
+    if _job_queue is not None:
+        await _job_queue.stop()
+    _job_queue = None
+
+def get_job_queue() -> PlanJobQueue:
+    """FastAPI dependency returning the running job queue."""
+    if _job_queue is None:
+        raise RuntimeError("Job queue is not running")
+    return _job_queue
+
+def set_session_store(store: Optional[SessionStore]) -> None:
+    """Replace the shared session store (None rebuilds it from settings on next use)."""
+    global _session_store
+    _session_store = store
+
+def get_session_store() -> SessionStore:
+    """FastAPI dependency returning the shared conversation session store."""
+    global _session_store
+    if _session_store is None:
+        _session_store = build_session_store()
+    return _session_store
@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from common.schemas import TrainingPlan
+
+# One row per exercise (or per structured day, which has no exercises)
+EXPORT_COLUMNS = ["plan", "week", "day", "block", "exercise", "sets", "reps", "weight", "rest_seconds", "notes"]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "tsv": "text/tab-separated-values",
+    "ndjson": "application/x-ndjson",
+    "ics": "text/calendar",
+}
+
+_WEEKDAY_OFFSETS = {
+    name: offset for offset, name in enumerate(
+        ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    )
+}
+
+ExportablePlan = Union[TrainingPlan, List[Dict[str, Any]]]
+
+def _row(**values: Any) -> Dict[str, Any]:
+    return {column: values.get(column) for column in EXPORT_COLUMNS}
+
+def iter_plan_rows(plan: ExportablePlan, plan_index: int = 0) -> Iterator[Dict[str, Any]]:
+    """Yield exercise-level rows for a TrainingPlan or a structured weekly schedule."""
+    if isinstance(plan, TrainingPlan):
+        for week in plan.weeks:
+            for day in week.days:
+                for block in day.blocks:
+                    if not block.exercises:
+                        yield _row(
+                            plan=plan_index, week=week.week_number, day=day.day,
+                            block=block.name, notes=block.description,
+                        )
+                    for exercise in block.exercises:
+                        yield _row(
+                            plan=plan_index, week=week.week_number, day=day.day, block=block.name,
+                            exercise=exercise.name, sets=exercise.sets, reps=exercise.reps,
+                            weight=exercise.weight, rest_seconds=exercise.rest_seconds, notes=exercise.notes,
+                        )
+        return
+
+    for week in plan:
+        for day in week.get("days") or []:
+            yield _row(
+                plan=plan_index, week=week.get("week"), day=day.get("day"),
+                block=day.get("workout_type"), notes=day.get("details"),
+            )
+
+def iter_rows(plans: Iterable[ExportablePlan]) -> Iterator[Dict[str, Any]]:
+    """Yield rows for every plan, tagged with the plan's position."""
+    for index, plan in enumerate(plans):
+        yield from iter_plan_rows(plan, index)
+
+def export_delimited(rows: Iterable[Dict[str, Any]], delimiter: str = ",") -> Iterator[str]:
+    """Render rows as CSV/TSV lines, one line per yielded chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when there were no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Render rows as newline-delimited JSON objects."""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+def _ical_escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+def _ical_line(line: str) -> str:
+    """Fold a content line at 75 octets as required by RFC 5545."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Do not split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+def _describe_row(row: Dict[str, Any]) -> str:
+    if not row["exercise"]:
+        return row["notes"] or ""
+    detail = " x ".join(str(row[key]) for key in ("sets", "reps") if row[key] is not None)
+    parts = [row["exercise"] + (f": {detail}" if detail else "")]
+    if row["weight"]:
+        parts.append(f"@ {row['weight']}")
+    if row["rest_seconds"]:
+        parts.append(f"(rest {row['rest_seconds']}s)")
+    if row["notes"]:
+        parts.append(f"- {row['notes']}")
+    return " ".join(parts)
+
+def _next_monday(today: date) -> date:
+    return today + timedelta(days=(7 - today.weekday()) % 7 or 7)
+
+def export_ical(rows: Iterable[Dict[str, Any]], start_date: Optional[date] = None) -> Iterator[str]:
+    """Render rows as an iCalendar feed with one all-day event per training day.
+
+    Week 1 starts on `start_date` (shifted back to its Monday), defaulting to
+    next Monday. Days whose name is not a weekday are placed on the week's Monday.
+    """
+    week_one = start_date or _next_monday(date.today())
+    week_one -= timedelta(days=week_one.weekday())
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    yield _ical_line("BEGIN:VCALENDAR")
+    yield _ical_line("VERSION:2.0")
+    yield _ical_line("PRODID:-//Hybrid Training Planner//Plan Export//EN")
+    # Rows arrive grouped by plan, week and day, so one day is held in memory at a time
+    for (plan, week, day), day_rows in groupby(rows, key=lambda row: (row["plan"], row["week"], row["day"])):
+        day_rows = list(day_rows)
+        week_number = week if isinstance(week, int) and week > 0 else 1
+        day_name = str(day or "")
+        offset = _WEEKDAY_OFFSETS.get(day_name.split()[0].lower(), 0) if day_name else 0
+        event_date = week_one + timedelta(weeks=week_number - 1, days=offset)
+        blocks = list(dict.fromkeys(row["block"] for row in day_rows if row["block"]))
+        summary = ", ".join(blocks) or "Training"
+        description = "\n".join(_describe_row(row) for row in day_rows)
+
+        yield _ical_line("BEGIN:VEVENT")
+        yield _ical_line(f"UID:plan{plan}-week{week_number}-{day_name.lower().replace(' ', '-') or 'day'}@hybrid-training")
+        yield _ical_line(f"DTSTAMP:{stamp}")
+        yield _ical_line(f"DTSTART;VALUE=DATE:{event_date.strftime('%Y%m%d')}")
+        yield _ical_line(f"DTEND;VALUE=DATE:{(event_date + timedelta(days=1)).strftime('%Y%m%d')}")
+        yield _ical_line(f"SUMMARY:{_ical_escape(f'Week {week_number} {day_name}: {summary}'.strip())}")
+        yield _ical_line(f"DESCRIPTION:{_ical_escape(description)}")
+        yield _ical_line("END:VEVENT")
+    yield _ical_line("END:VCALENDAR")
+
+def export_plans(
+    plans: Iterable[ExportablePlan], export_format: str, start_date: Optional[date] = None
+) -> Iterator[str]:
+    """Render plans in an export format as a stream of text chunks."""
+    rows = iter_rows(plans)
+    if export_format == "csv":
+        return export_delimited(rows, ",")
+    if export_format == "tsv":
+        return export_delimited(rows, "\t")
+    if export_format == "ndjson":
+        return export_ndjson(rows)
+    if export_format == "ics":
+        return export_ical(rows, start_date)
+    raise ValueError(f"Unknown export format '{export_format}'")
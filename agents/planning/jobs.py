@@ -0,0 +1,397 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.config import settings
+from common.sqlite import connect, run_blocking
+from common.webhooks import post_webhook
+from .schemas import PlanJobRequest, PlanJobResponse
+from .planning_service import PlanningService
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFullError(RuntimeError):
+    """Raised when the job queue cannot accept more work."""
+
+class JobStore(ABC):
+    """Base class for background job storage.
+
+    A running job holds a lease that its worker renews with `heartbeat`; a job
+    whose lease has lapsed (its worker process died) can be claimed again.
+    """
+
+    # Whether calls may block on I/O and should run off the event loop
+    blocking = False
+
+    @abstractmethod
+    def create(self, job: PlanJobResponse, request: PlanJobRequest) -> None:
+        """Store a new job with the request it runs."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[PlanJobResponse]:
+        """Return a job, or None if it is unknown."""
+
+    @abstractmethod
+    def get_request(self, job_id: str) -> Optional[PlanJobRequest]:
+        """Return the request a job was created with, or None if it is unknown."""
+
+    @abstractmethod
+    def update(self, job: PlanJobResponse) -> None:
+        """Store a job's new status or result."""
+
+    @abstractmethod
+    def unfinished(self) -> List[str]:
+        """Ids of jobs that were queued or running, oldest first."""
+
+    @abstractmethod
+    def claim(self, job_id: str, lease_seconds: float) -> bool:
+        """Atomically mark a queued (or abandoned running) job as running; False if it was already taken."""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str) -> None:
+        """Renew the lease of a running job."""
+
+    @abstractmethod
+    def abandoned(self, lease_seconds: float) -> List[str]:
+        """Ids of running jobs whose lease has lapsed, oldest first."""
+
+    @abstractmethod
+    def requeue_running(self) -> int:
+        """Put jobs interrupted while running back in the queue, returning how many."""
+
+    @abstractmethod
+    def purge_expired(self, ttl_seconds: float) -> int:
+        """Delete finished jobs older than the TTL, returning how many were removed."""
+
+    def close(self) -> None:
+        pass
+
+class MemoryJobStore(JobStore):
+    """In-process job store; jobs are lost on restart."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Tuple[PlanJobResponse, PlanJobRequest]] = {}
+
+    def create(self, job: PlanJobResponse, request: PlanJobRequest) -> None:
+        self._jobs[job.job_id] = (job, request)
+
+    def get(self, job_id: str) -> Optional[PlanJobResponse]:
+        entry = self._jobs.get(job_id)
+        return entry[0] if entry else None
+
+    def get_request(self, job_id: str) -> Optional[PlanJobRequest]:
+        entry = self._jobs.get(job_id)
+        return entry[1] if entry else None
+
+    def update(self, job: PlanJobResponse) -> None:
+        request = self._jobs[job.job_id][1]
+        self._jobs[job.job_id] = (job, request)
+
+    def unfinished(self) -> List[str]:
+        jobs = [job for job, _ in self._jobs.values() if job.status in ("queued", "running")]
+        return [job.job_id for job in sorted(jobs, key=lambda job: job.created_at)]
+
+    def claim(self, job_id: str, lease_seconds: float) -> bool:
+        entry = self._jobs.get(job_id)
+        if entry is None:
+            return False
+        job, request = entry
+        now = time.time()
+        if job.status != "queued" and not (job.status == "running" and job.updated_at < now - lease_seconds):
+            return False
+        self._jobs[job_id] = (job.model_copy(update={"status": "running", "updated_at": now}), request)
+        return True
+
+    def heartbeat(self, job_id: str) -> None:
+        entry = self._jobs.get(job_id)
+        if entry is not None and entry[0].status == "running":
+            self._jobs[job_id] = (entry[0].model_copy(update={"updated_at": time.time()}), entry[1])
+
+    def abandoned(self, lease_seconds: float) -> List[str]:
+        cutoff = time.time() - lease_seconds
+        jobs = [job for job, _ in self._jobs.values() if job.status == "running" and job.updated_at < cutoff]
+        return [job.job_id for job in sorted(jobs, key=lambda job: job.created_at)]
+
+    def requeue_running(self) -> int:
+        running = [job_id for job_id, (job, _) in self._jobs.items() if job.status == "running"]
+        for job_id in running:
+            job, request = self._jobs[job_id]
+            self._jobs[job_id] = (job.model_copy(update={"status": "queued"}), request)
+        return len(running)
+
+    def purge_expired(self, ttl_seconds: float) -> int:
+        cutoff = time.time() - ttl_seconds
+        expired = [
+            job_id for job_id, (job, _) in self._jobs.items()
+            if job.status in ("complete", "failed") and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by SQLite; unfinished jobs are resumed after a restart."""
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "job TEXT NOT NULL, request TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _fetch(self, column: str, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {column} FROM plan_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def create(self, job: PlanJobResponse, request: PlanJobRequest) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO plan_jobs (job_id, status, created_at, updated_at, job, request) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job.job_id, job.status, job.created_at, job.updated_at,
+                 job.model_dump_json(), request.model_dump_json()),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[PlanJobResponse]:
+        data = self._fetch("job", job_id)
+        return PlanJobResponse.model_validate_json(data) if data else None
+
+    def get_request(self, job_id: str) -> Optional[PlanJobRequest]:
+        data = self._fetch("request", job_id)
+        return PlanJobRequest.model_validate_json(data) if data else None
+
+    def update(self, job: PlanJobResponse) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE plan_jobs SET status = ?, updated_at = ?, job = ? WHERE job_id = ?",
+                (job.status, job.updated_at, job.model_dump_json(), job.job_id),
+            )
+            self._conn.commit()
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM plan_jobs WHERE status IN ('queued', 'running') "
+                "ORDER BY created_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim(self, job_id: str, lease_seconds: float) -> bool:
+        # The status check and update run in one write transaction, so only one
+        # worker process wins a job
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE plan_jobs SET status = 'running', updated_at = ? WHERE job_id = ? "
+                "AND (status = 'queued' OR (status = 'running' AND updated_at < ?))",
+                (now, job_id, now - lease_seconds),
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE plan_jobs SET updated_at = ? WHERE job_id = ? AND status = 'running'",
+                (time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def abandoned(self, lease_seconds: float) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM plan_jobs WHERE status = 'running' AND updated_at < ? ORDER BY created_at",
+                (time.time() - lease_seconds,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def requeue_running(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE plan_jobs SET status = 'queued', job = json_set(job, '$.status', 'queued') "
+                "WHERE status = 'running'"
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def purge_expired(self, ttl_seconds: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM plan_jobs WHERE status IN ('complete', 'failed') AND updated_at < ?",
+                (time.time() - ttl_seconds,),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def build_job_store() -> JobStore:
+    """Build the job store configured in settings."""
+    backend = settings.JOB_STORE_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteJobStore(settings.JOB_STORE_PATH)
+    if backend != "memory":
+        logger.warning(f"Unknown job store backend '{backend}', using memory")
+    return MemoryJobStore()
+
+def requeue_interrupted_jobs() -> int:
+    """Requeue jobs left running by a previous run of the whole service.
+
+    Called once before worker processes start; workers started by a process
+    manager must not do this themselves, as the jobs may belong to a sibling.
+    """
+    store = build_job_store()
+    try:
+        count = store.requeue_running()
+    finally:
+        store.close()
+    if count:
+        logger.info(f"Requeued {count} interrupted plan jobs")
+    return count
+
+class PlanJobQueue:
+    """Bounded in-process worker pool that runs plan generation jobs."""
+
+    def __init__(
+        self,
+        planning_service: PlanningService,
+        store: Optional[JobStore] = None,
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+    ):
+        self.planning_service = planning_service
+        self.store = store or build_job_store()
+        self.workers = workers or settings.JOB_WORKERS
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size or settings.JOB_QUEUE_MAX_SIZE)
+        self.lease_seconds = settings.JOB_LEASE_SECONDS
+        self._tasks: List[asyncio.Task] = []
+        self._last_purge = time.time()
+
+    async def start(self) -> None:
+        """Start the workers and re-enqueue jobs left unfinished by a previous run."""
+        await run_blocking(self.store.purge_expired, settings.JOB_TTL_SECONDS)
+        if settings.JOB_RESUME_RUNNING:
+            await run_blocking(self.store.requeue_running)
+        # Jobs running in another worker process are skipped when they fail to be claimed
+        self._enqueue(await run_blocking(self.store.unfinished))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover_abandoned()))
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    def _enqueue(self, job_ids: List[str]) -> None:
+        for job_id in job_ids:
+            try:
+                self._queue.put_nowait(job_id)
+            except asyncio.QueueFull:
+                logger.warning(f"Job queue full, could not resume job {job_id}")
+                break
+
+    async def _recover_abandoned(self) -> None:
+        """Periodically pick up jobs whose worker process died while running them."""
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                job_ids = await run_blocking(self.store.abandoned, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Abandoned job scan failed: {str(e)}")
+                continue
+            if job_ids:
+                logger.warning(f"Resuming {len(job_ids)} plan jobs whose lease expired")
+                self._enqueue(job_ids)
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued jobs stay in the store."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job queue stopped")
+
+    async def submit(self, request: PlanJobRequest) -> PlanJobResponse:
+        """Enqueue a plan generation job and return its initial state."""
+        now = time.time()
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            await run_blocking(self.store.purge_expired, settings.JOB_TTL_SECONDS)
+        job = PlanJobResponse(job_id=uuid.uuid4().hex, status="queued", created_at=now, updated_at=now)
+        if self._queue.full():
+            raise JobQueueFullError("Job queue is full, try again later")
+        await run_blocking(self.store.create, job, request)
+        try:
+            self._queue.put_nowait(job.job_id)
+        except asyncio.QueueFull:
+            # Filled up while the job was being stored
+            await self._update(job, status="failed", error="Job queue is full")
+            raise JobQueueFullError("Job queue is full, try again later")
+        return job
+
+    async def get(self, job_id: str) -> Optional[PlanJobResponse]:
+        """Get the current state of a job."""
+        return await run_blocking(self.store.get, job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} worker error: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await run_blocking(self.store.get, job_id)
+        request = await run_blocking(self.store.get_request, job_id)
+        if job is None or request is None or not await run_blocking(self.store.claim, job_id, self.lease_seconds):
+            return
+
+        job = await self._update(job, status="running")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await self.planning_service.generate_plan(request)
+            job = await self._update(job, status="complete", result=result)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            job = await self._update(job, status="failed", error=str(e))
+        finally:
+            heartbeat.cancel()
+
+        if request.webhook_url:
+            await self._notify(job, str(request.webhook_url))
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew a running job's lease so other workers leave it alone."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 4)
+            try:
+                await run_blocking(self.store.heartbeat, job_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {job_id} failed: {str(e)}")
+
+    async def _update(self, job: PlanJobResponse, **changes: Any) -> PlanJobResponse:
+        job = job.model_copy(update={**changes, "updated_at": time.time()})
+        await run_blocking(self.store.update, job)
+        return job
+
+    async def _notify(self, job: PlanJobResponse, url: str) -> None:
+        """POST the finished job to its webhook URL."""
+        try:
+            await post_webhook(url, job.model_dump_json())
+        except Exception as e:
+            logger.error(f"Webhook delivery for job {job.job_id} failed: {str(e)}")
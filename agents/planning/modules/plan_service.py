@@ -1,42 +1,292 @@
-import json
+import asyncio
 import logging
 import io
 import csv
-from typing import List, Dict, Any, Optional, Tuple
+import json
+import re
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Union
+
+from pydantic import ValidationError
 
-from common.llm import LLMClient
-from common.schemas import Message, Role, TrainingPlan
+from common.cache import ResponseCache
+from common.concurrency import as_completed_bounded, gather_or_cancel
+from common.json_repair import JSONRepairError, parse_json, repair_json_with_llm
+from common.json_stream import IncrementalJSONParser
+from common.llm import LLMClient, count_tokens
+from common.metrics import PLAN_TEMPLATES, span
+from common.schemas import Message, Role, TrainingBlock, TrainingPlan, TrainingWeek
+from common.sqlite import run_blocking
 from ..schemas import GeneratePlanRequest, GeneratePlanResponse
 from ..config import PlanningConfig
+from .plan_templates import (
+    PlanFeatureExtractor,
+    days_per_week,
+    get_plan_template_store,
+    plan_template_key,
+    remap_days,
+    schedule_days,
+)
 
 logger = logging.getLogger(__name__)
 
+def _coerce_int(value: Any) -> Optional[int]:
+    """Read a leading integer from values like "3", "3-4" or "90s"."""
+    if value is None or isinstance(value, int):
+        return value
+    match = re.match(r"\s*(\d+)", str(value))
+    return int(match.group(1)) if match else None
+
+def _coerce_training_plan(plan_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fix the small schema slips LLMs make before validating against TrainingPlan."""
+    weeks = []
+    for index, week in enumerate(plan_data.get("weeks") or []):
+        if not isinstance(week, dict):
+            continue
+        days = []
+        for day in week.get("days") or []:
+            if not isinstance(day, dict):
+                continue
+            blocks = []
+            for block in day.get("blocks") or []:
+                if not isinstance(block, dict):
+                    continue
+                exercises = []
+                for exercise in block.get("exercises") or []:
+                    if isinstance(exercise, str):
+                        exercise = {"name": exercise}
+                    if not isinstance(exercise, dict) or not exercise.get("name"):
+                        continue
+                    exercise = dict(exercise)
+                    exercise["sets"] = _coerce_int(exercise.get("sets"))
+                    exercise["rest_seconds"] = _coerce_int(exercise.get("rest_seconds"))
+                    for key in ("reps", "weight", "notes"):
+                        if exercise.get(key) is not None and not isinstance(exercise[key], str):
+                            exercise[key] = str(exercise[key])
+                    exercises.append(exercise)
+                blocks.append({**block, "name": block.get("name") or "Session", "exercises": exercises})
+            days.append({**day, "day": str(day.get("day") or ""), "blocks": blocks})
+        week_number = _coerce_int(week.get("week_number", week.get("week"))) or index + 1
+        weeks.append({"week_number": week_number, "days": days})
+    return {**plan_data, "weeks": weeks}
+
 class PlanGenerationService:
     """Service for generating training plans based on user profiles."""
 
-    def __init__(self, config: Optional[PlanningConfig] = None, llm: Optional[LLMClient] = None):
+    def __init__(
+        self,
+        config: Optional[PlanningConfig] = None,
+        llm: Optional[LLMClient] = None,
+        templates: Optional[ResponseCache] = None
+    ):
         self.config = config or PlanningConfig()
         self.llm = llm or LLMClient()
-
+        self.feature_extractor = PlanFeatureExtractor(self.config)
+        self._templates = templates
+    
+    @property
+    def templates(self) -> Optional[ResponseCache]:
+        """Store of plans keyed by normalized profile features (None if disabled)."""
+        return self._templates or get_plan_template_store()
+    
     async def generate_plan(self, request: GeneratePlanRequest) -> GeneratePlanResponse:
         """Generate a complete training plan based on user profile."""
-        # Step 1: Always generate conversational guidelines first
-        training_plan, guidelines = await self._generate_plan_guidelines(request)
+        template_key = None
+        if self.templates is not None:
+            features = self.feature_extractor.features(request.profile, request.plan_parameters)
+            if features is None:
+                PLAN_TEMPLATES.inc(result="skipped")
+            else:
+                template_key = plan_template_key(features)
+                reused = await self._generate_from_template(request, template_key)
+                if reused is not None:
+                    return self._build_plan_response(request, *reused)
+        
+        training_plan, guidelines, structured_plan = await self._generate_new_plan(request)
+        if template_key is not None:
+            await self._save_template(template_key, request, training_plan, guidelines, structured_plan)
+        return self._build_plan_response(request, training_plan, guidelines, structured_plan)
+    
+    async def _generate_new_plan(
+        self, request: GeneratePlanRequest
+    ) -> Tuple[TrainingPlan, str, Optional[List[Dict[str, Any]]]]:
+        """Generate a plan from scratch with the configured generation mode."""
+        structured_plan = None
+        
+        if self.config.plan_generation_mode in ("single_call", "week_parallel"):
+            if self._use_week_parallel(request):
+                combined = await self._generate_week_parallel_plan(request)
+            else:
+                combined = await self._generate_combined_plan(request)
+            if combined is not None:
+                training_plan, guidelines = combined
+                if self._needs_structured_plan(request):
+                    structured_plan = self._training_plan_to_structured(training_plan)
+                return training_plan, guidelines, structured_plan
+            logger.warning("Structured plan generation failed, falling back to separate guideline and schedule calls")
+        
+        if self._needs_structured_plan(request) and not self.config.structured_plan_from_guidelines:
+            # Guidelines and the structured schedule both derive from the profile, so
+            # generate them concurrently; if either fails the other is cancelled
+            (training_plan, guidelines), structured_plan = await gather_or_cancel(
+                self._generate_plan_guidelines(request),
+                self._generate_structured_plan(request)
+            )
+        else:
+            # Step 1: Always generate conversational guidelines first
+            training_plan, guidelines = await self._generate_plan_guidelines(request)
+            
+            # Step 2: Convert guidelines to structured data if another format is requested
+            if self._needs_structured_plan(request):
+                structured_plan = await self._guidelines_to_structured_plan(guidelines, request)
+        
+        return training_plan, guidelines, structured_plan
+    
+    async def _generate_from_template(
+        self, request: GeneratePlanRequest, template_key: str
+    ) -> Optional[Tuple[TrainingPlan, str, Optional[List[Dict[str, Any]]]]]:
+        """Reuse the plan stored for profiles with the same features.
+        
+        The schedule is moved onto the client's training days locally and only the
+        guidelines get an LLM pass (on the small model) to personalize them.
+        
+        Returns:
+            Tuple of (training plan, guidelines, structured plan), or None on a miss
+        """
+        value = await run_blocking(self.templates.get, template_key)
+        template = json.loads(value) if value is not None else None
+        # Templates saved from a guidelines-only request cannot serve table/csv
+        if template is not None and self._needs_structured_plan(request):
+            if template.get("structured_plan") is None and not template["plan"]["weeks"]:
+                template = None
+        if template is None:
+            PLAN_TEMPLATES.inc(result="miss")
+            return None
+        PLAN_TEMPLATES.inc(result="hit")
+        
+        plan_data = template["plan"]
+        structured_plan = template.get("structured_plan")
+        target_days = schedule_days(request.profile.get("weekly_schedule"))
+        remap_days(plan_data["weeks"], template.get("days") or [], target_days)
+        if structured_plan is not None:
+            remap_days(structured_plan, template.get("days") or [], target_days)
+        
+        training_plan = TrainingPlan.model_validate(plan_data)
+        if self._needs_structured_plan(request):
+            if structured_plan is None:
+                structured_plan = self._training_plan_to_structured(training_plan)
+        else:
+            structured_plan = None
+        
+        guidelines = await self._personalize_guidelines(request, template["guidelines"])
+        return training_plan, guidelines, structured_plan
+    
+    async def _personalize_guidelines(self, request: GeneratePlanRequest, guidelines: str) -> str:
+        """Rewrite template guidelines for this client."""
+        user_prompt = f"""Client profile:
+{self._format_profile_block(request)}
+
+The plan is {request.plan_parameters.duration_weeks} weeks long with a {request.plan_parameters.emphasis} emphasis.
+
+Original message:
+{guidelines}"""
+        messages = [
+            Message(role=Role.SYSTEM, content=self.config.template_personalization_prompt),
+            Message(role=Role.USER, content=user_prompt)
+        ]
+        max_tokens = self._max_tokens("personalize", count_tokens(guidelines))
+        with span("template_personalization"):
+            result = await self.llm.generate(
+                messages, max_tokens=max_tokens, route=self.config.model_routes["personalize"]
+            )
+        return result.strip() or guidelines
+    
+    async def _save_template(
+        self,
+        template_key: str,
+        request: GeneratePlanRequest,
+        training_plan: TrainingPlan,
+        guidelines: str,
+        structured_plan: Optional[List[Dict[str, Any]]]
+    ) -> None:
+        """Store a freshly generated plan for reuse by profiles with the same features.
+
+        Plans missing some of their weeks are never stored.
+        """
+        if training_plan.weeks and len(training_plan.weeks) < request.plan_parameters.duration_weeks:
+            logger.warning("Not saving an incomplete plan as a template")
+            return
+        template = {
+            "guidelines": guidelines,
+            "plan": training_plan.model_dump(),
+            "structured_plan": structured_plan,
+            "days": schedule_days(request.profile.get("weekly_schedule")),
+        }
+        await run_blocking(self.templates.set, template_key, json.dumps(template, ensure_ascii=False))
+    
+    async def generate_plan_stream(
+        self, request: GeneratePlanRequest
+    ) -> AsyncIterator[Union[str, GeneratePlanResponse]]:
+        """Stream plan guidelines as they are generated.
+        
+        Yields guideline text chunks as they arrive from the LLM, followed by
+        a single GeneratePlanResponse once generation is finished.
+        """
+        messages = self._build_plan_guidelines_messages(request)
         
-        # Step 2: Check if we need to convert to other formats
+        # Start the structured schedule in the background while guidelines stream
+        structured_task = None
+        if self._needs_structured_plan(request) and not self.config.structured_plan_from_guidelines:
+            structured_task = asyncio.ensure_future(self._generate_structured_plan(request))
+        
+        try:
+            chunks = []
+            with span("guidelines"):
+                async for chunk in self.llm.stream(
+                    messages, max_tokens=self._max_tokens("guidelines", request.plan_parameters.duration_weeks),
+                    route=self.config.model_routes["guidelines"]
+                ):
+                    chunks.append(chunk)
+                    yield chunk
+            
+            guidelines = "".join(chunks).strip()
+            structured_plan = None
+            if structured_task is not None:
+                structured_plan = await structured_task
+            elif self._needs_structured_plan(request):
+                structured_plan = await self._guidelines_to_structured_plan(guidelines, request)
+        finally:
+            if structured_task is not None and not structured_task.done():
+                structured_task.cancel()
+        
+        training_plan = self._build_plan_shell(request)
+        yield self._build_plan_response(request, training_plan, guidelines, structured_plan)
+    
+    def _max_tokens(self, task: str, units: int) -> int:
+        """Output limit for a task, scaled by its units of work (plan weeks or input tokens)."""
+        base, per_unit = self.config.output_token_budgets[task]
+        return self.llm.budget.output_tokens(base, per_unit, units, self.config.model_routes[task].max_tokens)
+    
+    def _needs_structured_plan(self, request: GeneratePlanRequest) -> bool:
+        """Whether the requested format requires a structured weekly schedule."""
+        return request.plan_parameters.format != 'guidelines'
+    
+    def _build_plan_response(
+        self,
+        request: GeneratePlanRequest,
+        training_plan: TrainingPlan,
+        guidelines: str,
+        structured_plan: Optional[List[Dict[str, Any]]] = None
+    ) -> GeneratePlanResponse:
+        """Build the plan response, rendering the structured plan in the requested format."""
         table_format = None
         csv_format = None
         
-        # If format is specified as something other than guidelines
-        if hasattr(request.plan_parameters, 'format') and request.plan_parameters.format != 'guidelines':
-            # Convert guidelines to structured data
-            structured_plan = await self._guidelines_to_structured_plan(guidelines, request)
-            
-            # Generate requested format
-            if request.plan_parameters.format == 'table':
-                table_format = self._structured_to_table(structured_plan)
-            elif request.plan_parameters.format == 'csv':
-                csv_format = self._structured_to_csv(structured_plan)
+        if structured_plan is not None:
+            with span("rendering"):
+                if request.plan_parameters.format == 'table':
+                    table_format = self._structured_to_table(structured_plan)
+                elif request.plan_parameters.format == 'csv':
+                    csv_format = self._structured_to_csv(structured_plan)
         
         profile_summary = {
             "goals": request.profile.get("training_goals"),
@@ -60,49 +310,324 @@ class PlanGenerationService:
         messages = self._build_plan_guidelines_messages(request)
         
         # Get response from LLM
-        result = await self.llm.generate(messages)
+        with span("guidelines"):
+            result = await self.llm.generate(
+                messages, max_tokens=self._max_tokens("guidelines", request.plan_parameters.duration_weeks),
+                route=self.config.model_routes["guidelines"]
+            )
         guidelines = result.strip()
         
-        # Create a minimal plan structure for the response
+        return self._build_plan_shell(request), guidelines
+    
+    def _build_plan_shell(self, request: GeneratePlanRequest) -> TrainingPlan:
+        """Create a minimal plan structure for the response."""
         # In MVP, this will be mostly empty as we're focusing on the guidelines
-        plan = TrainingPlan(
+        return TrainingPlan(
             title=f"{request.plan_parameters.duration_weeks}-Week Hybrid Training Plan",
             description=f"A {request.plan_parameters.emphasis} training program customized to your profile",
             weeks=[]
         )
+    
+    async def _generate_combined_plan(self, request: GeneratePlanRequest) -> Optional[Tuple[TrainingPlan, str]]:
+        """Generate guidelines and a full TrainingPlan in a single LLM call.
+
+        Returns:
+            Tuple of (training plan, guidelines), or None if the output could not be validated
+        """
+        messages = self._build_plan_generation_messages(request, self.config.combined_plan_system_prompt)
+        with span("plan_generation"):
+            result = await self.llm.generate(
+                messages, max_tokens=self._max_tokens("plan", request.plan_parameters.duration_weeks),
+                route=self.config.model_routes["plan"]
+            )
         
-        return plan, guidelines
+        with span("plan_validation"):
+            try:
+                document = parse_json(result)
+            except JSONRepairError:
+                logger.warning("Invalid JSON response for combined plan. Attempting to repair...")
+                document = await repair_json_with_llm(
+                    self.llm, self.config.json_repair_prompt, result, route=self.config.model_routes["repair"]
+                )
+            return self._validate_combined_plan(document, request)
     
-    async def _guidelines_to_structured_plan(self, guidelines: str, request: GeneratePlanRequest) -> List[Dict[str, Any]]:
-        """Convert conversational guidelines to a structured plan format."""
-        system_prompt = """You are an expert at converting conversational training plan guidelines into structured data.
-Given a conversational training plan, extract a structured weekly schedule.
-Return a valid JSON array of weekly plans where each week contains an array of daily workouts.
-
-Format your response as a valid JSON array with this structure:
-[
-  {
-    "week": 1,
-    "days": [
-      {
-        "day": "Monday",
-        "workout_type": "Strength",
-        "details": "Upper body focus: 3 sets of 8-10 reps"
-      },
-      {
-        "day": "Tuesday", 
-        "workout_type": "Run", 
-        "details": "Easy 5km run"
-      },
-      ...
-    ]
-  },
-  ...
-]
-
-DO NOT include any explanatory text or markdown formatting. ONLY return the valid JSON array.
+    def _use_week_parallel(self, request: GeneratePlanRequest) -> bool:
+        """Whether to generate the plan week by week from a skeleton."""
+        if self.config.plan_generation_mode == "week_parallel":
+            return True
+        return request.plan_parameters.duration_weeks >= self.config.week_parallel_min_weeks
+    
+    async def _generate_week_parallel_plan(self, request: GeneratePlanRequest) -> Optional[Tuple[TrainingPlan, str]]:
+        """Generate a periodization skeleton, then every week concurrently.
+        
+        Each week is a separate, bounded completion, so long plans are not truncated
+        by max_tokens and wall-clock time stays close to a single week's. Only weeks
+        that fail are retried.
+        
+        Returns:
+            Tuple of (training plan, guidelines), or None if any week could not be generated
+        """
+        skeleton = await self._generate_skeleton(request)
+        if skeleton is None:
+            return None
+        skeleton_text = self._format_skeleton(skeleton)
+        
+        weeks: Dict[int, TrainingWeek] = {}
+        pending = list(range(1, request.plan_parameters.duration_weeks + 1))
+        for attempt in range(self.config.week_retries + 1):
+            if attempt:
+                logger.warning(f"Retrying plan weeks {pending}")
+            work = (self._generate_week(request, skeleton_text, week_number) for week_number in pending)
+            async for week_number, week in as_completed_bounded(work, self.config.week_concurrency):
+                if week is not None:
+                    weeks[week_number] = week
+            pending = [week_number for week_number in pending if week_number not in weeks]
+            if not pending:
+                break
+        
+        if pending:
+            # A plan with gaps is not returned (or saved as a template); the caller
+            # falls back to the guidelines and schedule calls
+            logger.error(f"Plan weeks {pending} could not be generated")
+            return None
+        
+        shell = self._build_plan_shell(request)
+        training_plan = TrainingPlan(
+            title=skeleton.get("title") or shell.title,
+            description=skeleton.get("description") or shell.description,
+            weeks=[weeks[week_number] for week_number in sorted(weeks)]
+        )
+        return training_plan, skeleton.get("guidelines") or training_plan.description
+    
+    async def _generate_skeleton(self, request: GeneratePlanRequest) -> Optional[Dict[str, Any]]:
+        """Generate the guidelines and a one-line-per-week periodization skeleton."""
+        user_prompt = f"""Design the periodization skeleton for a client with this profile:
+
+{self._format_profile_block(request)}
+
+The plan is {request.plan_parameters.duration_weeks} weeks long with a {request.plan_parameters.emphasis} emphasis.
+Include one entry for every week.
 """
+        messages = [
+            Message(role=Role.SYSTEM, content=self.config.skeleton_system_prompt),
+            Message(role=Role.USER, content=user_prompt)
+        ]
         
+        with span("plan_skeleton"):
+            result = await self.llm.generate(
+                messages, max_tokens=self._max_tokens("skeleton", request.plan_parameters.duration_weeks),
+                route=self.config.model_routes["skeleton"]
+            )
+            try:
+                skeleton = parse_json(result)
+            except JSONRepairError:
+                logger.warning("Invalid JSON response for plan skeleton. Attempting to repair...")
+                skeleton = await repair_json_with_llm(
+                    self.llm, self.config.json_repair_prompt, result, route=self.config.model_routes["repair"]
+                )
+        
+        if not isinstance(skeleton, dict):
+            logger.error("Plan skeleton is not a JSON object")
+            return None
+        outline = {
+            _coerce_int(week.get("week_number", week.get("week"))): week
+            for week in skeleton.get("weeks") or [] if isinstance(week, dict)
+        }
+        # Weeks the skeleton skipped still get generated, just without a stated focus
+        skeleton["weeks"] = [
+            outline.get(week_number) or {"week_number": week_number}
+            for week_number in range(1, request.plan_parameters.duration_weeks + 1)
+        ]
+        return skeleton
+    
+    def _format_skeleton(self, skeleton: Dict[str, Any]) -> str:
+        """Render the skeleton as one line per week for the week prompts."""
+        lines = []
+        for index, week in enumerate(skeleton["weeks"], start=1):
+            phase = f" ({week['phase']})" if week.get("phase") else ""
+            lines.append(f"- Week {index}{phase}: {week.get('focus') or 'Continue the progression'}")
+        return "\n".join(lines)
+    
+    async def _generate_week(
+        self, request: GeneratePlanRequest, skeleton_text: str, week_number: int
+    ) -> Tuple[int, Optional[TrainingWeek]]:
+        """Generate and validate a single week; failures return None so they can be retried."""
+        # The profile and skeleton are identical for every week, only the last line differs
+        user_prompt = f"""Client profile:
+{self._format_profile_block(request)}
+
+The plan is {request.plan_parameters.duration_weeks} weeks long with a {request.plan_parameters.emphasis} emphasis.
+
+Periodization skeleton:
+{skeleton_text}
+
+Write week {week_number} in full."""
+        messages = [
+            Message(role=Role.SYSTEM, content=self.config.week_plan_system_prompt),
+            Message(role=Role.USER, content=user_prompt)
+        ]
+        
+        # Sized by training days; a schedule without a recognisable day count gets a full week
+        max_tokens = self._max_tokens("week", days_per_week(request.profile.get("weekly_schedule")) or 7)
+        try:
+            with span("plan_week"):
+                result = await self.llm.generate(
+                    messages, max_tokens=max_tokens, route=self.config.model_routes["week"]
+                )
+            data = parse_json(result)
+            if isinstance(data, dict) and isinstance(data.get("week"), dict):
+                data = data["week"]
+            coerced = _coerce_training_plan({"weeks": [data]})["weeks"]
+            if not coerced or not coerced[0]["days"]:
+                logger.warning(f"Plan week {week_number} has no training days")
+                return week_number, None
+            return week_number, TrainingWeek.model_validate({**coerced[0], "week_number": week_number})
+        except Exception as e:
+            logger.warning(f"Plan week {week_number} failed: {str(e)}")
+            return week_number, None
+    
+    def _validate_combined_plan(self, document: Any, request: GeneratePlanRequest) -> Optional[Tuple[TrainingPlan, str]]:
+        """Validate a combined plan document against the TrainingPlan schema."""
+        if not isinstance(document, dict):
+            return None
+        # Accept a bare TrainingPlan as well as the {"guidelines", "plan"} wrapper
+        plan_data = document.get("plan") if isinstance(document.get("plan"), dict) else document
+        shell = self._build_plan_shell(request)
+        plan_data = {"title": shell.title, "description": shell.description, **plan_data}
+        
+        try:
+            training_plan = TrainingPlan.model_validate(_coerce_training_plan(plan_data))
+        except ValidationError as e:
+            logger.error(f"Combined plan failed schema validation: {str(e)}")
+            return None
+        if not training_plan.weeks:
+            logger.error("Combined plan has no weeks")
+            return None
+        if len(training_plan.weeks) < request.plan_parameters.duration_weeks:
+            logger.warning(
+                f"Combined plan has {len(training_plan.weeks)} of {request.plan_parameters.duration_weeks} weeks"
+            )
+        
+        guidelines = document.get("guidelines")
+        if not isinstance(guidelines, str) or not guidelines.strip():
+            guidelines = training_plan.notes or training_plan.description
+        return training_plan, guidelines.strip()
+    
+    def _training_plan_to_structured(self, training_plan: TrainingPlan) -> List[Dict[str, Any]]:
+        """Flatten a TrainingPlan into the week/day rows used for table and CSV rendering."""
+        return [
+            {
+                "week": week.week_number,
+                "days": [
+                    {
+                        "day": day.day,
+                        "workout_type": " + ".join(block.name for block in day.blocks),
+                        "details": "; ".join(self._describe_block(block) for block in day.blocks),
+                    }
+                    for day in week.days
+                ],
+            }
+            for week in training_plan.weeks
+        ]
+    
+    def _describe_block(self, block: TrainingBlock) -> str:
+        """Summarize a block as e.g. "Strength: Back Squat 5x5 @ 75%, Plank 3x45s"."""
+        exercises = []
+        for exercise in block.exercises:
+            text = exercise.name
+            if exercise.sets and exercise.reps:
+                text += f" {exercise.sets}x{exercise.reps}"
+            elif exercise.sets or exercise.reps:
+                text += f" {exercise.sets or exercise.reps}"
+            if exercise.weight:
+                text += f" @ {exercise.weight}"
+            exercises.append(text)
+        summary = ", ".join(exercises) or block.description or ""
+        return f"{block.name}: {summary}" if summary else block.name
+    
+    async def _generate_structured_plan(self, request: GeneratePlanRequest) -> List[Dict[str, Any]]:
+        """Generate a structured weekly schedule directly from the profile."""
+        messages = self._build_structured_plan_messages(request)
+        with span("structured_conversion"):
+            return [week async for week in self._stream_structured_weeks(messages, request.plan_parameters.duration_weeks)]
+    
+    def _build_structured_plan_messages(self, request: GeneratePlanRequest) -> List[Message]:
+        """Build messages for generating the structured schedule from the profile."""
+        user_prompt = f"""Design the structured workout schedule for a client with this profile:
+
+{self._format_profile_block(request)}
+
+The plan is {request.plan_parameters.duration_weeks} weeks long with a {request.plan_parameters.emphasis} emphasis.
+Include every week and each training day's workout type and details.
+"""
+        
+        return [
+            Message(role=Role.SYSTEM, content=self.config.structured_plan_system_prompt),
+            Message(role=Role.USER, content=user_prompt)
+        ]
+    
+    async def generate_structured_plan_stream(
+        self, request: GeneratePlanRequest
+    ) -> AsyncIterator[Union[Dict[str, Any], GeneratePlanResponse]]:
+        """Stream the structured schedule week by week.
+        
+        Yields {"week": ..., "rows": ...} for each week as soon as its JSON closes,
+        where rows are the week's table/CSV rows (the first week's include the
+        header), followed by a single GeneratePlanResponse once the guidelines,
+        generated concurrently, are finished.
+        """
+        delimiter = "," if request.plan_parameters.format == "csv" else "\t"
+        guidelines_task = asyncio.ensure_future(self._generate_plan_guidelines(request))
+        try:
+            structured_plan = []
+            with span("structured_conversion"):
+                async for week in self._stream_structured_weeks(
+                    self._build_structured_plan_messages(request), request.plan_parameters.duration_weeks
+                ):
+                    rows = None
+                    if self._needs_structured_plan(request):
+                        rows = self._render_structured_plan([week], delimiter, header=not structured_plan)
+                    structured_plan.append(week)
+                    yield {"week": week, "rows": rows}
+            training_plan, guidelines = await guidelines_task
+        finally:
+            if not guidelines_task.done():
+                guidelines_task.cancel()
+        
+        yield self._build_plan_response(request, training_plan, guidelines, structured_plan)
+    
+    async def _stream_structured_weeks(self, messages: List[Message], weeks: int) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a structured schedule, yielding each week as soon as its JSON closes.
+        
+        Weeks completed before a truncated or malformed ending are kept. If no week
+        could be read incrementally, the full text goes through the usual repair path.
+        """
+        parser = IncrementalJSONParser()
+        chunks = []
+        emitted = 0
+        max_tokens = self._max_tokens("structured", weeks)
+        async for chunk in self.llm.stream(messages, max_tokens=max_tokens, route=self.config.model_routes["structured"]):
+            chunks.append(chunk)
+            for path, value in parser.feed(chunk):
+                # Accept a {"weeks": [...]} wrapper as well as a bare array
+                if path == ("weeks",) and isinstance(value, list):
+                    weeks = [week for week in value if isinstance(week, dict)]
+                elif isinstance(path[0], int) and isinstance(value, dict):
+                    weeks = [value]
+                else:
+                    continue
+                for week in weeks:
+                    emitted += 1
+                    yield week
+        
+        if not emitted:
+            for week in await self._parse_structured_plan("".join(chunks)):
+                yield week
+        elif not parser.complete:
+            logger.warning(f"Structured plan output was cut off, keeping {emitted} complete weeks")
+    
+    async def _guidelines_to_structured_plan(self, guidelines: str, request: GeneratePlanRequest) -> List[Dict[str, Any]]:
+        """Convert conversational guidelines to a structured plan format."""
         user_prompt = f"""Extract the structured workout schedule from these training plan guidelines:
 
 {guidelines}
@@ -112,20 +637,27 @@ Parse out each week's activities into a structured JSON format that shows each d
 """
         
         messages = [
-            Message(role=Role.SYSTEM, content=system_prompt),
+            Message(role=Role.SYSTEM, content=self.config.guidelines_to_structured_system_prompt),
             Message(role=Role.USER, content=user_prompt)
         ]
         
-        result = await self.llm.generate(messages)
-        result = result.strip()
-        
-        # Clean up the result to handle potential markdown code blocks
-        if result.startswith("```"):
-            result = result.strip("```")
-        
+        with span("structured_conversion"):
+            return [week async for week in self._stream_structured_weeks(messages, request.plan_parameters.duration_weeks)]
+    
+    async def _parse_structured_plan(self, result: str) -> List[Dict[str, Any]]:
+        """Parse the LLM's structured plan output, repairing it if needed."""
         try:
-            structured_plan = json.loads(result)
-        except json.JSONDecodeError:
+            structured_plan = parse_json(result)
+        except JSONRepairError:
+            logger.warning("Invalid JSON response for structured plan. Attempting to repair...")
+            structured_plan = await repair_json_with_llm(
+                self.llm, self.config.json_repair_prompt, result, route=self.config.model_routes["repair"]
+            )
+        
+        # Accept a {"weeks": [...]} wrapper as well as a bare array
+        if isinstance(structured_plan, dict):
+            structured_plan = structured_plan.get("weeks")
+        if not isinstance(structured_plan, list):
             logger.error("Invalid JSON response for structured plan")
             structured_plan = []
         
@@ -133,63 +665,45 @@ Parse out each week's activities into a structured JSON format that shows each d
     
     def _structured_to_table(self, structured_plan: List[Dict[str, Any]]) -> str:
         """Convert structured plan to a table format."""
-        table = io.StringIO()
-        writer = csv.writer(table, delimiter='\t')
-        
-        # Write headers
-        writer.writerow(["Week", "Day", "Workout Type", "Details"])
-        
-        # Write rows
-        for week in structured_plan:
-            for day in week.get("days", []):
-                writer.writerow([week.get("week"), day.get("day"), day.get("workout_type"), day.get("details")])
-        
-        return table.getvalue()
+        return self._render_structured_plan(structured_plan, "\t")
     
     def _structured_to_csv(self, structured_plan: List[Dict[str, Any]]) -> str:
         """Convert structured plan to CSV format."""
-        csv_file = io.StringIO()
-        writer = csv.writer(csv_file)
+        return self._render_structured_plan(structured_plan, ",")
+    
+    def _render_structured_plan(
+        self, structured_plan: List[Dict[str, Any]], delimiter: str, header: bool = True
+    ) -> str:
+        """Render structured plan rows with the given delimiter."""
+        output = io.StringIO()
+        writer = csv.writer(output, delimiter=delimiter)
         
         # Write headers
-        writer.writerow(["Week", "Day", "Workout Type", "Details"])
+        if header:
+            writer.writerow(["Week", "Day", "Workout Type", "Details"])
         
         # Write rows
         for week in structured_plan:
             for day in week.get("days", []):
                 writer.writerow([week.get("week"), day.get("day"), day.get("workout_type"), day.get("details")])
         
-        return csv_file.getvalue()
+        return output.getvalue()
+    
+    def _format_profile_block(self, request: GeneratePlanRequest) -> str:
+        """Format the profile fields used by plan prompts as a bullet list."""
+        return f"""- Training history: {request.profile.get('training_history', 'Not specified')}
+- Fitness background: {request.profile.get('fitness_background', 'Not specified')}
+- Weekly schedule: {request.profile.get('weekly_schedule', 'Not specified')}
+- Available equipment: {request.profile.get('available_equipment', 'Not specified')}
+- Training goals: {request.profile.get('training_goals', 'Not specified')}
+- Health constraints: {request.profile.get('health_constraints', 'Not specified')}"""
     
     def _build_plan_guidelines_messages(self, request: GeneratePlanRequest) -> List[Message]:
         """Build messages for LLM to generate plan guidelines."""
-        system_prompt = """You are an expert hybrid training coach writing directly to your client about their personalized training plan.
-Speak as if you're having a one-on-one conversation with them.
-
-DO NOT use meta-commentary like "Here's a conversational overview" or "This is your plan".
-Instead, communicate directly: "I've created this 4-week plan for you based on your goals..."
-
-Your response should:
-- Use a warm, encouraging tone with "you" and "your" language
-- Begin with a brief personalized greeting acknowledging their specific situation
-- Explain the structure of their training weeks and progression
-- Describe the weekly balance of running and strength sessions
-- Address how you've adapted the plan for their specific goals and constraints
-- Include any special modifications based on their health concerns
-- End with an encouraging message about their fitness journey
-
-Keep it concise, motivational, and free of technical jargon.
-"""
-        
         user_prompt = f"""Create a personalized training plan message for a client with this profile:
 
 PROFILE:
-- Training history: {request.profile.get('training_history', 'Not specified')}
-- Fitness background: {request.profile.get('fitness_background', 'Not specified')}
-- Weekly schedule: {request.profile.get('weekly_schedule', 'Not specified')}
-- Available equipment: {request.profile.get('available_equipment', 'Not specified')}
-- Training goals: {request.profile.get('training_goals', 'Not specified')}
-- Health constraints: {request.profile.get('health_constraints', 'Not specified')}
+{self._format_profile_block(request)}
 
 PLAN PARAMETERS:
 - Duration: {request.plan_parameters.duration_weeks} weeks
@@ -199,31 +713,28 @@ Write directly to the client about their {request.plan_parameters.duration_weeks
 """
         
         return [
-            Message(role=Role.SYSTEM, content=system_prompt),
+            Message(role=Role.SYSTEM, content=self.config.plan_guidelines_system_prompt),
             Message(role=Role.USER, content=user_prompt)
         ]
     
-    def _build_plan_generation_messages(self, request: GeneratePlanRequest) -> List[Message]:
+    def _build_plan_generation_messages(
+        self, request: GeneratePlanRequest, system_prompt: Optional[str] = None
+    ) -> List[Message]:
         """Build messages for LLM based on request and system prompt for plan generation."""
         # Create a prompt that includes the profile and plan parameters
         user_prompt = f"""Generate a hybrid training plan with the following information:
 
 Profile:
-- Training history: {request.profile.get('training_history', 'Not specified')}
-- Fitness background: {request.profile.get('fitness_background', 'Not specified')}
-- Weekly schedule: {request.profile.get('weekly_schedule', 'Not specified')}
-- Available equipment: {request.profile.get('available_equipment', 'Not specified')}
-- Training goals: {request.profile.get('training_goals', 'Not specified')}
-- Health constraints: {request.profile.get('health_constraints', 'Not specified')}
+{self._format_profile_block(request)}
 
 Plan Parameters:
 - Duration: {request.plan_parameters.duration_weeks} weeks
 - Emphasis: {request.plan_parameters.emphasis}
 
-Return the full training plan as JSON that follows the TrainingPlan schema.
+Return the full training plan as JSON in the format described above.
 """
         messages = [
-            Message(role=Role.SYSTEM, content=self.config.plan_generation_system_prompt),
+            Message(role=Role.SYSTEM, content=system_prompt or self.config.plan_generation_system_prompt),
             Message(role=Role.USER, content=user_prompt)
         ]
         return messages
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from common.cache import MemoryResponseCache, ResponseCache, SQLiteResponseCache
+from common.config import settings
+from ..config import PlanningConfig
+from ..schemas import PlanParameters
+from .profile_service import (
+    DAY_RE,
+    FREQUENCY_RE,
+    NO_EQUIPMENT_RE,
+    NO_HEALTH_RE,
+    is_negation,
+    normalize_profile_value,
+    plain_negation,
+    vocabulary_re,
+)
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+_WEEKDAY_PREFIXES = {day[:3].lower(): day for day in WEEKDAYS}
+_NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+
+def schedule_days(schedule: Any) -> List[str]:
+    """Return the weekdays named in a schedule, in week order."""
+    days = set()
+    for match in DAY_RE.finditer(normalize_profile_value(schedule)):
+        word = match.group(0).lower()
+        if word.startswith("weekday"):
+            days.update(WEEKDAYS[:5])
+        elif word.startswith("weekend"):
+            days.update(WEEKDAYS[5:])
+        elif word.startswith("every") or word == "daily":
+            days.update(WEEKDAYS)
+        else:
+            days.add(_WEEKDAY_PREFIXES[word[:3]])
+    return [day for day in WEEKDAYS if day in days]
+
+def days_per_week(schedule: Any) -> Optional[int]:
+    """Number of training days in a schedule, from named days or an "N days a week" phrase."""
+    days = schedule_days(schedule)
+    if days:
+        return len(days)
+    match = FREQUENCY_RE.search(normalize_profile_value(schedule))
+    if match is None:
+        return None
+    count = match.group(0).split()[0].lower().rstrip("x")
+    return int(count) if count.isdigit() else _NUMBER_WORDS.get(count)
+
+def remap_days(weeks: List[Dict[str, Any]], source_days: List[str], target_days: List[str]) -> None:
+    """Move a template's sessions from its original training days onto the client's, in place.
+
+    Days are matched in week order; nothing changes unless both schedules name
+    the same number of days.
+    """
+    if not source_days or len(source_days) != len(target_days) or source_days == target_days:
+        return
+    mapping = dict(zip(source_days, target_days))
+    for week in weeks:
+        for day in week.get("days") or []:
+            name = str(day.get("day") or "")
+            source = _WEEKDAY_PREFIXES.get(name[:3].lower())
+            if source not in mapping:
+                continue
+            suffix = name[len(source):] if name.lower().startswith(source.lower()) else ""
+            day["day"] = mapping[source] + suffix
+
+def plan_template_key(features: Dict[str, Any]) -> str:
+    """Build a content-addressed key for a set of plan features."""
+    payload = json.dumps(features, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class PlanFeatureExtractor:
+    """Reduces a profile to the coarse features that decide what a plan looks like.
+
+    Two profiles with the same features (goal tags, training days per week,
+    equipment class, experience tier, duration and emphasis) can share a plan.
+    """
+
+    def __init__(self, config: PlanningConfig):
+        self.goal_res = {tag: vocabulary_re(words) for tag, words in config.template_goal_keywords.items()}
+        self.event_re = vocabulary_re(config.event_vocabulary)
+        self.equipment_res = {
+            name: vocabulary_re(words) for name, words in config.template_equipment_classes.items()
+        }
+        self.experience_res = {
+            tier: vocabulary_re(words) for tier, words in config.template_experience_tiers.items()
+        }
+
+    def features(self, profile: Dict[str, Any], parameters: PlanParameters) -> Optional[Dict[str, Any]]:
+        """Return the template features of a profile, or None if its plan must not be shared.
+
+        Profiles without a recognised goal, or with any health or movement
+        constraint, are too individual for a shared plan.
+        """
+        goals_text = " ".join(
+            normalize_profile_value(profile.get(field)) for field in ("training_goals", "event_targets")
+        )
+        goals = {tag for tag, pattern in self.goal_res.items() if pattern.search(goals_text)}
+        goals.update(match.lower() for match in self.event_re.findall(goals_text))
+        if not goals or self._has_constraints(profile):
+            return None
+
+        return {
+            "goals": sorted(goals),
+            "days_per_week": days_per_week(profile.get("weekly_schedule")),
+            "equipment": self._equipment_class(profile.get("available_equipment")),
+            "experience": self._experience_tier(profile.get("training_history")),
+            "duration_weeks": parameters.duration_weeks,
+            "emphasis": parameters.emphasis.strip().lower(),
+        }
+
+    def _equipment_class(self, value: Any) -> str:
+        text = normalize_profile_value(value)
+        if not text:
+            return "unknown"
+        if NO_EQUIPMENT_RE.search(text):
+            return "bodyweight"
+        for name, pattern in self.equipment_res.items():
+            if pattern.search(text):
+                return name
+        return "other"
+
+    def _experience_tier(self, value: Any) -> str:
+        text = normalize_profile_value(value)
+        if not text:
+            return "unknown"
+        for tier, pattern in self.experience_res.items():
+            if pattern.search(text):
+                return tier
+        return "other"
+
+    def _has_constraints(self, profile: Dict[str, Any]) -> bool:
+        health = profile.get("health_constraints")
+        text = normalize_profile_value(health)
+        if text and not is_negation(health) and not plain_negation(NO_HEALTH_RE, text):
+            return True
+        movement = profile.get("movement_limitations")
+        return bool(normalize_profile_value(movement)) and not is_negation(movement)
+
+def build_plan_template_store() -> Optional[ResponseCache]:
+    """Build the plan template store configured in settings, or None if disabled."""
+    backend = settings.PLAN_TEMPLATE_BACKEND.lower()
+    if backend == "memory":
+        return MemoryResponseCache(
+            max_entries=settings.PLAN_TEMPLATE_MAX_ENTRIES,
+            ttl_seconds=settings.PLAN_TEMPLATE_TTL_SECONDS,
+        )
+    if backend == "sqlite":
+        return SQLiteResponseCache(
+            path=settings.PLAN_TEMPLATE_PATH,
+            max_entries=settings.PLAN_TEMPLATE_MAX_ENTRIES,
+            ttl_seconds=settings.PLAN_TEMPLATE_TTL_SECONDS,
+            table="plan_templates",
+        )
+    if backend not in ("", "none"):
+        logger.warning(f"Unknown plan template backend '{backend}', plan templates disabled")
+    return None
+
+_plan_template_store: Optional[ResponseCache] = None
+
+def get_plan_template_store() -> Optional[ResponseCache]:
+    """Get the process-wide plan template store."""
+    global _plan_template_store
+    if _plan_template_store is None:
+        _plan_template_store = build_plan_template_store()
+    return _plan_template_store
+
+def set_plan_template_store(store: Optional[ResponseCache]) -> None:
+    """Replace the process-wide plan template store (e.g. in tests)."""
+    global _plan_template_store
+    _plan_template_store = store
@@ -1,32 +1,385 @@
+import asyncio
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import random
+import re
+from typing import List, Dict, Any, Optional, Tuple
 
+from common.json_repair import JSONRepairError, parse_json, repair_json_with_llm
 from common.llm import LLMClient
+from common.metrics import PROFILE_EXTRACTIONS, span
 from common.schemas import Message, Role
 from ..schemas import ProfileExtractRequest, ProfileExtractResponse
 from ..config import PlanningConfig
 
 logger = logging.getLogger(__name__)
 
+def normalize_profile_value(value: Any) -> str:
+    """Coerce a profile value to text; LLMs sometimes return lists or objects for a field."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(filter(None, (normalize_profile_value(item) for item in value)))
+    if isinstance(value, dict):
+        return "; ".join(
+            f"{key}: {text}" for key, text in ((k, normalize_profile_value(v)) for k, v in value.items()) if text
+        )
+    return str(value)
+
+def normalize_profile(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce every profile value to text."""
+    return {field: normalize_profile_value(value) for field, value in profile_data.items()}
+
+def is_negation(value: Any) -> bool:
+    """Whether a value records that the user has none of something."""
+    return isinstance(value, str) and value.lower().startswith("user stated they don't have")
+
+def _merge_values(current: Any, new: Any, rule: str) -> Any:
+    """Combine an existing field value with a newly extracted one.
+
+    A negation ("user stated they don't have any ...") only replaces a value
+    under the "replace" rule; it never erases what an append field collected.
+    """
+    if rule == "keep":
+        return current
+    if rule != "append":
+        return new
+    if is_negation(new):
+        return current
+    if isinstance(current, list) and isinstance(new, list):
+        return current + [item for item in new if item not in current]
+    current_text, new_text = str(current), str(new)
+    if new_text.lower() in current_text.lower():
+        return current
+    if current_text.lower() in new_text.lower():
+        return new
+    return f"{current_text}; {new_text}"
+
+_MONTHS = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+# Only full day names: abbreviations like "Sun" or "Wed" are too often ordinary words
+DAY_RE = re.compile(
+    r"\b(?i:monday|tuesday|wednesday|thursday|friday|saturday|sunday)s?\b"
+    r"|\b(?i:weekdays?|weekends?|every ?day|daily)\b"
+)
+_TIME_WINDOW_RE = re.compile(
+    r"\b(?:early |late )?(?:mornings?|afternoons?|evenings?|nights?|lunch ?(?:time|breaks?)?|"
+    r"before work|after work)\b",
+    re.IGNORECASE,
+)
+FREQUENCY_RE = re.compile(
+    r"\b(?:\d|one|two|three|four|five|six|seven)\s*(?:x|times|days|sessions)\s*(?:a|per|/|each)\s*week\b",
+    re.IGNORECASE,
+)
+NO_EQUIPMENT_RE = re.compile(
+    r"\b(?:no|don'?t have any|do not have any|without any|zero)\s+(?:equipment|gym(?: access)?)\b",
+    re.IGNORECASE,
+)
+NO_HEALTH_RE = re.compile(
+    r"\b(?:no|zero|don'?t have any|do not have any|never had any)\s+(?:current\s+)?"
+    r"(?:injur(?:y|ies)|health (?:issues|problems|constraints|conditions)|medical (?:issues|conditions))\b"
+    r"|\binjury[- ]free\b|\bfully healthy\b",
+    re.IGNORECASE,
+)
+_NO_MOVEMENT_RE = re.compile(
+    r"\b(?:no|don'?t have any|do not have any)\s+(?:movement |mobility )?(?:limitations|restrictions)\b"
+    r"|\bmove (?:fine|well)\b",
+    re.IGNORECASE,
+)
+_MOVEMENT_RE = re.compile(
+    r"\b(?:can'?t|cannot|can not|unable to)\s+(?:squat|deadlift|run|jump|press|lunge|bend|kneel|lift overhead|go overhead)\b"
+    r"|\b(?:limited|poor|restricted) (?:mobility|range of motion)\b",
+    re.IGNORECASE,
+)
+_NO_EVENT_RE = re.compile(
+    r"\bno (?:specific |particular )?(?:events?|races?|competitions?)\b"
+    r"|\bnot (?:training|preparing) for (?:an?|any) (?:specific )?(?:event|race|competition)\b",
+    re.IGNORECASE,
+)
+_EVENT_CONTEXT_RE = re.compile(
+    r"\b(?:race|event|compete|competing|competition|signed up|registered|preparing for|training for)\b"
+    rf"|\b(?:on|in)\s+{_MONTHS}\b|\b\d{{1,2}}/\d{{1,2}}\b",
+    re.IGNORECASE,
+)
+# A negation with an exception ("no injuries besides the knee") is not a negation
+_QUALIFIER_RE = re.compile(r"\b(?:but|besides|except|though|although|apart from|other than)\b", re.IGNORECASE)
+# Words before or after a vocabulary match that mean the user does not have it
+_NEGATED_BEFORE_RE = re.compile(r"\b(?:no|not|never|without|don'?t|doesn'?t|free of)\b", re.IGNORECASE)
+# Schedules also name days the user is not available ("can't train on Mondays")
+_UNAVAILABLE_BEFORE_RE = re.compile(
+    r"\b(?:no|not|never|without|don'?t|doesn'?t|can'?t|cannot|won'?t|busy|unavailable)\b", re.IGNORECASE
+)
+_NEGATED_AFTER_RE = re.compile(r"\b(?:anymore|any more|gone|healed|recovered)\b", re.IGNORECASE)
+_PREFERENCE_RE = re.compile(r"\b(?:prefer|like|love|enjoy|favou?rite)", re.IGNORECASE)
+_SENTENCE_RE = re.compile(r"[^.!?\n]+")
+_CLAUSE_RE = re.compile(r"[^.!?\n,;]+")
+
+def vocabulary_re(words: List[str], suffix: str = "") -> "re.Pattern[str]":
+    """Compile a vocabulary into one alternation, longest phrases first."""
+    alternation = "|".join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+    return re.compile(rf"\b(?i:{alternation})\b{suffix}")
+
+def _span_text(text: str, matches: List["re.Match[str]"], pattern: "re.Pattern[str]" = _SENTENCE_RE) -> str:
+    """Return the text from the first to the last match within each sentence (or clause)."""
+    parts = []
+    for unit in pattern.finditer(text):
+        inside = [m for m in matches if unit.start() <= m.start() < unit.end()]
+        if inside:
+            parts.append(text[inside[0].start():max(m.end() for m in inside)].strip())
+    return "; ".join(parts)
+
+def _containing(text: str, match: "re.Match[str]", pattern: "re.Pattern[str]" = _SENTENCE_RE) -> str:
+    """Return the sentence (or clause) that contains a match."""
+    for unit in pattern.finditer(text):
+        if unit.start() <= match.start() < unit.end():
+            return unit.group(0).strip()
+    return match.group(0)
+
+def plain_negation(pattern: "re.Pattern[str]", text: str) -> Optional["re.Match[str]"]:
+    """Find a negation whose sentence has no exception such as "but" or "besides"."""
+    for match in pattern.finditer(text):
+        if not _QUALIFIER_RE.search(_containing(text, match)):
+            return match
+    return None
+
+def _is_negated(
+    text: str, match: "re.Match[str]", before: "re.Pattern[str]" = _NEGATED_BEFORE_RE
+) -> bool:
+    """Whether a vocabulary match is negated within its clause ("no knee pain", "pain is gone").
+
+    A qualifier ends the negation's reach: in "no gym but a barbell" the barbell is kept.
+    """
+    for unit in _CLAUSE_RE.finditer(text):
+        if unit.start() <= match.start() < unit.end():
+            start, end = unit.start(), unit.end()
+            for qualifier in _QUALIFIER_RE.finditer(text, start, end):
+                if qualifier.end() <= match.start():
+                    start = qualifier.end()
+                elif qualifier.start() >= match.end():
+                    end = qualifier.start()
+                    break
+            return bool(
+                before.search(text, start, match.start())
+                or _NEGATED_AFTER_RE.search(text, match.end(), end)
+            )
+    return False
+
+class RuleBasedProfileExtractor:
+    """Fills profile fields stated in obvious forms without an LLM call.
+
+    Each extracted field comes with a confidence score between 0 and 1. Only
+    fields with an unambiguous surface form are handled (schedule, equipment,
+    health constraints, events, movement limitations and training style); goals,
+    history and background are left to the LLM.
+    """
+
+    def __init__(self, config: PlanningConfig):
+        self.equipment_re = vocabulary_re(config.equipment_vocabulary)
+        self.injury_re = vocabulary_re(config.injury_vocabulary)
+        self.style_re = vocabulary_re(config.training_style_vocabulary)
+        # Event names may be followed by a place and a date, e.g. "Hyrox Munich on July 6"
+        self.event_re = vocabulary_re(
+            config.event_vocabulary,
+            rf"(?:\s+[A-Z][\w-]+){{0,2}}(?:\s+(?i:on|in)\s+(?i:{_MONTHS})(?:\s+\d{{1,2}}(?:st|nd|rd|th)?)?)?",
+        )
+
+    def extract(self, text: str) -> Dict[str, Tuple[Any, float]]:
+        """Extract profile fields from text.
+
+        Returns:
+            Mapping of field name to (value, confidence)
+        """
+        fields: Dict[str, Tuple[Any, float]] = {}
+        for field, extractor in (
+            ("weekly_schedule", self._schedule),
+            ("available_equipment", self._equipment),
+            ("health_constraints", self._health),
+            ("event_targets", self._event),
+            ("movement_limitations", self._movement),
+            ("preferred_training_style", self._style),
+        ):
+            result = extractor(text)
+            if result is not None:
+                fields[field] = result
+        return fields
+
+    def _schedule(self, text: str) -> Optional[Tuple[str, float]]:
+        # "can't train on Mondays" names a day the user is not available
+        days = [match for match in DAY_RE.finditer(text) if not _is_negated(text, match, _UNAVAILABLE_BEFORE_RE)]
+        windows = list(_TIME_WINDOW_RE.finditer(text))
+        frequency = list(FREQUENCY_RE.finditer(text))
+        if days:
+            confidence = 0.9 if windows or frequency else 0.85
+            return _span_text(text, sorted(days + windows + frequency, key=lambda m: m.start())), confidence
+        if frequency:
+            return _span_text(text, sorted(frequency + windows, key=lambda m: m.start())), 0.75
+        return None
+
+    def _equipment(self, text: str) -> Optional[Tuple[str, float]]:
+        if plain_negation(NO_EQUIPMENT_RE, text):
+            return "user stated they don't have any equipment", 0.9
+        items: List[str] = []
+        for match in self.equipment_re.finditer(text):
+            if _is_negated(text, match):
+                continue
+            item = match.group(0).lower()
+            if item not in items:
+                items.append(item)
+        if not items:
+            return None
+        return ", ".join(items), 0.85
+
+    def _health(self, text: str) -> Optional[Tuple[str, float]]:
+        if plain_negation(NO_HEALTH_RE, text):
+            return "user stated they don't have any health constraints", 0.9
+        matches = [match for match in self.injury_re.finditer(text) if not _is_negated(text, match)]
+        if not matches:
+            return None
+        clauses = []
+        for match in matches:
+            clause = _containing(text, match, _CLAUSE_RE)
+            if clause not in clauses:
+                clauses.append(clause)
+        return "; ".join(clauses), 0.8
+
+    def _event(self, text: str) -> Optional[Tuple[str, float]]:
+        if plain_negation(_NO_EVENT_RE, text):
+            return "user stated they don't have any event", 0.85
+        match = self.event_re.search(text)
+        if not match:
+            return None
+        # Without race context "run a sub-20 5K" is a goal, not an event
+        confidence = 0.85 if _EVENT_CONTEXT_RE.search(_containing(text, match)) else 0.5
+        return match.group(0).strip(), confidence
+
+    def _movement(self, text: str) -> Optional[Tuple[str, float]]:
+        if plain_negation(_NO_MOVEMENT_RE, text):
+            return "user stated they don't have any movement limitations", 0.85
+        match = _MOVEMENT_RE.search(text)
+        if not match:
+            return None
+        return _containing(text, match, _CLAUSE_RE), 0.8
+
+    def _style(self, text: str) -> Optional[Tuple[str, float]]:
+        matches = list(self.style_re.finditer(text))
+        if not matches:
+            return None
+        styles = list(dict.fromkeys(m.group(0).lower() for m in matches))
+        confidence = 0.85 if any(_PREFERENCE_RE.search(_containing(text, m)) for m in matches) else 0.6
+        return ", ".join(styles), confidence
+
 class ProfileExtractionService:
     """Service for extracting user profile information from natural language inputs."""
 
     def __init__(self, config: Optional[PlanningConfig] = None, llm: Optional[LLMClient] = None):
         self.config = config or PlanningConfig()
         self.llm = llm or LLMClient()
+        self.question_table_overrides: Dict[str, List[str]] = {}
+        self.question_table = self._load_question_table()
+        self.rule_extractor = RuleBasedProfileExtractor(self.config)
+        # One alternation over all placeholder phrases, matched case-insensitively anywhere in a value
+        self.placeholder_re = re.compile(
+            "|".join(re.escape(p) for p in sorted(self.config.placeholder_phrases, key=len, reverse=True)),
+            re.IGNORECASE,
+        )
 
     async def extract_profile(self, request: ProfileExtractRequest) -> ProfileExtractResponse:
         """Extract profile data from user input and handle missing information."""
+        if request.profile_data:
+            # Follow-up turn: only extract what the new message adds to the known profile
+            return await self.extract_profile_update(
+                request.user_input,
+                request.profile_data,
+                self._last_question(request.conversation_history)
+            )
+
         # Get LLM response with profile data
         parsed_result = await self._extract_profile_data(request)
-        
+        return await self._build_extract_response(parsed_result, request.user_input)
+
+    async def extract_profile_update(
+        self,
+        user_input: str,
+        profile_data: Dict[str, Any],
+        last_question: Optional[str] = None
+    ) -> ProfileExtractResponse:
+        """Extract what a new message adds and merge it into an existing profile.
+
+        Only the last follow-up question and the new answer are sent to the LLM,
+        so the prompt stays the same size however long the conversation gets. Fields
+        the rules fill from this message are merged locally; in incremental mode the
+        prompt only covers the fields still missing after that, and the LLM is not
+        called at all when none are.
+        """
+        rule_fields = self._extract_rule_fields(user_input)
+        merged = self._merge_profile(profile_data, rule_fields)
+        missing_fields = self._get_missing_fields(merged)
+        incremental = bool(self.config.incremental_extraction and profile_data)
+        if incremental and rule_fields and not missing_fields:
+            PROFILE_EXTRACTIONS.inc(path="rules")
+            return await self._build_extract_response(merged, user_input)
+
+        narrowed = incremental and len(missing_fields) < len(self.config.required_fields)
+        PROFILE_EXTRACTIONS.inc(path="narrowed" if narrowed else "llm")
+        if narrowed:
+            system_prompt = self._build_incremental_prompt(missing_fields)
+        else:
+            system_prompt = self.config.profile_system_prompt
+
+        messages = [Message(role=Role.SYSTEM, content=system_prompt)]
+        if last_question:
+            messages.append(Message(role=Role.ASSISTANT, content=last_question))
+        messages.append(Message(role=Role.USER, content=user_input))
+
+        update = await self._run_profile_extraction(messages, len(missing_fields) if narrowed else None)
+        return await self._build_extract_response(self._merge_profile(merged, update), user_input)
+
+    def _build_incremental_prompt(self, missing_fields: List[str]) -> str:
+        """Build an extraction prompt that only asks for the given fields."""
+        fields = "\n".join(
+            f"- {field} ({self.config.field_descriptions.get(field, field)})" for field in missing_fields
+        )
+        return self.config.incremental_profile_prompt.format(fields=fields)
+
+    @staticmethod
+    def _last_question(history: Optional[List[Dict[str, str]]]) -> Optional[str]:
+        """Return the last assistant message in a conversation, if any."""
+        for msg in reversed(history or []):
+            if msg.get("role") == "assistant":
+                return msg.get("content")
+        return None
+
+    def _merge_profile(self, profile_data: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge newly extracted fields into a profile using the per-field merge rules.
+
+        Fields the update left empty never overwrite existing values.
+        """
+        merged = dict(profile_data)
+        empty_fields = set(self._get_missing_fields(update))
+        missing_fields = set(self._get_missing_fields(profile_data))
+        for field, value in update.items():
+            if field in empty_fields or not value:
+                continue
+            current = merged.get(field)
+            if field in missing_fields or not current or is_negation(current):
+                merged[field] = value
+            else:
+                rule = self.config.field_merge_rules.get(field, self.config.default_merge_rule)
+                merged[field] = _merge_values(current, value, rule)
+        return merged
+
+    async def _build_extract_response(self, parsed_result: Dict[str, Any], raw_input: str) -> ProfileExtractResponse:
+        """Find missing fields and ask a follow-up question for the most important one."""
         # Process missing fields
         missing_fields = self._get_missing_fields(parsed_result)
         
         # Check if profile is complete
         is_complete = len(missing_fields) == 0
-        print(f"missing fields: {missing_fields}")
+        logger.debug(f"Missing fields: {missing_fields}")
 
         # Generate follow-up questions if needed
         follow_up_questions = []
@@ -34,109 +387,137 @@ class ProfileExtractionService:
             # Prioritize which missing field to ask about first
             prioritized_fields = self._prioritize_missing_fields(missing_fields)
             # Generate one follow-up question for the highest priority missing field
-            follow_up_question = await self._generate_follow_up_question(prioritized_fields[:1])
+            with span("follow_up_question"):
+                follow_up_question = await self._generate_follow_up_question(prioritized_fields[:1])
             if follow_up_question:
                 follow_up_questions.append(follow_up_question)
 
         return ProfileExtractResponse(
             profile_data=parsed_result,
-            raw_input=request.user_input,
+            raw_input=raw_input,
             missing_fields=missing_fields,
             is_complete=is_complete,
             follow_up_questions=follow_up_questions
         )
         
     async def _extract_profile_data(self, request: ProfileExtractRequest) -> Dict[str, Any]:
-        """Extract profile data using LLM."""
+        """Extract profile data, asking the LLM only about fields the rules could not fill."""
         messages = self._build_profile_messages(request)
-        result = await self.llm.generate(messages)
+        user_text = "\n".join(m.content for m in messages if m.role == Role.USER)
+        rule_fields = self._extract_rule_fields(user_text)
+        if not rule_fields:
+            PROFILE_EXTRACTIONS.inc(path="llm")
+            return await self._run_profile_extraction(messages)
+
+        # Goals, history and background have no rules, so a first message always
+        # leaves some fields for the LLM; this only returns early if rules cover them all
+        remaining_fields = self._get_missing_fields(rule_fields)
+        if not remaining_fields:
+            PROFILE_EXTRACTIONS.inc(path="rules")
+            return rule_fields
+
+        PROFILE_EXTRACTIONS.inc(path="narrowed")
+        messages[0] = Message(role=Role.SYSTEM, content=self._build_incremental_prompt(remaining_fields))
+        update = await self._run_profile_extraction(messages, len(remaining_fields))
+        return self._merge_profile(rule_fields, update)
+
+    def _extract_rule_fields(self, text: str) -> Dict[str, Any]:
+        """Return the fields the rule-based extractor filled with enough confidence."""
+        if not self.config.rule_extraction:
+            return {}
+        threshold = self.config.rule_confidence_threshold
+        return {
+            field: value
+            for field, (value, confidence) in self.rule_extractor.extract(text).items()
+            if confidence >= threshold
+        }
+
+    async def _run_profile_extraction(self, messages: List[Message], field_count: Optional[int] = None) -> Dict[str, Any]:
+        """Send extraction messages to the LLM and parse the profile JSON it returns.
+
+        The output limit is sized to the number of fields asked for (all required
+        fields plus missing_fields by default).
+        """
+        route = self.config.model_routes["extraction"]
+        base, per_field = self.config.output_token_budgets["extraction"]
+        if field_count is None:
+            field_count = len(self.config.required_fields) + 1
+        max_tokens = self.llm.budget.output_tokens(base, per_field, field_count, route.max_tokens)
+        with span("profile_extraction"):
+            result = await self.llm.generate(messages, max_tokens=max_tokens, route=route)
         result = result.strip()
 
-        # Validate JSON response
-        try:
-            parsed_result = json.loads(result)
-        except json.JSONDecodeError:
-            logger.warning(f"Invalid JSON response from LLM. Attempting to repair...")
-            
-            # Try to repair the JSON
+        # Validate JSON response, repairing common formatting problems locally
+        with span("json_repair"):
             try:
-                repaired_json = await self._repair_json(result)
-                if repaired_json:
-                    parsed_result = repaired_json
-                else:
-                    logger.error("Could not repair JSON - repair failed")
+                parsed_result = parse_json(result)
+            except JSONRepairError:
+                logger.warning(f"Invalid JSON response from LLM. Attempting to repair...")
+            
+                # Fall back to asking the LLM to repair the JSON
+                try:
+                    repaired_json = await self._repair_json(result)
+                    if repaired_json:
+                        parsed_result = repaired_json
+                    else:
+                        logger.error("Could not repair JSON - repair failed")
+                        parsed_result = {}
+                except Exception as e:
+                    logger.error(f"Error during JSON repair: {str(e)}")
                     parsed_result = {}
-            except Exception as e:
-                logger.error(f"Error during JSON repair: {str(e)}")
-                parsed_result = {}
+        
+        if not isinstance(parsed_result, dict):
+            logger.error("Profile extraction did not return a JSON object")
+            parsed_result = {}
             
         # Remove missing_fields from the result if present
         if isinstance(parsed_result, dict) and "missing_fields" in parsed_result:
             parsed_result.pop("missing_fields", None)
             
-        return parsed_result
+        return normalize_profile(parsed_result)
     
     async def _repair_json(self, malformed_json: str) -> Optional[Dict[str, Any]]:
         """Attempt to repair malformed JSON by asking the LLM to fix it."""
-        try:
-            # Prepare prompt for JSON repair
-            repair_prompt = self.config.json_repair_prompt.format(json_content=malformed_json)
-            
-            # Send the repair request to the LLM
-            messages = [Message(role=Role.USER, content=repair_prompt)]
-            repaired_text = await self.llm.generate(messages)
-            repaired_text = repaired_text.strip()
-            
-            # Try to parse the repaired JSON
-            repaired_json = json.loads(repaired_text)
-            logger.info("Successfully repaired JSON")
-            return repaired_json
-        
-        except json.JSONDecodeError:
-            logger.error("JSON repair attempt failed - still invalid JSON")
-            return None
-        except Exception as e:
-            logger.error(f"Error during JSON repair attempt: {str(e)}")
-            return None
+        return await repair_json_with_llm(
+            self.llm, self.config.json_repair_prompt, malformed_json, route=self.config.model_routes["repair"]
+        )
     
     def _build_profile_messages(self, request: ProfileExtractRequest) -> List[Message]:
         """Build messages for LLM based on request and system prompt for profile extraction."""
         messages = [Message(role=Role.SYSTEM, content=self.config.profile_system_prompt)]
         
         if request.conversation_history:
-            for msg in request.conversation_history:
-                role = Role.USER if msg.get("role") == "user" else Role.ASSISTANT
-                messages.append(Message(role=role, content=msg.get("content", "")))
+            history = [
+                Message(role=Role.USER if msg.get("role") == "user" else Role.ASSISTANT, content=msg.get("content", ""))
+                for msg in request.conversation_history
+            ]
+            # Long conversations are trimmed, older turns condensed, to fit the history budget
+            messages.extend(self.llm.budget.fit_history(
+                history, self.config.history_token_budget, self.config.history_summary_tokens
+            ))
                 
         messages.append(Message(role=Role.USER, content=request.user_input))
         return messages
         
     def _get_missing_fields(self, profile_data: Dict[str, Any]) -> List[str]:
-        """Determine which required fields are missing from the profile data."""
-        missing_fields = []
-        for field in self.config.required_fields:
-            # Check if field is missing, empty, or contains placeholder text
-            value = profile_data.get(field)
-            
-            if (
-                field not in profile_data or 
-                not value or 
-                value == "" or 
-                value == "null" or
-                value is None or
-                isinstance(value, str) and any(placeholder in value.lower() for placeholder in [
-                    "no mention", 
-                    "not specified", 
-                    "not mentioned", 
-                    "not provided", 
-                    "unknown", 
-                    "unclear",
-                    "not stated",
-                    "not indicated"
-                ])
-            ):
-                missing_fields.append(field)
-        return missing_fields
+        """Determine which required fields are missing from the profile data.
+
+        A field is missing if it is absent, empty, "null" or contains placeholder text.
+        """
+        return [
+            field for field in self.config.required_fields
+            if self._is_missing_value(profile_data.get(field))
+        ]
+
+    def _is_missing_value(self, value: Any) -> bool:
+        text = normalize_profile_value(value)
+        return not text or text.lower() == "null" or self.placeholder_re.search(text) is not None
+
+    def get_missing_fields_batch(self, profiles: List[Dict[str, Any]]) -> List[List[str]]:
+        """Determine missing fields for many profiles at once, in input order."""
+        fields = self.config.required_fields
+        is_missing = self._is_missing_value
+        return [[field for field in fields if is_missing(profile.get(field))] for profile in profiles]
 
     def _prioritize_missing_fields(self, missing_fields: List[str]) -> List[str]:
         """Prioritize missing fields based on importance for hybrid training."""
@@ -145,11 +526,61 @@ class ProfileExtractionService:
                      if field in self.config.priority_order 
                      else len(self.config.priority_order))
     
+    def _load_question_table(self) -> Dict[str, List[str]]:
+        """Load the follow-up question table, applying overrides from the configured file."""
+        table = {field: list(questions) for field, questions in self.config.follow_up_question_table.items()}
+        
+        if self.config.question_table_path:
+            try:
+                with open(self.config.question_table_path, encoding="utf-8") as f:
+                    overrides = json.load(f)
+                for field, questions in overrides.items():
+                    self.question_table_overrides[field] = [questions] if isinstance(questions, str) else list(questions)
+                table.update(self.question_table_overrides)
+                logger.info(f"Loaded follow-up questions from {self.config.question_table_path}")
+            except (OSError, json.JSONDecodeError, AttributeError) as e:
+                logger.error(f"Could not load follow-up question table: {str(e)}")
+        
+        return table
+    
+    async def warm_question_table(self) -> None:
+        """Pre-generate LLM questions for every required field not supplied by the table file."""
+        fields = [field for field in self.config.required_fields if field not in self.question_table_overrides]
+        if not fields:
+            return
+        
+        questions = await asyncio.gather(
+            *(self._generate_llm_follow_up_question([field]) for field in fields),
+            return_exceptions=True
+        )
+        for field, question in zip(fields, questions):
+            if isinstance(question, Exception):
+                logger.error(f"Could not pre-generate question for {field}: {str(question)}")
+            elif question:
+                self.question_table[field] = [question]
+        logger.info(f"Pre-generated follow-up questions for {len(fields)} fields")
+    
+    def _lookup_follow_up_question(self, field: str) -> Optional[str]:
+        """Look up a pre-written follow-up question for a field."""
+        variants = self.question_table.get(field)
+        if not variants:
+            return None
+        return random.choice(variants)
+    
     async def _generate_follow_up_question(self, missing_fields: List[str]) -> Optional[str]:
         """Generate a follow-up question for missing profile information."""
         if not missing_fields:
             return None
-            
+        
+        if self.config.question_mode == "table":
+            question = self._lookup_follow_up_question(missing_fields[0])
+            if question or not self.config.question_llm_fallback:
+                return question
+        
+        return await self._generate_llm_follow_up_question(missing_fields)
+    
+    async def _generate_llm_follow_up_question(self, missing_fields: List[str]) -> Optional[str]:
+        """Ask the LLM to phrase a follow-up question for missing profile information."""
         missing_descriptions = [self.config.field_descriptions.get(field, field) for field in missing_fields]
         
         prompt = self.config.question_prompt_template.format(
@@ -161,7 +592,8 @@ class ProfileExtractionService:
             Message(role=Role.SYSTEM, content=self.config.question_system_prompt),
             Message(role=Role.USER, content=prompt)
         ]
-        question = await self.llm.generate(messages)
+        # The question depends only on the missing fields, so always reuse cached phrasing
+        question = await self.llm.generate(messages, cache=True, route=self.config.model_routes["question"])
         return question.strip().strip('"')
         
     # Helper method for conversation history
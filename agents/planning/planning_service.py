@@ -1,10 +1,21 @@
 import logging
+import time
+from typing import Any, Dict, List, Optional, AsyncIterator, Union
+
+from common.concurrency import as_completed_bounded
+from common.config import settings
+from common.llm import LLMClient
 
 from .schemas import (
     ProfileExtractRequest, 
     ProfileExtractResponse,
     GeneratePlanRequest, 
-    GeneratePlanResponse
+    GeneratePlanResponse,
+    ComprehensivePlanRequest,
+    ComprehensivePlanResponse,
+    BatchPlanResult,
+    ConversationSession,
+    ProfileValidationResult
 )
 from .config import PlanningConfig
 from .modules.profile_service import ProfileExtractionService
@@ -15,19 +26,173 @@ logger = logging.getLogger(__name__)
 class PlanningService:
     """Service for hybrid training planning, integrating profile extraction and plan generation."""
 
-    def __init__(self):
-        self.config = PlanningConfig()
-        self.profile_service = ProfileExtractionService(config=self.config)
-        self.plan_service = PlanGenerationService(config=self.config)
+    def __init__(self, config: Optional[PlanningConfig] = None, llm: Optional[LLMClient] = None):
+        self.config = config or PlanningConfig()
+        # A single LLM client is shared by both sub-services
+        self.llm = llm or LLMClient()
+        self.profile_service = ProfileExtractionService(config=self.config, llm=self.llm)
+        self.plan_service = PlanGenerationService(config=self.config, llm=self.llm)
 
+    async def warm_up(self) -> None:
+        """Run startup work: report prompt sizes and optionally pre-generate follow-up questions."""
+        for prompt in self.config.prompts.report():
+            logger.info(
+                f"Prompt {prompt['name']} ({prompt['variant']}): {prompt['tokens']} tokens, "
+                f"{prompt['static_prefix_tokens']} in static prefix {prompt['prefix_hash']}"
+            )
+        if settings.FOLLOW_UP_QUESTION_WARMUP:
+            await self.profile_service.warm_question_table()
+    
+    def prompt_report(self) -> List[Dict[str, Any]]:
+        """Token counts for the compiled system prompts."""
+        return self.config.prompts.report()
+    
     async def extract_profile(self, request: ProfileExtractRequest) -> ProfileExtractResponse:
         """Extract profile data from user input and handle missing information."""
         return await self.profile_service.extract_profile(request)
         
+    def validate_profiles(self, profiles: List[Dict[str, Any]]) -> List[ProfileValidationResult]:
+        """Check many profiles for missing fields without any LLM calls."""
+        return [
+            ProfileValidationResult(index=index, missing_fields=missing, is_complete=not missing)
+            for index, missing in enumerate(self.profile_service.get_missing_fields_batch(profiles))
+        ]
+        
     async def generate_plan(self, request: GeneratePlanRequest) -> GeneratePlanResponse:
         """Generate a complete training plan based on user profile."""
         return await self.plan_service.generate_plan(request)
+    
+    async def generate_comprehensive_plan(self, request: ComprehensivePlanRequest) -> ComprehensivePlanResponse:
+        """Extract a profile from user input and, if it is complete, generate a plan."""
+        profile_response = await self._extract_comprehensive_profile(request)
+        
+        # If profile is incomplete and follow-up questions are needed, return them
+        if not profile_response.is_complete:
+            return self._incomplete_response(profile_response)
+        
+        # Profile is complete, so generate a plan
+        plan_response = await self.generate_plan(self._comprehensive_plan_request(request, profile_response))
+        logger.info(f"Plan guidelines generated for {request.plan_parameters.duration_weeks}-week plan")
+        return self._complete_response(profile_response, plan_response)
+    
+    async def generate_comprehensive_plan_stream(
+        self, request: ComprehensivePlanRequest
+    ) -> AsyncIterator[Union[str, ComprehensivePlanResponse]]:
+        """Stream plan guideline chunks for the MVP flow, ending with the comprehensive response."""
+        profile_response = await self._extract_comprehensive_profile(request)
+        if not profile_response.is_complete:
+            yield self._incomplete_response(profile_response)
+            return
         
+        plan_request = self._comprehensive_plan_request(request, profile_response)
+        async for item in self.generate_plan_stream(plan_request):
+            if isinstance(item, GeneratePlanResponse):
+                logger.info(f"Plan guidelines generated for {request.plan_parameters.duration_weeks}-week plan")
+                yield self._complete_response(profile_response, item)
+            else:
+                yield item
+    
+    async def _extract_comprehensive_profile(self, request: ComprehensivePlanRequest) -> ProfileExtractResponse:
+        """Run the profile step of the MVP flow."""
+        profile_request = ProfileExtractRequest(
+            user_input=request.user_input,
+            conversation_history=request.conversation_history,
+            profile_data=request.profile_data
+        )
+        
+        profile_response = await self.extract_profile(profile_request)
+        logger.debug(f"Profile extracted: {profile_response.profile_data}")
+        logger.debug(f"Missing fields: {profile_response.missing_fields}")
+        return profile_response
+    
+    def _comprehensive_plan_request(
+        self, request: ComprehensivePlanRequest, profile_response: ProfileExtractResponse
+    ) -> GeneratePlanRequest:
+        return GeneratePlanRequest(
+            profile=profile_response.profile_data,
+            plan_parameters=request.plan_parameters
+        )
+    
+    def _incomplete_response(self, profile_response: ProfileExtractResponse) -> ComprehensivePlanResponse:
+        return ComprehensivePlanResponse(
+            status="incomplete_profile",
+            profile_data=profile_response.profile_data,
+            missing_fields=profile_response.missing_fields,
+            follow_up_questions=profile_response.follow_up_questions,
+            plan=None,
+            recommendations=[]
+        )
+    
+    def _complete_response(
+        self, profile_response: ProfileExtractResponse, plan_response: GeneratePlanResponse
+    ) -> ComprehensivePlanResponse:
+        return ComprehensivePlanResponse(
+            status="complete",
+            profile_data=profile_response.profile_data,
+            missing_fields=[],
+            follow_up_questions=[],
+            plan=plan_response.plan,
+            recommendations=plan_response.recommendations,
+            guidelines=plan_response.guidelines
+        )
+    
+    def generate_plan_stream(
+        self, request: GeneratePlanRequest
+    ) -> AsyncIterator[Union[str, GeneratePlanResponse]]:
+        """Stream plan guideline chunks, ending with the complete plan response."""
+        return self.plan_service.generate_plan_stream(request)
+        
+    def generate_structured_plan_stream(
+        self, request: GeneratePlanRequest
+    ) -> AsyncIterator[Union[Dict[str, Any], GeneratePlanResponse]]:
+        """Stream structured schedule weeks as they are parsed, ending with the complete plan response."""
+        return self.plan_service.generate_structured_plan_stream(request)
+    
+    async def process_batch(
+        self,
+        items: List[Union[GeneratePlanRequest, ComprehensivePlanRequest]],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[BatchPlanResult]:
+        """Process batch items concurrently, yielding results in completion order."""
+        limit = min(max_concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+        work = (self._process_batch_item(index, item) for index, item in enumerate(items))
+        async for result in as_completed_bounded(work, limit):
+            yield result
+    
+    async def _process_batch_item(
+        self, index: int, item: Union[GeneratePlanRequest, ComprehensivePlanRequest]
+    ) -> BatchPlanResult:
+        """Process a single batch item, capturing any error in the result."""
+        try:
+            if isinstance(item, ComprehensivePlanRequest):
+                result = await self.generate_comprehensive_plan(item)
+            else:
+                result = await self.generate_plan(item)
+            return BatchPlanResult(index=index, status="ok", result=result)
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {str(e)}")
+            return BatchPlanResult(index=index, status="error", error=str(e))
+    
+    async def process_session_message(self, session: ConversationSession, user_input: str) -> ConversationSession:
+        """Merge a new message into a session's profile and return the updated session."""
+        last_question = session.follow_up_questions[0] if session.follow_up_questions else None
+        response = await self.profile_service.extract_profile_update(
+            user_input, session.profile_data, last_question
+        )
+
+        history = session.history + [{"role": "user", "content": user_input}]
+        if response.follow_up_questions:
+            history.append({"role": "assistant", "content": response.follow_up_questions[0]})
+
+        return session.model_copy(update={
+            "profile_data": response.profile_data,
+            "missing_fields": response.missing_fields,
+            "is_complete": response.is_complete,
+            "follow_up_questions": response.follow_up_questions,
+            "history": history[-settings.SESSION_MAX_HISTORY:],
+            "updated_at": time.time(),
+        })
+    
     def build_next_conversation_history(self, current_history, response, follow_up_question):
         """Build conversation history for the next request."""
         return self.profile_service.build_next_conversation_history(
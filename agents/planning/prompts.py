@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List
+
+from common.llm import count_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_VARIANTS = ("full", "compact")
+
+_PUNCTUATION = str.maketrans({
+    "\u201c": '"', "\u201d": '"', "\u201e": '"', "\u2018": "'", "\u2019": "'",
+    "\u2013": "-", "\u2014": " - ", "\u2026": "...", "\u00a0": " ",
+})
+_PLACEHOLDER_RE = re.compile(r"\{[a-z_]+\}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_INNER_SPACES_RE = re.compile(r"(?<=\S) {2,}")
+_EXAMPLE_PAREN_RE = re.compile(r"\s*\((?:e\.g\.|for example)[^)]*\)")
+_EXAMPLE_SUFFIX_RE = re.compile(r"\s*Example:\s*$")
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A prompt normalized at startup, with its size and static prefix."""
+
+    name: str
+    text: str
+    tokens: int
+    # Text before the first runtime placeholder; identical across calls, so the
+    # provider can reuse its cached prefix
+    static_prefix_tokens: int
+    prefix_hash: str
+
+def normalize_prompt(text: str) -> str:
+    """Make a prompt byte-stable: ASCII punctuation, no emoji, no trailing or repeated blank space."""
+    text = text.translate(_PUNCTUATION)
+    # Drop emoji along with the space that followed them
+    text = "".join(
+        "\0" if unicodedata.category(c) == "So" or c in "\ufe0f\u200d" else c for c in text
+    )
+    text = re.sub("\0+ ?", "", text)
+    text = "\n".join(_INNER_SPACES_RE.sub(" ", line.rstrip()) for line in text.splitlines())
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+def compact_prompt(text: str) -> str:
+    """Shorten a normalized prompt: drop inline examples, quoted sample lines, bold markers and blank lines."""
+    lines = []
+    for line in text.splitlines():
+        if line.lstrip().startswith(">") or not line.strip():
+            continue
+        line = _EXAMPLE_PAREN_RE.sub("", line)
+        lines.append(_EXAMPLE_SUFFIX_RE.sub("", line).replace("**", ""))
+    return "\n".join(lines)
+
+@lru_cache(maxsize=None)
+def compile_prompt(name: str, template: str, variant: str = "full") -> CompiledPrompt:
+    """Normalize (and optionally compact) a prompt template once."""
+    text = normalize_prompt(template)
+    if variant == "compact":
+        text = compact_prompt(text)
+    placeholder = _PLACEHOLDER_RE.search(text)
+    prefix = text[:placeholder.start()] if placeholder else text
+    return CompiledPrompt(
+        name=name,
+        text=text,
+        tokens=count_tokens(text),
+        static_prefix_tokens=count_tokens(prefix),
+        prefix_hash=hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12],
+    )
+
+class PromptCompiler:
+    """Compiles the planning prompts once and keeps their token counts for reporting."""
+
+    def __init__(self, variant: str = "full"):
+        if variant not in PROMPT_VARIANTS:
+            logger.warning(f"Unknown prompt variant '{variant}', using full prompts")
+            variant = "full"
+        self.variant = variant
+        self.prompts: Dict[str, CompiledPrompt] = {}
+
+    def compile(self, name: str, template: str) -> str:
+        """Compile a prompt template, returning the text to send."""
+        compiled = compile_prompt(name, template, self.variant)
+        self.prompts[name] = compiled
+        return compiled.text
+
+    def report(self) -> List[Dict[str, object]]:
+        """Token counts per compiled prompt."""
+        return [
+            {
+                "name": prompt.name,
+                "variant": self.variant,
+                "tokens": prompt.tokens,
+                "static_prefix_tokens": prompt.static_prefix_tokens,
+                "prefix_hash": prompt.prefix_hash,
+            }
+            for prompt in self.prompts.values()
+        ]
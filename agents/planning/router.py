@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List
 
 
 from .schemas import (
@@ -9,62 +11,53 @@ from .schemas import (
     GeneratePlanRequest,
     GeneratePlanResponse,
     ComprehensivePlanRequest,
-    ComprehensivePlanResponse
+    ComprehensivePlanResponse,
+    BatchPlanRequest,
+    PlanJobRequest,
+    PlanJobResponse,
+    PlanParameters,
+    PlanExportRequest,
+    ConversationSession,
+    ProfileValidationRequest,
+    ProfileValidationResult,
+    PromptInfo,
+    SessionMessageRequest
 )
 from .planning_service import PlanningService
+from .dependencies import get_planning_service, get_job_queue, get_session_store
+from .sessions import SessionStore, new_session
+from .jobs import PlanJobQueue, JobQueueFullError
+from .exporters import EXPORT_MEDIA_TYPES, export_plans
+from common.config import settings
+from common.rate_limit import LLMUnavailableError
+from common.sqlite import run_blocking
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _llm_unavailable(error: LLMUnavailableError) -> HTTPException:
+    """Map an unavailable LLM provider to a 503 with a Retry-After hint."""
+    headers = {"Retry-After": str(int(error.retry_after) + 1)} if error.retry_after is not None else None
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"LLM provider temporarily unavailable: {str(error)}",
+        headers=headers
+    )
+
 @router.post("/generate-plan-mvp", response_model=ComprehensivePlanResponse)
-async def generate_comprehensive_plan(request: ComprehensivePlanRequest):
+async def generate_comprehensive_plan(
+    request: ComprehensivePlanRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
     """
     MVP endpoint that extracts profile and generates a plan in a single call.
     Takes user input directly and handles the entire flow internally.
     """
     try:
-        planning_service = PlanningService()
-        
-        # First, extract the profile from user input
-        profile_request = ProfileExtractRequest(
-            user_input=request.user_input,
-            conversation_history=request.conversation_history
-        )
-        
-        profile_response = await planning_service.extract_profile(profile_request)
-        print(f"Profile extracted: {profile_response.profile_data}")
-
-        print(f"Missing fields: {profile_response.missing_fields}")
-        # If profile is incomplete and follow-up questions are needed, return them
-        if not profile_response.is_complete:
-            return ComprehensivePlanResponse(
-                status="incomplete_profile",
-                profile_data=profile_response.profile_data,
-                missing_fields=profile_response.missing_fields,
-                follow_up_questions=profile_response.follow_up_questions,
-                plan=None,
-                recommendations=[]
-            )
-        
-        # Profile is complete, so generate a plan
-        plan_request = GeneratePlanRequest(
-            profile=profile_response.profile_data,
-            plan_parameters=request.plan_parameters
-        )
-        
-        plan_response = await planning_service.generate_plan(plan_request)
-        logger.info(f"Plan guidelines generated for {request.plan_parameters.duration_weeks}-week plan")
-        
-        return ComprehensivePlanResponse(
-            status="complete",
-            profile_data=profile_response.profile_data,
-            missing_fields=[],
-            follow_up_questions=[],
-            plan=plan_response.plan,
-            recommendations=plan_response.recommendations,
-            guidelines=plan_response.guidelines
-        )
-        
+        return await planning_service.generate_comprehensive_plan(request)
+    except LLMUnavailableError as e:
+        logger.error(f"Comprehensive plan generation error: {str(e)}")
+        raise _llm_unavailable(e)
     except Exception as e:
         logger.error(f"Comprehensive plan generation error: {str(e)}")
         raise HTTPException(
@@ -73,12 +66,17 @@ async def generate_comprehensive_plan(request: ComprehensivePlanRequest):
         )
 
 @router.post("/extract-profile", response_model=ProfileExtractResponse)
-async def extract_profile(request: ProfileExtractRequest):
+async def extract_profile(
+    request: ProfileExtractRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
     """Extract structured profile information from user input."""
     try:
-        planning_service = PlanningService()
         response = await planning_service.extract_profile(request)
         return response
+    except LLMUnavailableError as e:
+        logger.error(f"Profile extraction error: {str(e)}")
+        raise _llm_unavailable(e)
     except Exception as e:
         logger.error(f"Profile extraction error: {str(e)}")
         raise HTTPException(
@@ -87,12 +85,17 @@ async def extract_profile(request: ProfileExtractRequest):
         )
 
 @router.post("/generate-plan", response_model=GeneratePlanResponse)
-async def generate_plan(request: GeneratePlanRequest):
+async def generate_plan(
+    request: GeneratePlanRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
     """Generate a complete training plan based on user profile."""
     try:
-        planning_service = PlanningService()
         response = await planning_service.generate_plan(request)
         return response
+    except LLMUnavailableError as e:
+        logger.error(f"Plan generation error: {str(e)}")
+        raise _llm_unavailable(e)
     except Exception as e:
         logger.error(f"Plan generation error: {str(e)}")
         raise HTTPException(
@@ -100,6 +103,281 @@ async def generate_plan(request: GeneratePlanRequest):
             detail=f"Failed to generate plan: {str(e)}"
         )
 
+def _sse_event(event: str, data: Any) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap an SSE event generator in a streaming response."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/generate-plan-mvp/stream")
+async def generate_comprehensive_plan_stream(
+    request: ComprehensivePlanRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
+    """
+    Streaming variant of the MVP endpoint.
+    Emits `token` events with guideline text as it is generated, then a single
+    `complete` event carrying the ComprehensivePlanResponse.
+    """
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for item in planning_service.generate_comprehensive_plan_stream(request):
+                if isinstance(item, ComprehensivePlanResponse):
+                    yield _sse_event("complete", item.model_dump(mode="json"))
+                else:
+                    yield _sse_event("token", {"text": item})
+        except Exception as e:
+            logger.error(f"Comprehensive plan streaming error: {str(e)}")
+            yield _sse_event("error", {"detail": f"Failed to process plan: {str(e)}"})
+    
+    return _sse_response(events())
+
+@router.post("/generate-plan/stream")
+async def generate_plan_stream(
+    request: GeneratePlanRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
+    """
+    Streaming variant of plan generation.
+    Emits `token` events with guideline text as it is generated, then a single
+    `complete` event carrying the GeneratePlanResponse.
+    """
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for item in planning_service.generate_plan_stream(request):
+                if isinstance(item, GeneratePlanResponse):
+                    yield _sse_event("complete", item.model_dump(mode="json"))
+                else:
+                    yield _sse_event("token", {"text": item})
+        except Exception as e:
+            logger.error(f"Plan streaming error: {str(e)}")
+            yield _sse_event("error", {"detail": f"Failed to generate plan: {str(e)}"})
+    
+    return _sse_response(events())
+
+def _ndjson_event(event: str, data: Any) -> str:
+    """Format a single NDJSON line."""
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+@router.post("/generate-plan/structured/stream")
+async def generate_structured_plan_stream(
+    request: GeneratePlanRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
+    """
+    Stream the structured weekly schedule as NDJSON.
+    Emits a `week` line as soon as each week is parsed from the model output
+    (with its table/CSV rows for those formats), then a single `complete` line
+    carrying the GeneratePlanResponse.
+    """
+    async def lines() -> AsyncIterator[str]:
+        try:
+            async for item in planning_service.generate_structured_plan_stream(request):
+                if isinstance(item, GeneratePlanResponse):
+                    yield _ndjson_event("complete", item.model_dump(mode="json"))
+                else:
+                    yield _ndjson_event("week", item)
+        except Exception as e:
+            logger.error(f"Structured plan streaming error: {str(e)}")
+            yield _ndjson_event("error", {"detail": f"Failed to generate plan: {str(e)}"})
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/batch")
+async def batch_plans(
+    request: BatchPlanRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
+    """
+    Process many plan requests in one call.
+    Items run with bounded concurrency and results are streamed back as NDJSON
+    in completion order; each line carries the item index and either a result
+    or an error.
+    """
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the maximum of {settings.BATCH_MAX_ITEMS} items"
+        )
+    
+    async def lines() -> AsyncIterator[str]:
+        async for result in planning_service.process_batch(request.items, request.max_concurrency):
+            yield result.model_dump_json() + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/export")
+async def export_plans_file(request: PlanExportRequest):
+    """
+    Export plans as CSV, TSV, NDJSON or iCalendar.
+    Rows are rendered and streamed one at a time, so large cohort exports do
+    not build the whole file in memory.
+    """
+    if len(request.plans) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Export exceeds the maximum of {settings.BATCH_MAX_ITEMS} plans"
+        )
+    return StreamingResponse(
+        export_plans(request.plans, request.format, request.start_date),
+        media_type=EXPORT_MEDIA_TYPES[request.format],
+        headers={"Content-Disposition": f'attachment; filename="training-plans.{request.format}"'},
+    )
+
+@router.post("/profiles/validate", response_model=List[ProfileValidationResult])
+async def validate_profiles(
+    request: ProfileValidationRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+):
+    """Check many stored profiles for missing fields in one call (no LLM calls)."""
+    if len(request.profiles) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request exceeds the maximum of {settings.BATCH_MAX_ITEMS} profiles"
+        )
+    return planning_service.validate_profiles(request.profiles)
+
+@router.get("/prompts", response_model=List[PromptInfo])
+async def list_prompts(planning_service: PlanningService = Depends(get_planning_service)):
+    """Report the compiled system prompts' token counts and static prefix hashes."""
+    return planning_service.prompt_report()
+
+@router.post("/jobs", response_model=PlanJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_plan_job(
+    request: PlanJobRequest,
+    job_queue: PlanJobQueue = Depends(get_job_queue),
+):
+    """
+    Submit a plan generation job and return immediately.
+    Poll GET /jobs/{job_id} for the result, or pass webhook_url to have the
+    finished job POSTed back.
+    """
+    try:
+        return await job_queue.submit(request)
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+
+@router.get("/jobs/{job_id}", response_model=PlanJobResponse)
+async def get_plan_job(
+    job_id: str,
+    job_queue: PlanJobQueue = Depends(get_job_queue),
+):
+    """Get the status and, once complete, the result of a plan generation job."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found"
+        )
+    return job
+
+async def _get_session_or_404(store: SessionStore, session_id: str) -> ConversationSession:
+    session = await run_blocking(store.get, session_id)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session {session_id} not found or expired"
+        )
+    return session
+
+@router.post("/sessions", response_model=ConversationSession, status_code=status.HTTP_201_CREATED)
+async def create_session(
+    planning_service: PlanningService = Depends(get_planning_service),
+    session_store: SessionStore = Depends(get_session_store),
+):
+    """
+    Start a conversation session. The server keeps the profile and history, so
+    each turn only sends the new message to POST /sessions/{session_id}/messages.
+    """
+    session = new_session(planning_service.config.required_fields)
+    await run_blocking(session_store.save, session)
+    return session
+
+@router.get("/sessions/{session_id}", response_model=ConversationSession)
+async def get_session(session_id: str, session_store: SessionStore = Depends(get_session_store)):
+    """Get the accumulated profile and recent history of a session."""
+    return await _get_session_or_404(session_store, session_id)
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_session(session_id: str, session_store: SessionStore = Depends(get_session_store)):
+    """Delete a session."""
+    if not await run_blocking(session_store.delete, session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session {session_id} not found"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/sessions/{session_id}/messages", response_model=ConversationSession)
+async def add_session_message(
+    session_id: str,
+    request: SessionMessageRequest,
+    planning_service: PlanningService = Depends(get_planning_service),
+    session_store: SessionStore = Depends(get_session_store),
+):
+    """
+    Add a user message to a session. Only the new message (and the question it
+    answers) is sent for extraction; the result is merged into the stored profile.
+    Returns 409 if the session was changed or deleted while the message was processed.
+    """
+    session = await _get_session_or_404(session_store, session_id)
+    loaded_at = session.updated_at
+    try:
+        session = await planning_service.process_session_message(session, request.user_input)
+    except LLMUnavailableError as e:
+        logger.error(f"Session message error: {str(e)}")
+        raise _llm_unavailable(e)
+    except Exception as e:
+        logger.error(f"Session message error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process message: {str(e)}"
+        )
+    # Compare-and-set, so concurrent messages cannot overwrite each other's updates
+    if not await run_blocking(session_store.save, session, loaded_at):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Session {session_id} was changed or deleted by another request, retry the message"
+        )
+    return session
+
+@router.post("/sessions/{session_id}/plan", response_model=GeneratePlanResponse)
+async def generate_session_plan(
+    session_id: str,
+    plan_parameters: PlanParameters,
+    planning_service: PlanningService = Depends(get_planning_service),
+    session_store: SessionStore = Depends(get_session_store),
+):
+    """Generate a training plan from a session's completed profile."""
+    session = await _get_session_or_404(session_store, session_id)
+    if not session.is_complete:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Profile is incomplete, missing: {', '.join(session.missing_fields)}"
+        )
+    try:
+        return await planning_service.generate_plan(
+            GeneratePlanRequest(profile=session.profile_data, plan_parameters=plan_parameters)
+        )
+    except LLMUnavailableError as e:
+        logger.error(f"Session plan generation error: {str(e)}")
+        raise _llm_unavailable(e)
+    except Exception as e:
+        logger.error(f"Session plan generation error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate plan: {str(e)}"
+        )
+
 @router.post("/example", response_model=Dict[str, Any])
 async def planning_example():
     """Example of how to use the planning API in a workflow."""
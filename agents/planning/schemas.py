@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
-from typing import Dict, Any, List, Optional, Literal
+from datetime import date
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from typing import Dict, Any, List, Optional, Literal, Union
 from common.schemas import UserProfile, TrainingPlan
+from common.webhooks import check_webhook_host
 
 # Profile extraction schemas (moved from profile agent)
 class ProfileExtractRequest(BaseModel):
@@ -9,6 +11,8 @@ class ProfileExtractRequest(BaseModel):
                          description="The raw user input to extract profile information from")
     conversation_history: Optional[List[Dict[str, str]]] = Field(default=None,
                                                    description="Previous messages in conversation format [{role: content}]")
+    profile_data: Optional[Dict[str, Any]] = Field(default=None,
+                                             description="Profile from the previous turn; if set, only the new input is extracted and merged into it")
 
 class ProfileExtractResponse(BaseModel):
     """Response containing the extracted profile data."""
@@ -23,11 +27,32 @@ class ProfileExtractResponse(BaseModel):
     follow_up_questions: List[str] = Field(default_factory=list,
                                      description="Questions to ask to get missing information")
 
+class ProfileValidationRequest(BaseModel):
+    """Request to check many stored profiles for missing fields."""
+    profiles: List[Dict[str, Any]] = Field(..., description="Profiles to validate")
+
+class ProfileValidationResult(BaseModel):
+    """Missing-field check for a single profile."""
+    index: int = Field(..., description="Position of the profile in the request")
+    missing_fields: List[str] = Field(default_factory=list,
+                                 description="Fields that are missing from the fitness profile")
+    is_complete: bool = Field(..., description="Whether the profile has all required fitness information")
+
+class PromptInfo(BaseModel):
+    """Size of a compiled system prompt."""
+    name: str = Field(..., description="Prompt name")
+    variant: str = Field(..., description="Prompt variant (full or compact)")
+    tokens: int = Field(..., description="Estimated prompt tokens")
+    static_prefix_tokens: int = Field(..., description="Estimated tokens before the first runtime placeholder")
+    prefix_hash: str = Field(..., description="Hash of the static prefix, stable across requests")
+
 # Plan generation schemas
 class PlanParameters(BaseModel):
     """Parameters for plan generation."""
     duration_weeks: int = Field(default=4, description="Duration of plan in weeks")
     emphasis: str = Field(default="balanced", description="Training emphasis (e.g., running, strength, balanced)")
+    format: Literal["guidelines", "table", "csv"] = Field(default="guidelines",
+                                                   description="Output format; table/csv also return a structured weekly schedule")
 
 class GeneratePlanRequest(BaseModel):
     """Request to generate a training plan."""
@@ -48,6 +73,15 @@ class GeneratePlanResponse(BaseModel):
     csv_format: Optional[str] = Field(default=None,
                                description="Plan formatted as CSV")
 
+class PlanExportRequest(BaseModel):
+    """Request to export plans as a file stream."""
+    plans: List[Union[TrainingPlan, List[Dict[str, Any]]]] = Field(...,
+                                                             description="TrainingPlans, or structured weekly schedules as streamed by /generate-plan/structured/stream")
+    format: Literal["csv", "tsv", "ndjson", "ics"] = Field(default="csv",
+                                                      description="Export format; csv/tsv/ndjson have one row per exercise, ics one event per training day")
+    start_date: Optional[date] = Field(default=None,
+                                  description="A date in week 1 for iCalendar events; weeks start on Monday (defaults to next Monday)")
+
 # Comprehensive MVP endpoint schemas that combines profile extraction and plan generation
 class ComprehensivePlanRequest(BaseModel):
     """Request for the MVP endpoint that handles the entire flow."""
@@ -55,6 +89,8 @@ class ComprehensivePlanRequest(BaseModel):
                        description="The raw user input to extract profile information from")
     conversation_history: Optional[List[Dict[str, str]]] = Field(default=None,
                                                   description="Previous messages in conversation format [{role: content}]")
+    profile_data: Optional[Dict[str, Any]] = Field(default=None,
+                                             description="Profile from the previous turn; if set, only the new input is extracted and merged into it")
     plan_parameters: Optional[PlanParameters] = Field(default_factory=PlanParameters, 
                                                 description="Parameters for plan generation")
 
@@ -74,3 +110,64 @@ class ComprehensivePlanResponse(BaseModel):
                                   description="Additional recommendations based on the plan")
     guidelines: Optional[str] = Field(default=None, 
                                  description="Conversational plan guidelines (if profile is complete)")
+
+# Batch endpoint schemas for bulk profile extraction and plan generation
+class BatchPlanRequest(BaseModel):
+    """Request to process many plan requests in one call."""
+    items: List[Union[GeneratePlanRequest, ComprehensivePlanRequest]] = Field(...,
+                                                                           description="Plan requests; items with a profile generate a plan, items with user_input run the MVP flow")
+    max_concurrency: Optional[int] = Field(default=None, ge=1,
+                                      description="Maximum items processed at once (capped by the server limit)")
+
+class BatchPlanResult(BaseModel):
+    """Result for a single batch item, streamed back as one NDJSON line."""
+    index: int = Field(..., description="Position of the item in the request")
+    status: Literal["ok", "error"] = Field(..., description="Whether the item was processed successfully")
+    result: Optional[Union[GeneratePlanResponse, ComprehensivePlanResponse]] = Field(default=None,
+                                                                                description="Response for the item, if successful")
+    error: Optional[str] = Field(default=None, description="Error message, if the item failed")
+
+# Async job schemas for long-running plan generation
+class PlanJobRequest(GeneratePlanRequest):
+    """Request to generate a plan in the background."""
+    webhook_url: Optional[HttpUrl] = Field(default=None,
+                                      description="Public http(s) URL to POST the finished job to (optional)")
+
+    @field_validator("webhook_url")
+    @classmethod
+    def _public_webhook_host(cls, url: Optional[HttpUrl]) -> Optional[HttpUrl]:
+        if url is not None:
+            check_webhook_host(url.host or "")
+        return url
+
+class PlanJobResponse(BaseModel):
+    """State of a background plan generation job."""
+    job_id: str = Field(..., description="Identifier to poll with GET /jobs/{job_id}")
+    status: Literal["queued", "running", "complete", "failed"] = Field(...,
+                                                                  description="Current job status")
+    created_at: float = Field(..., description="Unix timestamp when the job was submitted")
+    updated_at: float = Field(..., description="Unix timestamp of the last status change")
+    result: Optional[GeneratePlanResponse] = Field(default=None,
+                                              description="The generated plan, once complete")
+    error: Optional[str] = Field(default=None, description="Error message, if the job failed")
+
+# Server-side conversation sessions, so clients send only the new message each turn
+class ConversationSession(BaseModel):
+    """Profile and conversation state kept on the server between turns."""
+    session_id: str = Field(..., description="Identifier to send with each new message")
+    profile_data: Dict[str, Any] = Field(default_factory=dict,
+                                      description="Profile accumulated over the conversation")
+    missing_fields: List[str] = Field(default_factory=list,
+                                 description="Fields that are still missing from the profile")
+    is_complete: bool = Field(default=False,
+                           description="Whether the profile has all required fitness information")
+    follow_up_questions: List[str] = Field(default_factory=list,
+                                      description="Questions to ask to get missing information")
+    history: List[Dict[str, str]] = Field(default_factory=list,
+                                     description="Recent messages in conversation format [{role: content}]")
+    created_at: float = Field(..., description="Unix timestamp when the session was created")
+    updated_at: float = Field(..., description="Unix timestamp of the last turn")
+
+class SessionMessageRequest(BaseModel):
+    """A new user message in a session."""
+    user_input: str = Field(..., description="The user's latest message")
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from common.config import settings
+from common.sqlite import connect
+from .schemas import ConversationSession
+
+logger = logging.getLogger(__name__)
+
+def new_session(required_fields: List[str]) -> ConversationSession:
+    """Create a conversation session with an empty profile."""
+    now = time.time()
+    return ConversationSession(
+        session_id=uuid.uuid4().hex,
+        missing_fields=list(required_fields),
+        created_at=now,
+        updated_at=now,
+    )
+
+class SessionStore(ABC):
+    """Base class for server-side conversation session storage.
+
+    Sessions expire after `ttl_seconds` without activity.
+    """
+
+    # Whether calls may block on I/O and should run off the event loop
+    blocking = False
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+
+    def _expired(self, session: ConversationSession) -> bool:
+        return self.ttl_seconds > 0 and time.time() - session.updated_at > self.ttl_seconds
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        """Return a session, or None if it is missing or expired."""
+
+    @abstractmethod
+    def save(self, session: ConversationSession, expected_updated_at: Optional[float] = None) -> bool:
+        """Store a session, returning whether it was written.
+
+        With `expected_updated_at` this is a compare-and-set: the session is only
+        replaced if the stored copy still has that `updated_at`, so a concurrent
+        update or a deletion made meanwhile is not overwritten.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Delete a session, returning whether it existed."""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete expired sessions, returning how many were removed."""
+
+class MemorySessionStore(SessionStore):
+    """In-process session store; sessions are lost on restart."""
+
+    def __init__(self, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self._sessions: Dict[str, ConversationSession] = {}
+        self._last_purge = time.time()
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        session = self._sessions.get(session_id)
+        if session is not None and self._expired(session):
+            del self._sessions[session_id]
+            return None
+        return session
+
+    def save(self, session: ConversationSession, expected_updated_at: Optional[float] = None) -> bool:
+        if expected_updated_at is not None:
+            current = self._sessions.get(session.session_id)
+            if current is None or current.updated_at != expected_updated_at:
+                return False
+        self._sessions[session.session_id] = session
+        if time.time() - self._last_purge > 60:
+            self.purge_expired()
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def purge_expired(self) -> int:
+        self._last_purge = time.time()
+        expired = [session_id for session_id, session in self._sessions.items() if self._expired(session)]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+class SQLiteSessionStore(SessionStore):
+    """Session store backed by SQLite, so sessions survive restarts."""
+
+    blocking = True
+
+    def __init__(self, path: str, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS planning_sessions ("
+            "session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, session TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session FROM planning_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        session = ConversationSession.model_validate_json(row[0])
+        if self._expired(session):
+            self.delete(session_id)
+            return None
+        return session
+
+    def save(self, session: ConversationSession, expected_updated_at: Optional[float] = None) -> bool:
+        with self._lock:
+            if expected_updated_at is None:
+                cursor = self._conn.execute(
+                    "INSERT OR REPLACE INTO planning_sessions (session_id, updated_at, session) VALUES (?, ?, ?)",
+                    (session.session_id, session.updated_at, session.model_dump_json()),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE planning_sessions SET updated_at = ?, session = ? "
+                    "WHERE session_id = ? AND updated_at = ?",
+                    (session.updated_at, session.model_dump_json(), session.session_id, expected_updated_at),
+                )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM planning_sessions WHERE session_id = ?", (session_id,)
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def purge_expired(self) -> int:
+        if self.ttl_seconds <= 0:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM planning_sessions WHERE updated_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+def build_session_store() -> SessionStore:
+    """Build the session store configured in settings."""
+    backend = settings.SESSION_STORE_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(settings.SESSION_STORE_PATH, settings.SESSION_TTL_SECONDS)
+    if backend != "memory":
+        logger.warning(f"Unknown session store backend '{backend}', using memory")
+    return MemorySessionStore(settings.SESSION_TTL_SECONDS)
@@ -0,0 +1,236 @@
+"""Local stand-in for the Groq chat completions API.
+
+Serves OpenAI-compatible responses with configurable latency, token rate,
+malformed-JSON rate and error injection so the planning pipeline can be
+load-tested offline. Point LLMClient at it with GROQ_BASE_URL.
+
+Usage:
+    python -m benchmarks.fake_groq --port 8765 --latency-ms 300 --tokens-per-second 250
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+COMPLETE_PROFILE = {
+    "training_history": "Runs 20 miles per week and lifts twice a week",
+    "fitness_background": "Former college soccer player",
+    "weekly_schedule": "Monday, Wednesday, Friday evenings and weekends",
+    "available_equipment": "Full commercial gym",
+    "training_goals": "Improve half marathon time while building muscle",
+    "health_constraints": "user stated they don't have any health constraints",
+    "event_targets": "Half marathon in October",
+    "movement_limitations": "user stated they don't have any movement limitations",
+    "preferred_training_style": "Intervals and heavy compound lifts",
+}
+
+# Marker a benchmark scenario puts in user input to get an incomplete profile back
+PARTIAL_MARKER = "[partial]"
+
+GUIDELINES = (
+    "I've built this plan around your running base and your goal of adding muscle. "
+    "Each week has three runs and two strength sessions, progressing volume gradually "
+    "before a lighter fourth week. Keep the easy runs truly easy so you recover for "
+    "the heavy lifting days, and let me know how your legs feel after the first week."
+)
+
+@dataclass
+class FakeGroqConfig:
+    latency_ms: float = 300.0
+    latency_sigma: float = 0.5
+    tokens_per_second: float = 250.0
+    malformed_json_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    server_error_rate: float = 0.0
+    retry_after_seconds: float = 1.0
+
+def _structured_plan(weeks: int) -> List[Dict[str, Any]]:
+    days = [("Monday", "Run", "Easy 5km"), ("Wednesday", "Strength", "Squat 5x5"),
+            ("Friday", "Run", "Intervals 6x800m"), ("Saturday", "Strength", "Deadlift 4x6")]
+    return [
+        {"week": week, "days": [{"day": d, "workout_type": t, "details": x} for d, t, x in days]}
+        for week in range(1, weeks + 1)
+    ]
+
+def _training_plan(weeks: int) -> Dict[str, Any]:
+    def block(name: str, exercises: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"name": name, "description": f"{name} session", "exercises": exercises}
+
+    days = [
+        {"day": "Monday", "blocks": [block("Easy Run", [{"name": "Easy run", "reps": "5km"}])]},
+        {"day": "Wednesday", "blocks": [block("Strength", [
+            {"name": "Back Squat", "sets": 5, "reps": "5", "weight": "75% 1RM", "rest_seconds": 120},
+            {"name": "Plank", "sets": 3, "reps": "45s"},
+        ])]},
+        {"day": "Friday", "blocks": [block("Intervals", [{"name": "800m repeats", "sets": 6, "reps": "800m"}])]},
+    ]
+    return {
+        "title": f"{weeks}-Week Hybrid Plan",
+        "description": "Three runs and two strength sessions per week",
+        "weeks": [{"week_number": week, "days": days} for week in range(1, weeks + 1)],
+    }
+
+def _respond_to(messages: List[Dict[str, str]]) -> str:
+    """Pick a plausible completion for the planning prompt that was sent."""
+    system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    last = messages[-1]["content"] if messages else ""
+    if "extract structured user profile" in system:
+        profile = dict(COMPLETE_PROFILE)
+        if PARTIAL_MARKER in last:
+            for field in ("weekly_schedule", "available_equipment", "health_constraints"):
+                profile[field] = ""
+        return json.dumps(profile)
+    if "JSON TrainingWeek object" in system:
+        week = int(re.search(r"Write week (\d+)", last).group(1))
+        return json.dumps(_training_plan(1)["weeks"][0] | {"week_number": week})
+    if "periodization skeleton" in system:
+        match = re.search(r"(\d+) weeks long", last)
+        weeks = int(match.group(1)) if match else 4
+        return json.dumps({
+            "guidelines": GUIDELINES,
+            "title": f"{weeks}-Week Hybrid Plan",
+            "description": "Progressive hybrid block",
+            "weeks": [{"week_number": w, "phase": "Build", "focus": "Add volume"} for w in range(1, weeks + 1)],
+        })
+    if '"guidelines"' in system and '"plan"' in system:
+        return json.dumps({"guidelines": GUIDELINES, "plan": _training_plan(4)})
+    if "JSON" in system and "week" in system:
+        return json.dumps(_structured_plan(4))
+    if "JSON formatting expert" in last:
+        return json.dumps(COMPLETE_PROFILE)
+    if "follow-up question" in last:
+        return "Which days of the week can you train?"
+    return GUIDELINES
+
+def _malform(text: str) -> str:
+    """Break JSON the way LLMs typically do: fences, prose or a trailing comma."""
+    choice = random.choice(["fence", "prose", "comma"])
+    if choice == "fence":
+        return f"```json\n{text}\n```"
+    if choice == "prose":
+        return f"Here is the JSON you asked for:\n{text}"
+    return text[:-1] + ",}" if text.endswith("}") else text[:-1] + ",]"
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def create_app(config: FakeGroqConfig) -> FastAPI:
+    app = FastAPI(title="Fake Groq")
+    stats = {"requests": 0, "rate_limited": 0, "server_errors": 0, "malformed": 0}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", **stats}
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        for key in stats:
+            stats[key] = 0
+        return stats
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(config.retry_after_seconds)},
+            )
+        if roll < config.rate_limit_rate + config.server_error_rate:
+            stats["server_errors"] += 1
+            return JSONResponse({"error": {"message": "Internal server error"}}, status_code=503)
+
+        messages = body.get("messages", [])
+        content = _respond_to(messages)
+        if content.startswith(("{", "[")) and random.random() < config.malformed_json_rate:
+            stats["malformed"] += 1
+            content = _malform(content)
+
+        completion_tokens = min(_count_tokens(content), body.get("max_tokens") or 2048)
+        prompt_tokens = sum(_count_tokens(m.get("content", "")) for m in messages)
+        latency = random.lognormvariate(0, config.latency_sigma) * config.latency_ms / 1000
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(content, latency, config.tokens_per_second, model, completion_id, usage),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(latency + completion_tokens / config.tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    return app
+
+async def _stream(
+    content: str, latency: float, tokens_per_second: float, model: str, completion_id: str, usage: Dict[str, int]
+) -> AsyncIterator[str]:
+    await asyncio.sleep(latency)
+    pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+    for index, piece in enumerate(pieces):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }
+        if index == len(pieces) - 1:
+            chunk["x_groq"] = {"id": completion_id, "usage": usage}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(1 / tokens_per_second)
+    yield "data: [DONE]\n\n"
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake Groq server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of latency")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--malformed-json-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry-after seconds sent with 429s")
+    args = parser.parse_args()
+
+    config = FakeGroqConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        malformed_json_rate=args.malformed_json_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after_seconds=args.retry_after,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
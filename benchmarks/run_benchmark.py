@@ -0,0 +1,195 @@
+"""Offline load test for the planning API against the fake Groq server.
+
+Starts benchmarks.fake_groq in a subprocess, points the app at it and drives
+planning endpoints in-process at a fixed concurrency, reporting latency
+percentiles, throughput and LLM calls per request.
+
+Usage:
+    python -m benchmarks.run_benchmark --scenario all --requests 200 --concurrency 20
+    python -m benchmarks.run_benchmark --scenario mvp --malformed-json-rate 0.2 --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+SCENARIOS = {
+    "mvp": ("/v1/planning/generate-plan-mvp", {
+        "user_input": "I run 20 miles a week, have a full gym and want a faster half marathon.",
+        "plan_parameters": {"duration_weeks": 4, "emphasis": "balanced"},
+    }),
+    "extract": ("/v1/planning/extract-profile", {
+        "user_input": "I want to get into hybrid training. [partial]",
+    }),
+    "plan": ("/v1/planning/generate-plan", {
+        "profile": {
+            "training_history": "Runs 20 miles per week",
+            "fitness_background": "Former soccer player",
+            "weekly_schedule": "Mon, Wed, Fri evenings",
+            "available_equipment": "Full gym",
+            "training_goals": "Faster half marathon, build muscle",
+            "health_constraints": "user stated they don't have any health constraints",
+        },
+        "plan_parameters": {"duration_weeks": 4, "emphasis": "balanced", "format": "table"},
+    }),
+    "structured": ("/v1/planning/generate-plan/structured/stream", {
+        "profile": {
+            "training_history": "Runs 20 miles per week",
+            "weekly_schedule": "Mon, Wed, Fri evenings",
+            "available_equipment": "Full gym",
+            "training_goals": "Faster half marathon, build muscle",
+        },
+        "plan_parameters": {"duration_weeks": 4, "emphasis": "balanced", "format": "csv"},
+    }),
+    "validate": ("/v1/planning/profiles/validate", {
+        "profiles": [
+            {"training_history": "Runs 20 miles per week", "weekly_schedule": ["Monday", "Friday"],
+             "available_equipment": "not specified", "training_goals": "Faster half marathon"},
+        ] * 200,
+    }),
+}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def _start_fake_server(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "benchmarks.fake_groq",
+        "--port", str(port),
+        "--latency-ms", str(args.latency_ms),
+        "--latency-sigma", str(args.latency_sigma),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--malformed-json-rate", str(args.malformed_json_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--server-error-rate", str(args.server_error_rate),
+    ]
+    return subprocess.Popen(command)
+
+async def _wait_for_server(base_url: str, timeout: float = 15.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Fake Groq server did not start")
+
+async def _run_scenario(
+    client: Any, fake_client: Any, name: str, requests: int, concurrency: int
+) -> Dict[str, Any]:
+    path, payload = SCENARIOS[name]
+    await fake_client.post("/stats/reset")
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal errors, next_index
+        while next_index < requests:
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    llm_calls = (await fake_client.get("/health")).json()
+
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "llm_calls_per_request": llm_calls["requests"] / len(latencies) if latencies else 0.0,
+    }
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    port = _free_port()
+    fake_url = f"http://127.0.0.1:{port}"
+
+    # Settings are read at import time, so configure them before importing the app
+    os.environ["GROQ_BASE_URL"] = fake_url
+    os.environ["GROQ_API_KEY"] = "benchmark"
+    os.environ["API_KEY"] = ""
+    os.environ["LLM_CACHE_BACKEND"] = "memory" if args.cache else "none"
+
+    import httpx
+    import main
+
+    server = _start_fake_server(args, port)
+    try:
+        await _wait_for_server(fake_url)
+        scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+        results = []
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client, \
+                    httpx.AsyncClient(base_url=fake_url) as fake_client:
+                for name in scenarios:
+                    results.append(await _run_scenario(client, fake_client, name, args.requests, args.concurrency))
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<10}{'reqs':>6}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'llm/req':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<10}{r['requests']:>6}{r['errors']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['requests_per_second']:>9.2f}{r['llm_calls_per_request']:>9.2f}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the planning API against a fake Groq server")
+    parser.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--cache", action="store_true", help="Enable the in-memory LLM response cache")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--malformed-json-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+
+if __name__ == "__main__":
+    main()
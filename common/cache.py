@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .config import settings
+from .sqlite import connect
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """Build a content-addressed key for an LLM completion request."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache(ABC):
+    """Base class for LLM response caches; hits and misses are counted by the callers' metrics."""
+
+    backend = "none"
+    # Whether calls may block on I/O and should run off the event loop
+    blocking = False
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        return self._get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self._set(key, value)
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """Return the cached value, or None if it is missing or expired."""
+
+    @abstractmethod
+    def _set(self, key: str, value: str) -> None:
+        """Store a value, evicting old entries as needed."""
+
+    @abstractmethod
+    def size(self) -> int:
+        """Number of stored entries."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU cache with per-entry TTL."""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+class SQLiteResponseCache(ResponseCache):
+    """On-disk cache backed by SQLite, surviving restarts.
+
+    Hits only read; their access times are kept in memory and written in
+    batches (with the next insert, or every `touch_batch` hits) for LRU eviction.
+    """
+
+    backend = "sqlite"
+    blocking = True
+
+    def __init__(
+        self, path: str, max_entries: int, ttl_seconds: float, table: str = "llm_cache", touch_batch: int = 100
+    ):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            # Expired rows are left for the sweep in _set
+            if row is None or row[1] < now:
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touches()
+                self._conn.commit()
+            return row[0]
+
+    def _flush_touches(self) -> None:
+        """Write batched access times; the caller holds the lock and commits."""
+        if self._touched:
+            self._conn.executemany(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._flush_touches()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_seconds, now),
+            )
+            # Evict expired entries, then least recently used beyond the limit
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+_response_cache: Optional[ResponseCache] = None
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """Build the response cache configured in settings, or None if disabled."""
+    backend = settings.LLM_CACHE_BACKEND.lower()
+    if backend == "memory":
+        return MemoryResponseCache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        )
+    if backend == "sqlite":
+        return SQLiteResponseCache(
+            path=settings.LLM_CACHE_PATH,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        )
+    if backend not in ("", "none"):
+        logger.warning(f"Unknown LLM cache backend '{backend}', caching disabled")
+    return None
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the process-wide LLM response cache."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = build_response_cache()
+    return _response_cache
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """Replace the process-wide LLM response cache (e.g. in tests)."""
+    global _response_cache
+    _response_cache = cache
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Iterable, List, TypeVar
+
+T = TypeVar("T")
+
+async def gather_or_cancel(*aws: Awaitable[Any]) -> List[Any]:
+    """Run awaitables concurrently, cancelling the rest as soon as one fails.
+
+    Unlike asyncio.gather, a failure in one branch does not leave the other
+    branches running (and spending LLM tokens) in the background.
+
+    Returns:
+        List of results in the order the awaitables were given
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def as_completed_bounded(aws: Iterable[Awaitable[T]], limit: int) -> AsyncIterator[T]:
+    """Run awaitables with at most `limit` in flight, yielding results as they complete.
+
+    Awaitables are started lazily as slots free up. If the consumer stops
+    iterating (e.g. the client disconnects) the in-flight work is cancelled.
+    Exceptions propagate, so callers should handle per-item errors themselves.
+    """
+    pending = set()
+    iterator = iter(aws)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < limit:
+                try:
+                    pending.add(asyncio.ensure_future(next(iterator)))
+                except StopIteration:
+                    exhausted = True
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -15,10 +15,119 @@ class Settings(BaseSettings):
     # Groq API configuration
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
     GROQ_MODEL: str = os.getenv("GROQ_MODEL", "llama3-70b-8192")
+    GROQ_BASE_URL: Optional[str] = os.getenv("GROQ_BASE_URL") or None
+    # Small model for extraction, follow-up questions and JSON repair
+    GROQ_FAST_MODEL: str = os.getenv("GROQ_FAST_MODEL", "llama3-8b-8192")
+    # Seconds before a slow call moves to its fallback model (0 = only on errors)
+    LLM_FALLBACK_TIMEOUT: float = float(os.getenv("LLM_FALLBACK_TIMEOUT", "0"))
+    # JSON overrides for per-task model routes, e.g. {"extraction": {"model": "llama3-70b-8192"}}
+    LLM_MODEL_ROUTES: str = os.getenv("LLM_MODEL_ROUTES", "{}")
+    # Context window of the configured models; max_tokens is clamped so prompt plus output fit
+    LLM_CONTEXT_TOKENS: int = int(os.getenv("LLM_CONTEXT_TOKENS", "8192"))
+    LLM_MIN_OUTPUT_TOKENS: int = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "256"))
+    
+    # USD per million (input, output) tokens by model, for cost metrics
+    LLM_PRICING: str = os.getenv(
+        "LLM_PRICING",
+        '{"llama3-70b-8192": [0.59, 0.79], "llama3-8b-8192": [0.05, 0.08]}'
+    )
+    
+    # LLM HTTP connection pool (shared by every LLMClient in the process)
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30.0"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5.0"))
+    LLM_READ_TIMEOUT: float = float(os.getenv("LLM_READ_TIMEOUT", "60.0"))
+    
+    # LLM scheduling: shared rate limits (0 disables), retries, hedging and circuit breaker
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "20.0"))
+    LLM_HEDGE_AFTER_SECONDS: float = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    LLM_CIRCUIT_RESET_SECONDS: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30.0"))
+    # Rate limit state ("memory" per process, or "sqlite" shared by all worker processes)
+    LLM_RATE_LIMIT_BACKEND: str = os.getenv("LLM_RATE_LIMIT_BACKEND", "memory")
+    LLM_RATE_LIMIT_PATH: str = os.getenv("LLM_RATE_LIMIT_PATH", ".cache/rate_limits.sqlite3")
+    # Seconds a SQLite store waits for another worker's write lock
+    SQLITE_BUSY_TIMEOUT: float = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5.0"))
     
     # Agent defaults
     DEFAULT_TEMPERATURE: float = float(os.getenv("DEFAULT_TEMPERATURE", "0.7"))
     DEFAULT_MAX_TOKENS: int = int(os.getenv("DEFAULT_MAX_TOKENS", "2048"))
+    # System prompt variant ("full", or "compact" to drop examples and save prompt tokens)
+    PROMPT_VARIANT: str = os.getenv("PROMPT_VARIANT", "full")
+    
+    # LLM response cache ("memory", "sqlite" or "none")
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "memory")
+    LLM_CACHE_DEFAULT: bool = os.getenv("LLM_CACHE_DEFAULT", "True").lower() == "true"
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+    
+    # Follow-up questions ("table" serves pre-written questions, "llm" always generates)
+    FOLLOW_UP_QUESTION_MODE: str = os.getenv("FOLLOW_UP_QUESTION_MODE", "table")
+    FOLLOW_UP_QUESTION_TABLE_PATH: str = os.getenv("FOLLOW_UP_QUESTION_TABLE_PATH", "")
+    FOLLOW_UP_QUESTION_LLM_FALLBACK: bool = os.getenv("FOLLOW_UP_QUESTION_LLM_FALLBACK", "True").lower() == "true"
+    FOLLOW_UP_QUESTION_WARMUP: bool = os.getenv("FOLLOW_UP_QUESTION_WARMUP", "False").lower() == "true"
+    
+    # Follow-up turns with a known profile only extract the still-missing fields
+    PROFILE_INCREMENTAL_EXTRACTION: bool = os.getenv("PROFILE_INCREMENTAL_EXTRACTION", "True").lower() == "true"
+    # Conversation history sent with profile extraction is trimmed to this many tokens,
+    # of which up to PROFILE_HISTORY_SUMMARY_TOKENS condense the dropped turns
+    PROFILE_HISTORY_TOKENS: int = int(os.getenv("PROFILE_HISTORY_TOKENS", "2000"))
+    PROFILE_HISTORY_SUMMARY_TOKENS: int = int(os.getenv("PROFILE_HISTORY_SUMMARY_TOKENS", "300"))
+    
+    # Fill obviously stated profile fields with local rules before calling the LLM
+    PROFILE_RULE_EXTRACTION: bool = os.getenv("PROFILE_RULE_EXTRACTION", "True").lower() == "true"
+    
+    # Derive table/csv schedules from the finished guidelines (sequential) instead of
+    # generating them from the profile in parallel with the guidelines
+    PLAN_STRUCTURED_FROM_GUIDELINES: bool = os.getenv("PLAN_STRUCTURED_FROM_GUIDELINES", "False").lower() == "true"
+    # "parallel" (guidelines and schedule as two calls), "single_call" (one JSON document
+    # with guidelines and a full TrainingPlan; table/csv are rendered locally) or
+    # "week_parallel" (a compact skeleton first, then each week generated concurrently)
+    PLAN_GENERATION_MODE: str = os.getenv("PLAN_GENERATION_MODE", "parallel")
+    PLAN_MAX_TOKENS: int = int(os.getenv("PLAN_MAX_TOKENS", "6144"))
+    # In single_call mode, plans at least this long are generated week by week
+    PLAN_WEEK_PARALLEL_MIN_WEEKS: int = int(os.getenv("PLAN_WEEK_PARALLEL_MIN_WEEKS", "6"))
+    PLAN_WEEK_CONCURRENCY: int = int(os.getenv("PLAN_WEEK_CONCURRENCY", "4"))
+    PLAN_WEEK_RETRIES: int = int(os.getenv("PLAN_WEEK_RETRIES", "1"))
+    # Reuse plans generated for profiles with the same normalized features
+    # ("memory", "sqlite" or "none"); reused plans get a cheap personalization pass
+    PLAN_TEMPLATE_BACKEND: str = os.getenv("PLAN_TEMPLATE_BACKEND", "none")
+    PLAN_TEMPLATE_TTL_SECONDS: float = float(os.getenv("PLAN_TEMPLATE_TTL_SECONDS", "604800"))
+    PLAN_TEMPLATE_MAX_ENTRIES: int = int(os.getenv("PLAN_TEMPLATE_MAX_ENTRIES", "512"))
+    PLAN_TEMPLATE_PATH: str = os.getenv("PLAN_TEMPLATE_PATH", ".cache/plan_templates.sqlite3")
+    
+    # Batch planning
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+    
+    # Background plan jobs ("memory" or "sqlite" store)
+    JOB_STORE_BACKEND: str = os.getenv("JOB_STORE_BACKEND", "memory")
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", ".cache/jobs.sqlite3")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_QUEUE_MAX_SIZE: int = int(os.getenv("JOB_QUEUE_MAX_SIZE", "1000"))
+    JOB_TTL_SECONDS: float = float(os.getenv("JOB_TTL_SECONDS", "86400"))
+    JOB_WEBHOOK_TIMEOUT: float = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10.0"))
+    JOB_WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv("JOB_WEBHOOK_MAX_CONNECTIONS", "20"))
+    # Webhooks to localhost, private and link-local addresses are refused unless enabled
+    JOB_WEBHOOK_ALLOW_PRIVATE: bool = os.getenv("JOB_WEBHOOK_ALLOW_PRIVATE", "False").lower() == "true"
+    # Requeue jobs left running by a previous run on startup (gunicorn does this once
+    # in its master process instead, since sibling workers may still be running them)
+    JOB_RESUME_RUNNING: bool = os.getenv("JOB_RESUME_RUNNING", "True").lower() == "true"
+    # A running job's worker renews its lease; jobs whose lease lapses (the worker
+    # process died) are picked up again by another worker
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+    
+    # Conversation sessions ("memory" or "sqlite")
+    SESSION_STORE_BACKEND: str = os.getenv("SESSION_STORE_BACKEND", "memory")
+    SESSION_STORE_PATH: str = os.getenv("SESSION_STORE_PATH", ".cache/sessions.sqlite3")
+    SESSION_TTL_SECONDS: float = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+    SESSION_MAX_HISTORY: int = int(os.getenv("SESSION_MAX_HISTORY", "20"))
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import re
+from typing import Any, List, Optional, Tuple
+
+from .llm import count_tokens
+from .metrics import JSON_REPAIRS
+from .rate_limit import LLMUnavailableError
+from .schemas import Message, Role
+
+logger = logging.getLogger(__name__)
+
+_FENCE_RE = re.compile(r"```[ \t]*(?:json|JSON)?[ \t]*\n?(.*?)```", re.DOTALL)
+_LITERALS = {
+    "true": "true", "false": "false", "null": "null",
+    "True": "true", "False": "false", "None": "null",
+}
+_NUMBER_CHARS = set("0123456789+-.eE")
+_MAX_TRUNCATION_ATTEMPTS = 50
+
+class JSONRepairError(ValueError):
+    """Raised when text cannot be parsed as JSON even after repair."""
+
+def _record(tier: str) -> None:
+    """Count which repair tier produced the parsed result: direct (valid as returned),
+    local (fixed without an LLM), llm (fixed by an LLM call) or failed."""
+    JSON_REPAIRS.inc(tier=tier)
+
+def strip_markdown_fences(text: str) -> str:
+    """Remove markdown code fences (with or without a language tag) around JSON."""
+    match = _FENCE_RE.search(text)
+    if match:
+        return match.group(1).strip()
+    text = text.strip()
+    # Unterminated fence, e.g. output truncated at max_tokens
+    if text.startswith("```"):
+        text = text[3:].lstrip(" \t")
+        if text[:4].lower() == "json":
+            text = text[4:]
+    return text.strip()
+
+def extract_json_span(text: str) -> Optional[str]:
+    """Extract the outermost JSON object or array, dropping surrounding prose.
+
+    If the value is never closed (truncated output) everything from the opening
+    bracket to the end of the text is returned.
+    """
+    start = next((i for i, c in enumerate(text) if c in "{["), None)
+    if start is None:
+        return None
+
+    depth = 0
+    quote = None
+    escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+def _normalize(text: str) -> Tuple[str, List[str], bool]:
+    """Rewrite JSON-like text into strict JSON tokens.
+
+    Converts single-quoted strings, quotes bare keys and words, maps Python
+    literals, drops trailing commas and comments.
+
+    Returns:
+        Tuple of (normalized text, stack of unclosed brackets, whether a string was left open)
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c in "\"'":
+            quote = c
+            i += 1
+            buf = []
+            closed = False
+            while i < n:
+                ch = text[i]
+                if ch == "\\":
+                    if i + 1 < n:
+                        nxt = text[i + 1]
+                        buf.append("'" if nxt == "'" else ch + nxt)
+                    i += 2
+                    continue
+                if ch == quote:
+                    closed = True
+                    i += 1
+                    break
+                if ch == '"':
+                    buf.append('\\"')
+                elif ch == "\n":
+                    buf.append("\\n")
+                elif ch == "\r":
+                    buf.append("\\r")
+                elif ch == "\t":
+                    buf.append("\\t")
+                else:
+                    buf.append(ch)
+                i += 1
+            out.append('"' + "".join(buf) + ('"' if closed else ""))
+            if not closed:
+                return "".join(out), stack, True
+            continue
+        if c in "{[":
+            stack.append(c)
+            out.append(c)
+        elif c in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(c)
+        elif c.isdigit() or (c == "-" and i + 1 < n and text[i + 1].isdigit()):
+            j = i + 1
+            while j < n and text[j] in _NUMBER_CHARS:
+                j += 1
+            out.append(text[i:j])
+            i = j
+            continue
+        elif c.isalpha() or c == "_":
+            j = i + 1
+            while j < n and (text[j].isalnum() or text[j] in "_-"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word) or json.dumps(word))
+            i = j
+            continue
+        elif c == "/" and text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = n if newline == -1 else newline
+            continue
+        else:
+            out.append(c)
+        i += 1
+    return "".join(out), stack, False
+
+def _close(text: str, stack: List[str], open_string: bool) -> str:
+    """Close an unterminated string and any unclosed brackets."""
+    text = text.rstrip()
+    if open_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join("}" if c == "{" else "]" for c in reversed(stack))
+
+def repair_json_text(text: str) -> Optional[str]:
+    """Repair malformed JSON locally, without an LLM.
+
+    Returns:
+        Strict JSON text, or None if the text could not be repaired
+    """
+    span = extract_json_span(strip_markdown_fences(text))
+    if span is None:
+        return None
+
+    candidate = span
+    for _ in range(_MAX_TRUNCATION_ATTEMPTS):
+        normalized, stack, open_string = _normalize(candidate)
+        repaired = _close(normalized, stack, open_string)
+        try:
+            json.loads(repaired)
+            return repaired
+        except json.JSONDecodeError:
+            pass
+        # Drop the last (likely partial) element and try again
+        cut = candidate.rfind(",")
+        if cut <= 0:
+            return None
+        candidate = candidate[:cut]
+    return None
+
+def parse_json(text: str) -> Any:
+    """Parse LLM output as JSON, applying local repairs if needed.
+
+    Raises:
+        JSONRepairError: If the text cannot be parsed or repaired locally
+    """
+    try:
+        result = json.loads(text)
+        _record("direct")
+        return result
+    except json.JSONDecodeError:
+        pass
+
+    repaired = repair_json_text(text)
+    if repaired is None:
+        raise JSONRepairError("Could not repair JSON locally")
+    _record("local")
+    logger.info("Repaired JSON locally")
+    return json.loads(repaired)
+
+async def repair_json_with_llm(
+    llm: Any, prompt_template: str, malformed_json: str, route: Optional[Any] = None
+) -> Optional[Any]:
+    """Last-resort repair: ask the LLM to fix malformed JSON.
+
+    The output limit is sized to the malformed text, since the fixed JSON is
+    about as long.
+
+    Args:
+        llm: LLMClient used for the repair call
+        prompt_template: Prompt with a {json_content} placeholder
+        malformed_json: The text that failed to parse
+        route: Optional ModelRoute for the repair call
+
+    Returns:
+        The parsed JSON value, or None if the repair failed
+
+    Raises:
+        LLMUnavailableError: If the provider cannot serve the repair call
+    """
+    try:
+        repair_prompt = prompt_template.format(json_content=malformed_json)
+        messages = [Message(role=Role.USER, content=repair_prompt)]
+        max_tokens = llm.budget.output_tokens(
+            64, 1.25, count_tokens(malformed_json), route.max_tokens if route else None
+        )
+        repaired_text = await llm.generate(messages, max_tokens=max_tokens, route=route)
+
+        try:
+            repaired = json.loads(repaired_text.strip())
+        except json.JSONDecodeError:
+            repaired_text = repair_json_text(repaired_text)
+            if repaired_text is None:
+                raise
+            repaired = json.loads(repaired_text)
+
+        _record("llm")
+        logger.info("Successfully repaired JSON with LLM")
+        return repaired
+
+    except json.JSONDecodeError:
+        _record("failed")
+        logger.error("JSON repair attempt failed - still invalid JSON")
+        return None
+    except (LLMUnavailableError, asyncio.CancelledError):
+        # An open circuit or a cancelled request is not a repair failure; let callers see it
+        _record("failed")
+        raise
+    except Exception as e:
+        _record("failed")
+        logger.error(f"Error during JSON repair attempt: {str(e)}")
+        return None
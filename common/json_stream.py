@@ -0,0 +1,140 @@
+import json
+import logging
+from typing import Any, List, Optional, Tuple, Union
+
+from .json_repair import repair_json_text
+
+logger = logging.getLogger(__name__)
+
+PathItem = Union[str, int]
+
+class _Frame:
+    """An open JSON container while scanning."""
+
+    __slots__ = ("kind", "key", "index", "expect_key")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "{"
+
+    @property
+    def position(self) -> PathItem:
+        return self.key if self.kind == "{" else self.index
+
+class IncrementalJSONParser:
+    """Parses streamed JSON text, emitting elements as soon as they close.
+
+    Only values at `depth` levels below the root are emitted: with depth=1 each
+    element of a top-level array (e.g. a week) or each field of a top-level
+    object (e.g. a profile field) is returned from `feed` once its closing
+    bracket, quote or separator arrives. Text before the root (prose, markdown
+    fences) is skipped, so a stream cut off at max_tokens still yields every
+    element that was completed.
+    """
+
+    def __init__(self, depth: int = 1):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.depth = depth
+        self.complete = False
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[PathItem, ...], Any]]:
+        """Consume a chunk of text and return the (path, value) pairs it completed."""
+        if self.complete:
+            return []
+        self._text += chunk
+        items: List[Tuple[Tuple[PathItem, ...], Any]] = []
+        text = self._text
+        while self._pos < len(text) and not self.complete:
+            self._step(text, self._pos, items)
+            self._pos += 1
+        return items
+
+    def _path(self) -> Tuple[PathItem, ...]:
+        return tuple(frame.position for frame in self._stack[:self.depth])
+
+    def _at_depth(self) -> bool:
+        return len(self._stack) == self.depth
+
+    def _emit(self, raw: str, items: List[Tuple[Tuple[PathItem, ...], Any]]) -> None:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            repaired = repair_json_text(raw)
+            if repaired is None:
+                logger.warning(f"Skipping unparseable streamed JSON element at {self._path()}")
+                return
+            value = json.loads(repaired)
+        items.append((self._path(), value))
+
+    def _end_scalar(self, text: str, end: int, items: List[Tuple[Tuple[PathItem, ...], Any]]) -> None:
+        """Emit a pending number/literal that ends at a separator or closing bracket."""
+        if self._value_start is not None and self._at_depth():
+            raw = text[self._value_start:end].strip()
+            if raw:
+                self._emit(raw, items)
+            self._value_start = None
+
+    def _step(self, text: str, i: int, items: List[Tuple[Tuple[PathItem, ...], Any]]) -> None:
+        c = text[i]
+        if not self._stack:
+            if c in "{[":
+                self._stack.append(_Frame(c))
+            return
+
+        frame = self._stack[-1]
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif c == "\\":
+                self._escaped = True
+            elif c == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    try:
+                        frame.key = json.loads(text[self._string_start:i + 1])
+                    except json.JSONDecodeError:
+                        frame.key = text[self._string_start + 1:i]
+                elif self._value_start is not None and self._at_depth():
+                    self._emit(text[self._value_start:i + 1], items)
+                    self._value_start = None
+            return
+
+        if c == '"':
+            self._in_string = True
+            self._string_start = i
+            self._string_is_key = frame.kind == "{" and frame.expect_key
+            if not self._string_is_key and self._at_depth() and self._value_start is None:
+                self._value_start = i
+        elif c in "{[":
+            if self._at_depth() and self._value_start is None:
+                self._value_start = i
+            self._stack.append(_Frame(c))
+        elif c in "}]":
+            self._end_scalar(text, i, items)
+            self._stack.pop()
+            if not self._stack:
+                self.complete = True
+            elif self._at_depth() and self._value_start is not None:
+                self._emit(text[self._value_start:i + 1], items)
+                self._value_start = None
+        elif c == ",":
+            self._end_scalar(text, i, items)
+            if frame.kind == "[":
+                frame.index += 1
+            else:
+                frame.expect_key = True
+        elif c == ":":
+            frame.expect_key = False
+        elif not c.isspace() and self._at_depth() and self._value_start is None:
+            self._value_start = i
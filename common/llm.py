@@ -1,55 +1,442 @@
+import asyncio
 import groq
+import httpx
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import re
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from .config import settings
-from .schemas import Message
+from .schemas import Message, Role
+from .cache import ResponseCache, get_response_cache, make_cache_key
+from .rate_limit import LLMScheduler, LLMUnavailableError, get_llm_scheduler
+from .sqlite import run_blocking
+from .metrics import LLM_CACHE, LLM_COST, LLM_FALLBACKS, LLM_REQUEST_DURATION, LLM_REQUESTS, LLM_TOKENS
 
 logger = logging.getLogger(__name__)
 
+# USD per million (input, output) tokens, used for cost metrics
+_pricing: Dict[str, List[float]] = json.loads(settings.LLM_PRICING)
+
+@dataclass
+class ModelRoute:
+    """Model and sampling settings for one kind of LLM call.
+
+    Fallback models are tried in order when the previous model is rate limited,
+    unavailable or slower than `timeout` seconds.
+    """
+
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    fallback_models: List[str] = field(default_factory=list)
+    timeout: Optional[float] = None
+
+# Process-wide HTTP connection pool shared by every LLMClient
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Word pieces, single punctuation marks and line breaks, as a BPE tokenizer splits them
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\n")
+
+def _piece_tokens(piece: str) -> int:
+    # Long words split into several tokens, about four characters each
+    return (len(piece) + 3) // 4
+
+def count_tokens(text: str) -> int:
+    """Estimate the tokens in a text with a local word-piece tokenizer."""
+    return sum(_piece_tokens(match.group(0)) for match in _TOKEN_RE.finditer(text))
+
+def clip_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text after about `max_tokens` tokens, marking the cut with an ellipsis."""
+    used = 0
+    for match in _TOKEN_RE.finditer(text):
+        used += _piece_tokens(match.group(0))
+        if used > max_tokens:
+            return text[:match.start()].rstrip() + "..."
+    return text
+
+def _estimate_tokens(groq_messages: List[Dict[str, str]]) -> int:
+    """Prompt token estimate, including per-message overhead."""
+    return sum(count_tokens(m["content"]) for m in groq_messages) + 4 * len(groq_messages)
+
+class TokenBudget:
+    """Sizes LLM calls to the model's context window.
+
+    Output limits are scaled to the task and clamped so the prompt plus the
+    completion fit in `context_tokens`. Conversation history is trimmed to a
+    token budget, with the oldest turns condensed into one short message.
+    """
+
+    def __init__(self, context_tokens: Optional[int] = None, min_output_tokens: Optional[int] = None):
+        self.context_tokens = context_tokens or settings.LLM_CONTEXT_TOKENS
+        self.min_output_tokens = min_output_tokens or settings.LLM_MIN_OUTPUT_TOKENS
+
+    def output_tokens(
+        self, base: int, per_unit: float = 0, units: int = 0, ceiling: Optional[int] = None
+    ) -> int:
+        """Output limit for a task: `base` plus `per_unit` for each unit of work (e.g. plan weeks)."""
+        tokens = int(base + per_unit * units)
+        return min(tokens, ceiling) if ceiling else tokens
+
+    def fit_output(self, prompt_tokens: int, max_tokens: int) -> int:
+        """Clamp max_tokens so prompt and completion fit in the context window."""
+        available = max(self.context_tokens - prompt_tokens, self.min_output_tokens)
+        if max_tokens > available:
+            logger.info(f"Reducing max_tokens from {max_tokens} to {available} for a {prompt_tokens}-token prompt")
+            return available
+        return max_tokens
+
+    def fit_history(self, history: List[Message], max_tokens: int, summary_tokens: int = 0) -> List[Message]:
+        """Keep the most recent messages that fit in `max_tokens`.
+
+        Older messages are dropped; with `summary_tokens` their user turns are
+        condensed into a single message at the start, within the same budget.
+        """
+        costs = [count_tokens(message.content) + 4 for message in history]
+        if sum(costs) <= max_tokens:
+            return history
+
+        budget = max_tokens - summary_tokens
+        start, used = len(history), 0
+        while start > 0 and used + costs[start - 1] <= budget:
+            start -= 1
+            used += costs[start]
+        kept = history[start:]
+
+        earlier = " / ".join(
+            message.content.strip() for message in history[:start]
+            if message.role == Role.USER and message.content.strip()
+        )
+        if summary_tokens > 0 and earlier:
+            summary = clip_to_tokens(f"Earlier in this conversation I said: {earlier}", summary_tokens - 4)
+            kept = [Message(role=Role.USER, content=summary)] + kept
+        logger.info(f"Trimmed conversation history from {len(history)} to {len(kept)} messages")
+        return kept
+
+def _build_http_client() -> httpx.AsyncClient:
+    """Build the keep-alive HTTP client used for all LLM requests."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.LLM_READ_TIMEOUT,
+            connect=settings.LLM_CONNECT_TIMEOUT,
+        ),
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it if the app lifespan has not."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Create the shared HTTP connection pool (called on app startup)."""
+    client = get_http_client()
+    logger.info(
+        f"LLM connection pool ready (max_connections={settings.LLM_MAX_CONNECTIONS}, "
+        f"keepalive={settings.LLM_MAX_KEEPALIVE_CONNECTIONS})"
+    )
+    return client
+
+async def close_http_client() -> None:
+    """Close the shared HTTP connection pool (called on app shutdown)."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+        logger.info("LLM connection pool closed")
+    _http_client = None
+
 class LLMClient:
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        budget: Optional[TokenBudget] = None,
+    ):
         """Initialize the Groq LLM client.
-        
+
         Args:
             api_key: Optional Groq API key (defaults to env var)
             model: Model to use for completion (defaults to env var)
+            http_client: Optional HTTP client (defaults to the shared connection pool)
+            cache: Optional response cache (defaults to the process-wide cache)
+            scheduler: Optional rate limit/retry scheduler (defaults to the process-wide one)
+            budget: Optional token budget (defaults to the configured context window)
         """
         self.api_key = api_key or settings.GROQ_API_KEY
         self.model = model or settings.GROQ_MODEL
-        self.client = groq.Client(api_key=self.api_key)
-        
+        self._http_client = http_client
+        self._client: Optional[groq.AsyncGroq] = None
+        self._bound_http_client: Optional[httpx.AsyncClient] = None
+        self._cache = cache
+        self._scheduler = scheduler
+        self.budget = budget or TokenBudget()
+
+    @property
+    def client(self) -> groq.AsyncGroq:
+        """Async Groq client bound to the shared HTTP connection pool."""
+        http_client = self._http_client or get_http_client()
+        # Rebind if the pool was recreated (e.g. across app restarts in tests)
+        if self._client is None or self._bound_http_client is not http_client:
+            # Retries are handled by the LLMScheduler, not the SDK
+            self._client = groq.AsyncGroq(
+                api_key=self.api_key,
+                base_url=settings.GROQ_BASE_URL,
+                http_client=http_client,
+                max_retries=0,
+            )
+            self._bound_http_client = http_client
+        return self._client
+
+    @property
+    def scheduler(self) -> LLMScheduler:
+        """Scheduler applying shared rate limits, retries and the circuit breaker."""
+        return self._scheduler or get_llm_scheduler()
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        """Response cache used for completions, if caching is configured."""
+        return self._cache or get_response_cache()
+
+    def _resolve_cache(self, use_cache: Optional[bool]) -> Optional[ResponseCache]:
+        """Return the cache to use for a call, honoring the per-call override."""
+        if use_cache is None:
+            use_cache = settings.LLM_CACHE_DEFAULT
+        return self.cache if use_cache else None
+
+    async def _cache_lookup(self, response_cache: ResponseCache, cache_key: str, model: str) -> Optional[str]:
+        """Look up a cached completion, recording the hit or miss."""
+        cached = await run_blocking(response_cache.get, cache_key)
+        LLM_CACHE.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            logger.info(f"LLM cache hit for model {model}")
+        return cached
+
+    def _record_usage(self, usage: Any, model: str) -> None:
+        """Record token usage and estimated cost reported by the provider."""
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        LLM_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+        LLM_TOKENS.inc(completion_tokens, model=model, type="completion")
+        self.scheduler.record_tokens(completion_tokens)
+        price = _pricing.get(model)
+        if price:
+            LLM_COST.inc((prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000, model=model)
+
+    def _resolve_call(
+        self,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        route: Optional[ModelRoute],
+        prompt_tokens: int,
+    ) -> Tuple[List[str], float, int]:
+        """Resolve (models to try, temperature, max_tokens) from explicit args, the route and defaults.
+
+        max_tokens is clamped so the completion fits in the context window.
+        """
+        route = route or ModelRoute()
+        models = [route.model or self.model]
+        models += [m for m in route.fallback_models if m not in models]
+        if temperature is None:
+            temperature = route.temperature if route.temperature is not None else settings.DEFAULT_TEMPERATURE
+        if max_tokens is None:
+            max_tokens = route.max_tokens or settings.DEFAULT_MAX_TOKENS
+        return models, temperature, self.budget.fit_output(prompt_tokens, max_tokens)
+
+    async def _open(
+        self,
+        model: str,
+        groq_messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        prompt_tokens: int,
+        has_fallback: bool,
+        timeout: Optional[float],
+        stream: bool = False,
+    ) -> Any:
+        """Send one completion request to `model` through the scheduler.
+
+        With a fallback available the model is not retried, so a rate limit or
+        outage moves straight on to the next model in the route.
+        """
+        call = self.scheduler.execute(
+            model,
+            lambda: self.client.chat.completions.create(
+                model=model,
+                messages=groq_messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **({"stream": True} if stream else {}),
+            ),
+            estimated_tokens=prompt_tokens,
+            hedge=not stream,
+            max_retries=0 if has_fallback else None,
+        )
+        if has_fallback and timeout:
+            return await asyncio.wait_for(call, timeout)
+        return await call
+
     async def generate(
-        self, 
+        self,
         messages: List[Message],
         temperature: float = None,
         max_tokens: int = None,
+        cache: Optional[bool] = None,
+        route: Optional[ModelRoute] = None,
     ) -> str:
         """Generate a response from the LLM.
-        
+
         Args:
             messages: List of Message objects
-            temperature: Optional temperature parameter
-            max_tokens: Optional max_tokens parameter
-            
+            temperature: Optional temperature parameter (overrides the route)
+            max_tokens: Optional max_tokens parameter (overrides the route)
+            cache: Whether to use the response cache (defaults to settings)
+            route: Optional model route selecting the model, sampling settings and fallbacks
+
         Returns:
             str: The generated text
         """
         if not self.api_key:
             logger.error("Groq API key not provided")
             raise ValueError("Groq API key not provided")
-            
+
         # Convert internal Message objects to dict format expected by Groq
         groq_messages = [{"role": m.role, "content": m.content} for m in messages]
-        
-        try:
-            logger.info(f"Calling Groq with model {self.model}")
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=groq_messages,
-                temperature=temperature or settings.DEFAULT_TEMPERATURE,
-                max_tokens=max_tokens or settings.DEFAULT_MAX_TOKENS,
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"Error calling Groq API: {str(e)}")
-            raise
+        prompt_tokens = _estimate_tokens(groq_messages)
+        models, temperature, max_tokens = self._resolve_call(temperature, max_tokens, route, prompt_tokens)
+        timeout = route.timeout if route else None
+
+        response_cache = self._resolve_cache(cache)
+        cache_key = None
+        if response_cache is not None:
+            cache_key = make_cache_key(models[0], groq_messages, temperature, max_tokens)
+            cached = await self._cache_lookup(response_cache, cache_key, models[0])
+            if cached is not None:
+                return cached
+
+        for index, model in enumerate(models):
+            has_fallback = index < len(models) - 1
+            start = time.perf_counter()
+            try:
+                logger.info(f"Calling Groq with model {model}")
+                response = await self._open(
+                    model, groq_messages, temperature, max_tokens, prompt_tokens, has_fallback, timeout
+                )
+                content = response.choices[0].message.content
+                LLM_REQUESTS.inc(model=model, outcome="success")
+                self._record_usage(response.usage, model)
+                # Only the primary model's output is cached, since the key names that model
+                if response_cache is not None and content and index == 0:
+                    await run_blocking(response_cache.set, cache_key, content)
+                return content
+            except (LLMUnavailableError, asyncio.TimeoutError) as e:
+                LLM_REQUESTS.inc(model=model, outcome="error")
+                if not has_fallback:
+                    logger.error(f"Error calling Groq API: {str(e)}")
+                    raise
+                logger.warning(f"Model {model} unavailable or slow, falling back to {models[index + 1]}: {str(e) or type(e).__name__}")
+                LLM_FALLBACKS.inc(model=model)
+            except Exception as e:
+                LLM_REQUESTS.inc(model=model, outcome="error")
+                logger.error(f"Error calling Groq API: {str(e)}")
+                raise
+            finally:
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - start, model=model)
+
+    async def stream(
+        self,
+        messages: List[Message],
+        temperature: float = None,
+        max_tokens: int = None,
+        cache: Optional[bool] = None,
+        route: Optional[ModelRoute] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a response from the LLM token by token.
+
+        A cached response is replayed as a single chunk. Fallback models are only
+        tried while opening the stream; a stream that fails midway is not replayed.
+
+        Args:
+            messages: List of Message objects
+            temperature: Optional temperature parameter (overrides the route)
+            max_tokens: Optional max_tokens parameter (overrides the route)
+            cache: Whether to use the response cache (defaults to settings)
+            route: Optional model route selecting the model, sampling settings and fallbacks
+
+        Yields:
+            str: Text deltas as they arrive from the provider
+        """
+        if not self.api_key:
+            logger.error("Groq API key not provided")
+            raise ValueError("Groq API key not provided")
+
+        groq_messages = [{"role": m.role, "content": m.content} for m in messages]
+        prompt_tokens = _estimate_tokens(groq_messages)
+        models, temperature, max_tokens = self._resolve_call(temperature, max_tokens, route, prompt_tokens)
+        timeout = route.timeout if route else None
+
+        response_cache = self._resolve_cache(cache)
+        cache_key = None
+        if response_cache is not None:
+            cache_key = make_cache_key(models[0], groq_messages, temperature, max_tokens)
+            cached = await self._cache_lookup(response_cache, cache_key, models[0])
+            if cached is not None:
+                yield cached
+                return
+
+        for index, model in enumerate(models):
+            has_fallback = index < len(models) - 1
+            start = time.perf_counter()
+            try:
+                logger.info(f"Streaming from Groq with model {model}")
+                response = await self._open(
+                    model, groq_messages, temperature, max_tokens, prompt_tokens, has_fallback, timeout, stream=True
+                )
+            except (LLMUnavailableError, asyncio.TimeoutError) as e:
+                LLM_REQUESTS.inc(model=model, outcome="error")
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - start, model=model)
+                if not has_fallback:
+                    logger.error(f"Error streaming from Groq API: {str(e)}")
+                    raise
+                logger.warning(f"Model {model} unavailable or slow, falling back to {models[index + 1]}: {str(e) or type(e).__name__}")
+                LLM_FALLBACKS.inc(model=model)
+                continue
+            except Exception as e:
+                LLM_REQUESTS.inc(model=model, outcome="error")
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - start, model=model)
+                logger.error(f"Error streaming from Groq API: {str(e)}")
+                raise
+
+            try:
+                chunks = []
+                async for chunk in response:
+                    # Groq reports usage on the final chunk under x_groq
+                    x_groq = getattr(chunk, "x_groq", None)
+                    self._record_usage(getattr(chunk, "usage", None) or getattr(x_groq, "usage", None), model)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+                LLM_REQUESTS.inc(model=model, outcome="success")
+                if response_cache is not None and chunks and index == 0:
+                    await run_blocking(response_cache.set, cache_key, "".join(chunks))
+                return
+            except Exception as e:
+                LLM_REQUESTS.inc(model=model, outcome="error")
+                logger.error(f"Error streaming from Groq API: {str(e)}")
+                raise
+            finally:
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - start, model=model)
@@ -0,0 +1,413 @@
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import groq
+
+from .config import settings
+from .metrics import LLM_CIRCUIT_OPEN, LLM_HEDGES, LLM_RETRIES
+from .sqlite import connect
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Provider errors worth retrying: rate limits, server errors and transport failures
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.InternalServerError,
+    groq.APIConnectionError,
+)
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the LLM provider cannot serve a request (circuit open or retries exhausted)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate.
+
+    A rate of 0 disables limiting. The rate can be lowered and raised at runtime
+    for adaptive (AIMD) throttling.
+    """
+
+    def __init__(self, per_minute: float, min_rate_fraction: float = 0.1):
+        self.max_rate = per_minute
+        self.rate = per_minute
+        self.min_rate = per_minute * min_rate_fraction
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.max_rate, self.tokens + (now - self._updated) * self.rate / 60)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until `amount` tokens are available, then take them."""
+        if not self.enabled:
+            return
+        amount = min(amount, self.max_rate)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) * 60 / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """Take tokens without waiting (may go negative, delaying later callers)."""
+        if not self.enabled:
+            return
+        self._refill()
+        self.tokens -= amount
+
+    def decrease(self, factor: float = 0.5) -> None:
+        """Multiplicatively lower the refill rate after the provider pushes back."""
+        if self.enabled:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * factor)
+
+    def increase(self, fraction: float = 0.05) -> None:
+        """Additively restore the refill rate after a success."""
+        if self.enabled and self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * fraction)
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in SQLite, shared by every worker process.
+
+    Each operation refills and updates the bucket in one short write transaction,
+    so workers on the same machine draw from a single requests/min or tokens/min
+    budget and all slow down when the provider pushes back. Transactions run on
+    a dedicated thread, in order, since they can wait on another process's lock.
+    """
+
+    def __init__(self, path: str, name: str, per_minute: float, min_rate_fraction: float = 0.1):
+        super().__init__(per_minute, min_rate_fraction)
+        self.name = name
+        if not self.enabled:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"rate-limit-{name}")
+        self._conn = connect(path, autocommit=True)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, rate REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO rate_limits (name, tokens, rate, updated_at) VALUES (?, ?, ?, ?)",
+            (name, per_minute, per_minute, time.time()),
+        )
+
+    def _update(self, change: Callable[[float, float], Tuple[float, float]]) -> Tuple[float, float]:
+        """Refill the shared bucket, apply `change(tokens, rate)` and store the result."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, rate, updated = self._conn.execute(
+                "SELECT tokens, rate, updated_at FROM rate_limits WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            rate = min(max(rate, self.min_rate), self.max_rate)
+            tokens = min(self.max_rate, tokens + max(0.0, now - updated) * rate / 60)
+            tokens, rate = change(tokens, rate)
+            self._conn.execute(
+                "UPDATE rate_limits SET tokens = ?, rate = ?, updated_at = ? WHERE name = ?",
+                (tokens, rate, now, self.name),
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.tokens, self.rate = tokens, rate
+        return tokens, rate
+
+    def _update_later(self, change: Callable[[float, float], Tuple[float, float]]) -> None:
+        """Queue an update on the bucket's thread without waiting for it."""
+        self._executor.submit(self._update, change).add_done_callback(self._log_failure)
+
+    def _log_failure(self, future: "Future[Tuple[float, float]]") -> None:
+        if future.exception() is not None:
+            logger.error(f"Rate limit update for {self.name} failed: {str(future.exception())}")
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if not self.enabled:
+            return
+        amount = min(amount, self.max_rate)
+        taken = False
+
+        def take(tokens: float, rate: float) -> Tuple[float, float]:
+            nonlocal taken
+            taken = tokens >= amount
+            return (tokens - amount if taken else tokens), rate
+
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                tokens, rate = await loop.run_in_executor(self._executor, self._update, take)
+                if taken:
+                    return
+                await asyncio.sleep((amount - tokens) * 60 / rate)
+
+    def consume(self, amount: float) -> None:
+        if self.enabled:
+            self._update_later(lambda tokens, rate: (tokens - amount, rate))
+
+    def decrease(self, factor: float = 0.5) -> None:
+        if self.enabled:
+            self._update_later(lambda tokens, rate: (tokens, max(self.min_rate, rate * factor)))
+
+    def increase(self, fraction: float = 0.05) -> None:
+        if self.enabled and self.rate < self.max_rate:
+            self._update_later(lambda tokens, rate: (tokens, min(self.max_rate, rate + self.max_rate * fraction)))
+
+class CircuitBreaker:
+    """Stops calling a failing provider until a cool-down has passed.
+
+    After the cool-down a single probe request is let through; everything else
+    is still rejected until the probe succeeds (closing the circuit) or fails
+    (opening it for another cool-down).
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may be attempted; in half-open state only the first caller (the probe) may."""
+        if self.failure_threshold <= 0:
+            return True
+        state = self.state
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return state == "closed"
+
+    def release_probe(self) -> None:
+        """Free the probe slot when the probe ended without a verdict (e.g. it was cancelled)."""
+        self.probing = False
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failure_threshold > 0 and self.failures >= self.failure_threshold:
+            if self.state != "open":
+                LLM_CIRCUIT_OPEN.inc()
+                logger.warning(f"LLM circuit opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read a retry-after hint from a provider error response."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class LLMScheduler:
+    """Process-wide request scheduler for LLM calls.
+
+    Shares requests/min and tokens/min budgets across every service, retries
+    transient failures with jittered exponential backoff (honoring retry-after),
+    optionally hedges slow requests and trips a per-model circuit breaker.
+    With `state_path` the budgets are kept in SQLite and shared by all worker
+    processes; circuit breakers stay per process.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        hedge_after: float = 0.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        state_path: Optional[str] = None,
+    ):
+        if state_path:
+            self.request_bucket: TokenBucket = SQLiteTokenBucket(state_path, "requests", requests_per_minute)
+            self.token_bucket: TokenBucket = SQLiteTokenBucket(state_path, "tokens", tokens_per_minute)
+        else:
+            self.request_bucket = TokenBucket(requests_per_minute)
+            self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        return self._breakers[model]
+
+    def record_tokens(self, amount: int) -> None:
+        """Charge tokens that were only known after the response (e.g. completion tokens)."""
+        self.token_bucket.consume(amount)
+
+    async def execute(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        hedge: bool = False,
+        max_retries: Optional[int] = None,
+    ) -> T:
+        """Run a provider call under rate limits, retries and the circuit breaker.
+
+        Args:
+            model: Model name, used to select the circuit breaker
+            call: Zero-argument coroutine factory performing one provider request
+            estimated_tokens: Prompt tokens to reserve from the tokens/min budget
+            hedge: Whether a duplicate request may be sent if the first is slow
+            max_retries: Override the configured retry count (e.g. 0 when a fallback model is available)
+
+        Raises:
+            LLMUnavailableError: If the circuit is open or retries are exhausted
+        """
+        breaker = self.breaker(model)
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            probe = breaker.state == "half_open"
+            if not breaker.allow():
+                raise LLMUnavailableError(
+                    f"LLM provider for {model} is unavailable (circuit open)",
+                    retry_after=breaker.retry_after(),
+                )
+
+            try:
+                await self.request_bucket.acquire()
+                await self.token_bucket.acquire(estimated_tokens)
+                # A probe is a single request, so it is never hedged
+                if hedge and self.hedge_after > 0 and not probe:
+                    result = await self._hedged(model, call)
+                else:
+                    result = await call()
+            except RETRYABLE_ERRORS as e:
+                breaker.record_failure()
+                retry_after = _retry_after(e)
+                if isinstance(e, groq.RateLimitError):
+                    self.request_bucket.decrease()
+                    self.token_bucket.decrease()
+                if attempt >= max_retries:
+                    raise LLMUnavailableError(
+                        f"LLM provider for {model} failed after {attempt + 1} attempts: {str(e)}",
+                        retry_after=retry_after,
+                    ) from e
+
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                delay = random.uniform(delay / 2, delay)
+                if retry_after is not None:
+                    delay = max(delay, min(retry_after, self.max_delay))
+                reason = "rate_limit" if isinstance(e, groq.RateLimitError) else type(e).__name__
+                LLM_RETRIES.inc(model=model, reason=reason)
+                logger.warning(f"Retrying {model} in {delay:.2f}s after {reason} (attempt {attempt + 1})")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if probe:
+                    breaker.release_probe()
+                raise
+
+            breaker.record_success()
+            self.request_bucket.increase()
+            self.token_bucket.increase()
+            return result
+
+    async def _hedged(self, model: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Send a duplicate request if the first has not finished in time; take the first to succeed."""
+        primary = asyncio.ensure_future(call())
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return primary.result()
+
+            LLM_HEDGES.inc(model=model)
+            await self.request_bucket.acquire()
+            pending.add(asyncio.ensure_future(call()))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+
+_scheduler: Optional[LLMScheduler] = None
+
+def _rate_limit_state_path() -> Optional[str]:
+    """Path of the shared rate limit state, or None to keep it in process."""
+    backend = settings.LLM_RATE_LIMIT_BACKEND.lower()
+    if backend == "sqlite":
+        return settings.LLM_RATE_LIMIT_PATH
+    if backend != "memory":
+        logger.warning(f"Unknown rate limit backend '{backend}', using memory")
+    return None
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the process-wide LLM scheduler configured from settings."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            max_retries=settings.LLM_MAX_RETRIES,
+            base_delay=settings.LLM_RETRY_BASE_DELAY,
+            max_delay=settings.LLM_RETRY_MAX_DELAY,
+            hedge_after=settings.LLM_HEDGE_AFTER_SECONDS,
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=settings.LLM_CIRCUIT_RESET_SECONDS,
+            state_path=_rate_limit_state_path(),
+        )
+    return _scheduler
+
+def set_llm_scheduler(scheduler: Optional[LLMScheduler]) -> None:
+    """Replace the process-wide LLM scheduler (e.g. in tests)."""
+    global _scheduler
+    _scheduler = scheduler
@@ -0,0 +1,39 @@
+import asyncio
+import os
+import sqlite3
+from typing import Any, Callable, TypeVar
+
+from .config import settings
+
+T = TypeVar("T")
+
+def connect(path: str, autocommit: bool = False) -> sqlite3.Connection:
+    """Open a SQLite database that several worker processes can share.
+
+    WAL mode lets readers proceed while one process writes, and the busy
+    timeout makes concurrent writers wait for the lock instead of failing.
+    With `autocommit`, callers manage transactions with explicit BEGIN/COMMIT.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=settings.SQLITE_BUSY_TIMEOUT,
+        check_same_thread=False,
+        isolation_level=None if autocommit else "",
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+async def run_blocking(func: Callable[..., T], *args: Any) -> T:
+    """Call a store or cache method without blocking the event loop.
+
+    Methods of SQLite-backed objects (those with `blocking = True`) can wait up to
+    SQLITE_BUSY_TIMEOUT for another process's write lock, so they run in a worker
+    thread; in-memory stores are called inline.
+    """
+    if getattr(getattr(func, "__self__", None), "blocking", False):
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
@@ -0,0 +1,85 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+from typing import List, Optional
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class WebhookURLError(ValueError):
+    """Raised when a webhook URL points somewhere the server must not call."""
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    return ip.is_global and not ip.is_multicast
+
+def check_webhook_host(host: str) -> None:
+    """Reject hosts that are obviously internal (localhost, private or link-local IPs).
+
+    Names are checked again after DNS resolution when the webhook is sent.
+    """
+    if settings.JOB_WEBHOOK_ALLOW_PRIVATE:
+        return
+    host = host.strip("[]").rstrip(".").lower()
+    if host == "localhost" or host.endswith(".localhost"):
+        raise WebhookURLError(f"Webhook host '{host}' is not allowed")
+    try:
+        public = _is_public(host)
+    except ValueError:
+        return
+    if not public:
+        raise WebhookURLError(f"Webhook host '{host}' is a private or reserved address")
+
+async def _resolve_public(host: str, port: int) -> str:
+    """Resolve a webhook host, returning an address only if every address it maps to is public."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses: List[str] = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses:
+        raise WebhookURLError(f"Webhook host '{host}' did not resolve")
+    if not settings.JOB_WEBHOOK_ALLOW_PRIVATE and not all(_is_public(address) for address in addresses):
+        raise WebhookURLError(f"Webhook host '{host}' resolves to a private or reserved address")
+    return addresses[0]
+
+_webhook_client: Optional[httpx.AsyncClient] = None
+
+def get_webhook_client() -> httpx.AsyncClient:
+    """Get the HTTP client for webhooks, kept apart from the LLM connection pool."""
+    global _webhook_client
+    if _webhook_client is None or _webhook_client.is_closed:
+        _webhook_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=settings.JOB_WEBHOOK_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(settings.JOB_WEBHOOK_TIMEOUT),
+            follow_redirects=False,
+        )
+    return _webhook_client
+
+async def close_webhook_client() -> None:
+    """Close the webhook HTTP client (called on app shutdown)."""
+    global _webhook_client
+    if _webhook_client is not None and not _webhook_client.is_closed:
+        await _webhook_client.aclose()
+    _webhook_client = None
+
+async def post_webhook(url: str, content: str) -> httpx.Response:
+    """POST JSON to a webhook, connecting only to the public address its host was checked against.
+
+    The request goes to the resolved IP (with the original Host header and TLS
+    server name), so the name cannot be re-resolved to an internal address.
+    """
+    target = httpx.URL(url)
+    if target.scheme not in ("http", "https") or not target.host:
+        raise WebhookURLError(f"Webhook URL '{url}' must be http or https")
+    check_webhook_host(target.host)
+    address = await _resolve_public(target.host, target.port or (443 if target.scheme == "https" else 80))
+    response = await get_webhook_client().post(
+        target.copy_with(host=address),
+        content=content,
+        headers={"Content-Type": "application/json", "Host": target.netloc.decode("ascii")},
+        extensions={"sni_hostname": target.host} if target.scheme == "https" else None,
+    )
+    response.raise_for_status()
+    return response
@@ -0,0 +1,37 @@
+"""Gunicorn settings for serving the API with one worker process per core.
+
+    gunicorn main:app -c gunicorn.conf.py
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Workers only share state through local SQLite stores (in WAL mode), so stores that
+# would otherwise be per process default to SQLite; explicitly configured backends win
+for name in ("LLM_CACHE_BACKEND", "SESSION_STORE_BACKEND", "JOB_STORE_BACKEND", "LLM_RATE_LIMIT_BACKEND"):
+    os.environ.setdefault(name, "sqlite")
+# Interrupted jobs are requeued once in on_starting, not by each worker
+os.environ.setdefault("JOB_RESUME_RUNNING", "False")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app and load settings once in the master; workers inherit them on fork.
+# Connections (HTTP pool, SQLite stores) are still opened lazily in each worker.
+preload_app = True
+
+def on_starting(server):
+    """Prepare shared state once, before any worker starts."""
+    from agents.planning.config import PlanningConfig
+    from agents.planning.jobs import requeue_interrupted_jobs
+
+    # Compiled prompts are cached per process, so workers start with them ready
+    PlanningConfig()
+    requeue_interrupted_jobs()
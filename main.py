@@ -1,11 +1,29 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import logging
+import os
+import time
+from typing import AsyncIterator, Dict
 
 from common.config import settings
 from common.dependencies import verify_api_key
+from common.llm import init_http_client, close_http_client
+from common.webhooks import close_webhook_client
+from common.metrics import (
+    registry,
+    HTTP_REQUEST_DURATION,
+    start_request_timings,
+    format_server_timing,
+)
 from agents.planning.router import router as planning_router
+from agents.planning.dependencies import (
+    init_planning_service,
+    set_planning_service,
+    start_job_queue,
+    stop_job_queue,
+)
 
 
 # Configure logging
@@ -19,9 +37,16 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup: Load models, establish connections
     logger.info("Starting up Hybrid Toolbox Agents API")
+    await init_http_client()
+    await init_planning_service().warm_up()
+    await start_job_queue()
     yield
     # Shutdown: Clean up resources
     logger.info("Shutting down Hybrid Toolbox Agents API")
+    await stop_job_queue()
+    set_planning_service(None)
+    await close_http_client()
+    await close_webhook_client()
 
 app = FastAPI(
     title="Hybrid Toolbox Agents API",
@@ -39,11 +64,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _route_template(request: Request) -> str:
+    """Path with parameter values replaced by their names, to bound metric cardinality."""
+    if request.scope.get("route") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in request.scope.get("path_params", {}).items()}
+    segments = [f"{{{params[seg]}}}" if seg in params else seg for seg in request.url.path.split("/")]
+    return "/".join(segments)
+
+# Per-request stage timings (Server-Timing header) and latency metrics
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    timings = start_request_timings()
+    start = time.perf_counter()
+    response = await call_next(request)
+    labels = {"method": request.method, "path": _route_template(request), "status": str(response.status_code)}
+    # Streamed bodies (no Content-Length) are still being generated when the headers
+    # go out, so they get no Server-Timing and their duration is observed at the end
+    if "content-length" not in response.headers and hasattr(response, "body_iterator"):
+        response.body_iterator = _observe_stream(response.body_iterator, start, labels)
+        return response
+    elapsed = time.perf_counter() - start
+    response.headers["Server-Timing"] = format_server_timing(timings, elapsed)
+    HTTP_REQUEST_DURATION.observe(elapsed, **labels)
+    return response
+
+async def _observe_stream(body: AsyncIterator[bytes], start: float, labels: Dict[str, str]) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, **labels)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+# Prometheus metrics endpoint. Metrics and circuit breakers live in each worker
+# process, so under gunicorn a scrape only sees the worker that answered it
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    header = (
+        f"# NOTE: metrics and circuit breaker state are per worker process (pid {os.getpid()}); "
+        "with several workers, each scrape reflects only the worker that served it\n"
+    )
+    return PlainTextResponse(
+        header + registry.render(),
+        media_type="text/plain; version=0.0.4",
+        headers={"X-Worker-PID": str(os.getpid())},
+    )
+
 # API version prefix
 api_v1 = FastAPI(
     title="Hybrid Toolbox Agents API v1",
@@ -58,4 +129,5 @@ app.mount("/v1", api_v1)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # Single process; auto-reload only in debug. Use gunicorn.conf.py for multiple workers.
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=settings.DEBUG)
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from common.rate_limit import CircuitBreaker, LLMScheduler, LLMUnavailableError
+
+def _half_open_scheduler():
+    scheduler = LLMScheduler(max_retries=0, failure_threshold=1, reset_seconds=0.01)
+    breaker = scheduler.breaker("model")
+    breaker.record_failure()
+    breaker.opened_at -= 1
+    assert breaker.state == "half_open"
+    return scheduler, breaker
+
+def test_half_open_lets_a_single_probe_through():
+    scheduler, breaker = _half_open_scheduler()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def run():
+        return await asyncio.gather(*(scheduler.execute("model", call) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[0] == "ok"
+    assert all(isinstance(result, LLMUnavailableError) for result in results[1:])
+    assert len(calls) == 1
+    assert breaker.state == "closed"
+
+def test_cancelled_probe_frees_the_slot():
+    scheduler, breaker = _half_open_scheduler()
+
+    async def run():
+        task = asyncio.ensure_future(scheduler.execute("model", lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert not breaker.probing and breaker.allow()
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
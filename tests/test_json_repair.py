@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from common.json_repair import repair_json_with_llm
+from common.llm import TokenBudget
+from common.rate_limit import LLMUnavailableError
+
+class FakeLLM:
+    def __init__(self, result):
+        self.result = result
+        self.budget = TokenBudget()
+
+    async def generate(self, messages, max_tokens=None, route=None):
+        if isinstance(self.result, BaseException):
+            raise self.result
+        return self.result
+
+def _repair(llm):
+    return asyncio.run(repair_json_with_llm(llm, "Fix this: {json_content}", '{"a": 1'))
+
+def test_repair_returns_the_fixed_json():
+    assert _repair(FakeLLM('{"a": 1}')) == {"a": 1}
+
+def test_repair_gives_up_on_other_errors():
+    assert _repair(FakeLLM(ValueError("bad response"))) is None
+
+@pytest.mark.parametrize("error", [LLMUnavailableError("circuit open"), asyncio.CancelledError()])
+def test_unavailable_provider_and_cancellation_propagate(error):
+    with pytest.raises(type(error)):
+        _repair(FakeLLM(error))
@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from common.cache import MemoryResponseCache, ResponseCache
+from common.llm import LLMClient, ModelRoute
+from common.rate_limit import LLMUnavailableError
+from common.schemas import Message, Role
+
+def _client(monkeypatch, failing_models):
+    cache = MemoryResponseCache(max_entries=10, ttl_seconds=60)
+    client = LLMClient(api_key="test", cache=cache)
+    calls = []
+
+    async def fake_open(model, *args, **kwargs):
+        calls.append(model)
+        if model in failing_models:
+            raise LLMUnavailableError(f"{model} is down")
+        message = SimpleNamespace(content=f"answer from {model}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    monkeypatch.setattr(client, "_open", fake_open)
+    return client, cache, calls
+
+def _generate(client):
+    route = ModelRoute(model="primary", fallback_models=["fallback"])
+    messages = [Message(role=Role.USER, content="hello")]
+    return asyncio.run(client.generate(messages, route=route, cache=True))
+
+def test_fallback_answers_are_not_cached_under_the_primary_key(monkeypatch):
+    client, cache, calls = _client(monkeypatch, failing_models={"primary"})
+    assert _generate(client) == "answer from fallback"
+    assert cache.size() == 0
+
+def test_primary_answers_are_cached(monkeypatch):
+    client, cache, calls = _client(monkeypatch, failing_models=set())
+    assert _generate(client) == "answer from primary"
+    assert _generate(client) == "answer from primary"
+    assert calls == ["primary"]
+
+def test_incomplete_cache_backend_fails_when_created():
+    class NoClear(ResponseCache):
+        def _get(self, key):
+            return None
+
+        def _set(self, key, value):
+            pass
+
+        def size(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        NoClear(ttl_seconds=60)
@@ -0,0 +1,48 @@
+import asyncio
+
+from agents.planning.config import PlanningConfig
+from agents.planning.modules.plan_service import PlanGenerationService
+from agents.planning.schemas import GeneratePlanRequest, PlanParameters
+from common.cache import MemoryResponseCache
+from common.llm import TokenBudget
+from common.schemas import TrainingPlan, TrainingWeek
+
+class FakeLLM:
+    budget = TokenBudget()
+
+def _service(monkeypatch, failing_weeks):
+    config = PlanningConfig()
+    config.week_retries = 1
+    templates = MemoryResponseCache(max_entries=10, ttl_seconds=60)
+    service = PlanGenerationService(config=config, llm=FakeLLM(), templates=templates)
+
+    async def skeleton(request):
+        return {"title": "Plan", "guidelines": "Train well", "weeks": []}
+
+    async def week(request, skeleton_text, week_number):
+        if week_number in failing_weeks:
+            return week_number, None
+        return week_number, TrainingWeek(week_number=week_number, days=[])
+
+    monkeypatch.setattr(service, "_generate_skeleton", skeleton)
+    monkeypatch.setattr(service, "_generate_week", week)
+    return service, templates
+
+def test_plan_with_missing_weeks_is_not_returned(monkeypatch):
+    service, _ = _service(monkeypatch, failing_weeks={3})
+    request = GeneratePlanRequest(profile={}, plan_parameters=PlanParameters(duration_weeks=4))
+    assert asyncio.run(service._generate_week_parallel_plan(request)) is None
+
+def test_complete_plan_is_returned(monkeypatch):
+    service, _ = _service(monkeypatch, failing_weeks=set())
+    request = GeneratePlanRequest(profile={}, plan_parameters=PlanParameters(duration_weeks=4))
+    training_plan, guidelines = asyncio.run(service._generate_week_parallel_plan(request))
+    assert [week.week_number for week in training_plan.weeks] == [1, 2, 3, 4]
+
+def test_incomplete_plan_is_never_saved_as_a_template(monkeypatch):
+    service, templates = _service(monkeypatch, failing_weeks=set())
+    request = GeneratePlanRequest(profile={}, plan_parameters=PlanParameters(duration_weeks=4))
+    weeks = [TrainingWeek(week_number=number, days=[]) for number in (1, 2, 4)]
+    plan = TrainingPlan(title="Plan", description="", weeks=weeks)
+    asyncio.run(service._save_template("key", request, plan, "Train well", None))
+    assert templates.size() == 0
@@ -0,0 +1,38 @@
+import pytest
+
+from agents.planning.config import PlanningConfig
+from agents.planning.modules.plan_templates import PlanFeatureExtractor
+from agents.planning.schemas import PlanParameters
+
+@pytest.fixture
+def extractor():
+    return PlanFeatureExtractor(PlanningConfig())
+
+def _profile(**overrides):
+    profile = {
+        "training_goals": "get stronger and build muscle",
+        "weekly_schedule": "Monday, Wednesday and Friday",
+        "available_equipment": "full gym",
+        "training_history": "2 years of lifting",
+        "health_constraints": "user stated they don't have any health constraints",
+        "movement_limitations": "",
+    }
+    profile.update(overrides)
+    return profile
+
+def test_experience_tier_is_part_of_the_key(extractor):
+    parameters = PlanParameters()
+    beginner = extractor.features(_profile(training_history="complete beginner"), parameters)
+    intermediate = extractor.features(_profile(), parameters)
+    assert beginner["experience"] == "beginner"
+    assert intermediate["experience"] == "intermediate"
+    assert beginner != intermediate
+
+@pytest.mark.parametrize("overrides", [
+    {"training_goals": "", "event_targets": ""},
+    {"health_constraints": "recovering from ACL surgery"},
+    {"health_constraints": "no injuries besides a sore shoulder"},
+    {"movement_limitations": "can't squat below parallel"},
+])
+def test_individual_profiles_are_not_shared(extractor, overrides):
+    assert extractor.features(_profile(**overrides), PlanParameters()) is None
@@ -0,0 +1,24 @@
+import pytest
+
+from agents.planning import config as planning_config
+from agents.planning.config import PlanningConfig
+
+def _config_with_routes(monkeypatch, raw):
+    monkeypatch.setattr(planning_config.settings, "LLM_MODEL_ROUTES", raw)
+    return PlanningConfig()
+
+def test_route_overrides_are_applied(monkeypatch):
+    config = _config_with_routes(monkeypatch, '{"extraction": {"model": "llama3-70b-8192", "temperature": 0.2}}')
+    assert config.model_routes["extraction"].model == "llama3-70b-8192"
+    assert config.model_routes["extraction"].temperature == 0.2
+
+@pytest.mark.parametrize("raw, message", [
+    ('{"extration": {"model": "x"}}', "unknown task 'extration'"),
+    ('{"extraction": {"modle": "x"}}', "unknown settings modle"),
+    ('{"extraction": "x"}', "must be a JSON object"),
+    ('["extraction"]', "must be a JSON object"),
+    ('{extraction: 1}', "not valid JSON"),
+])
+def test_invalid_route_overrides_name_the_problem(monkeypatch, raw, message):
+    with pytest.raises(ValueError, match=message):
+        _config_with_routes(monkeypatch, raw)
@@ -0,0 +1,29 @@
+import asyncio
+
+from agents.planning.planning_service import PlanningService
+from agents.planning.schemas import ComprehensivePlanRequest, ComprehensivePlanResponse, ProfileExtractResponse
+from common.llm import TokenBudget
+
+class FakeLLM:
+    budget = TokenBudget()
+
+def test_comprehensive_stream_passes_the_previous_profile():
+    service = PlanningService(llm=FakeLLM())
+    requests = []
+
+    async def extract_profile(request):
+        requests.append(request)
+        return ProfileExtractResponse(
+            profile_data=request.profile_data, raw_input=request.user_input, missing_fields=["weekly_schedule"],
+            follow_up_questions=["When can you train?"], is_complete=False
+        )
+
+    service.extract_profile = extract_profile
+    request = ComprehensivePlanRequest(user_input="I'm training for a 10k", profile_data={"training_goals": "run a 10k"})
+
+    async def collect():
+        return [item async for item in service.generate_comprehensive_plan_stream(request)]
+
+    items = asyncio.run(collect())
+    assert requests[0].profile_data == {"training_goals": "run a 10k"}
+    assert isinstance(items[-1], ComprehensivePlanResponse) and items[-1].status == "incomplete_profile"
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+
+from agents.planning.config import PlanningConfig
+from agents.planning.modules.profile_service import (
+    ProfileExtractionService,
+    RuleBasedProfileExtractor,
+    _merge_values,
+)
+from common.llm import TokenBudget
+
+class FakeLLM:
+    """Returns a fixed extraction result and records the prompts it was sent."""
+
+    def __init__(self, response):
+        self.response = response
+        self.budget = TokenBudget()
+        self.calls = []
+
+    async def generate(self, messages, temperature=None, max_tokens=None, cache=None, route=None):
+        self.calls.append(messages)
+        return json.dumps(self.response)
+
+@pytest.fixture
+def config():
+    return PlanningConfig()
+
+@pytest.fixture
+def extractor(config):
+    return RuleBasedProfileExtractor(config)
+
+def test_qualified_equipment_negation_keeps_owned_items(extractor):
+    fields = extractor.extract("I have no gym access but I own a barbell")
+    assert fields["available_equipment"][0] == "barbell"
+
+@pytest.mark.parametrize("text, field", [
+    ("I bench 100kg", "available_equipment"),
+    ("I'm in great condition", "health_constraints"),
+    ("My knee has no pain anymore", "health_constraints"),
+    ("Sun and rain never stop me from running", "weekly_schedule"),
+    ("I don't want to strain anything", "health_constraints"),
+    ("I can't train on Mondays", "weekly_schedule"),
+])
+def test_ambiguous_words_are_not_extracted(extractor, text, field):
+    assert field not in extractor.extract(text)
+
+def test_plain_statements_are_still_extracted(extractor):
+    fields = extractor.extract("I train Monday and Thursday evenings. No injuries. I have a sore back pain issue.")
+    assert "Monday" in fields["weekly_schedule"][0]
+    assert fields["health_constraints"][0] == "user stated they don't have any health constraints"
+
+def test_negation_with_exception_is_ignored(extractor):
+    fields = extractor.extract("No injuries besides the knee. I do not have any gym access on weekends though.")
+    assert "health_constraints" not in fields
+    assert "available_equipment" not in fields
+
+def test_negation_never_overwrites_append_values():
+    negation = "user stated they don't have any health constraints"
+    assert _merge_values("knee injury", negation, "append") == "knee injury"
+    assert _merge_values("3 days a week", "user stated they don't have any schedule", "replace").startswith("user stated")
+
+def _complete_profile(config):
+    profile = {field: f"some {field}" for field in config.required_fields}
+    profile["health_constraints"] = "knee injury"
+    profile["available_equipment"] = "barbell"
+    return profile
+
+def test_follow_up_turn_keeps_stored_values_and_asks_the_llm(config):
+    llm = FakeLLM({"health_constraints": "", "available_equipment": ""})
+    service = ProfileExtractionService(config=config, llm=llm)
+    profile = _complete_profile(config)
+    response = asyncio.run(service.extract_profile_update(
+        "No injuries besides the knee. I do not have any gym access on weekends though.", profile
+    ))
+    assert len(llm.calls) == 1
+    assert response.profile_data["health_constraints"] == "knee injury"
+    assert response.profile_data["available_equipment"] == "barbell"
+
+def test_rule_filled_fields_are_left_out_of_the_narrowed_prompt(config):
+    llm = FakeLLM({"event_targets": "Hyrox in March"})
+    service = ProfileExtractionService(config=config, llm=llm)
+    profile = _complete_profile(config)
+    profile["weekly_schedule"] = ""
+    profile["event_targets"] = ""
+    response = asyncio.run(service.extract_profile_update("I can train Monday and Friday mornings", profile))
+    system_prompt = llm.calls[0][0].content
+    assert "- event_targets" in system_prompt and "- weekly_schedule" not in system_prompt
+    assert "Monday" in response.profile_data["weekly_schedule"]
+    assert response.profile_data["event_targets"] == "Hyrox in March"
+
+def test_profile_completed_by_rules_skips_the_llm(config):
+    llm = FakeLLM({})
+    service = ProfileExtractionService(config=config, llm=llm)
+    profile = _complete_profile(config)
+    profile["weekly_schedule"] = ""
+    response = asyncio.run(service.extract_profile_update("I can train Monday and Friday mornings", profile))
+    assert llm.calls == []
+    assert response.is_complete and "Monday" in response.profile_data["weekly_schedule"]
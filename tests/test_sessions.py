@@ -0,0 +1,40 @@
+import pytest
+
+from agents.planning.sessions import MemorySessionStore, SessionStore, SQLiteSessionStore, new_session
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl_seconds=3600)
+    return MemorySessionStore(ttl_seconds=3600)
+
+def test_concurrent_update_loses_the_compare_and_set(store):
+    session = new_session(["training_goals"])
+    assert store.save(session)
+    first = session.model_copy(update={"profile_data": {"training_goals": "5k"}, "updated_at": session.updated_at + 1})
+    second = session.model_copy(update={"profile_data": {"training_goals": "10k"}, "updated_at": session.updated_at + 2})
+    assert store.save(first, session.updated_at)
+    assert not store.save(second, session.updated_at)
+    assert store.get(session.session_id).profile_data == {"training_goals": "5k"}
+
+def test_deleted_session_is_not_brought_back(store):
+    session = new_session(["training_goals"])
+    store.save(session)
+    store.delete(session.session_id)
+    updated = session.model_copy(update={"updated_at": session.updated_at + 1})
+    assert not store.save(updated, session.updated_at)
+    assert store.get(session.session_id) is None
+
+def test_incomplete_session_backend_fails_when_created():
+    class NoPurge(SessionStore):
+        def get(self, session_id):
+            return None
+
+        def save(self, session, expected_updated_at=None):
+            return True
+
+        def delete(self, session_id):
+            return False
+
+    with pytest.raises(TypeError):
+        NoPurge(ttl_seconds=60)
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from agents.planning.jobs import JobStore, SQLiteJobStore
+from agents.planning.schemas import GeneratePlanRequest, PlanJobRequest, PlanJobResponse
+from common.cache import SQLiteResponseCache
+
+def test_cache_hits_do_not_write_until_the_next_insert(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    changes = cache._conn.total_changes
+    assert cache.get("a") == "1"
+    assert cache._conn.total_changes == changes
+    # The batched touch makes "b" the least recently used entry
+    cache.set("c", "3")
+    assert cache.get("a") == "1" and cache.get("b") is None
+
+def test_running_job_can_be_reclaimed_after_its_lease_lapses(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    now = time.time()
+    job = PlanJobResponse(job_id="job", status="queued", created_at=now, updated_at=now)
+    store.create(job, PlanJobRequest(**GeneratePlanRequest(profile={}).model_dump()))
+    assert store.claim("job", lease_seconds=60)
+    assert not store.claim("job", lease_seconds=60)
+    assert store.abandoned(lease_seconds=60) == []
+    store._conn.execute("UPDATE plan_jobs SET updated_at = ?", (now - 120,))
+    store._conn.commit()
+    assert store.abandoned(lease_seconds=60) == ["job"]
+    assert store.claim("job", lease_seconds=60)
+    store.heartbeat("job")
+    assert store.abandoned(lease_seconds=60) == []
+
+def test_incomplete_job_store_fails_when_created():
+    class Partial(JobStore):
+        def create(self, job, request):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
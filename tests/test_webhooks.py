@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from agents.planning.schemas import PlanJobRequest
+from common.webhooks import WebhookURLError, post_webhook
+
+@pytest.mark.parametrize("url", [
+    "ftp://example.com/hook",
+    "file:///etc/passwd",
+    "http://localhost:8000/hook",
+    "http://127.0.0.1/hook",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+    "http://[fe80::1]/hook",
+])
+def test_internal_webhook_urls_are_rejected(url):
+    with pytest.raises(ValidationError):
+        PlanJobRequest(profile={}, webhook_url=url)
+
+def test_public_webhook_url_is_accepted():
+    request = PlanJobRequest(profile={}, webhook_url="https://hooks.example.com/plans")
+    assert str(request.webhook_url) == "https://hooks.example.com/plans"
+
+def test_names_resolving_to_private_addresses_are_refused(monkeypatch):
+    async def getaddrinfo(host, port, **kwargs):
+        return [(None, None, None, "", ("192.168.1.10", port))]
+
+    async def send():
+        monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+        await post_webhook("https://hooks.example.com/plans", "{}")
+
+    with pytest.raises(WebhookURLError):
+        asyncio.run(send())